@@ -0,0 +1,17 @@
+import os
+from dotenv import load_dotenv
+
+# Load environment variables from the root directory exactly once; every
+# module that reads settings at import time imports this module first
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+load_dotenv(dotenv_path=os.path.join(ROOT_DIR, ".env"))
+
+# Set by the Lambda runtime
+IS_LAMBDA = bool(os.getenv("AWS_LAMBDA_FUNCTION_NAME"))
+
+# Import openai and build the client during the Lambda init phase instead of
+# on the first request
+PREWARM_CLIENT = os.getenv("PREWARM_CLIENT", "true" if IS_LAMBDA else "false").lower() == "true"
+
+# Dump the raw Lambda event and context on every invocation (debugging only)
+LOG_LAMBDA_EVENTS = os.getenv("LOG_LAMBDA_EVENTS", "false").lower() == "true"
@@ -1,25 +1,158 @@
-from fastapi import Request, HTTPException, Depends
+from fastapi import Request, HTTPException
 from jose import jwt
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import hashlib
+import json
 import os
-from dotenv import load_dotenv
-
-# Ensure environment variables are loaded from the root directory
-load_dotenv(dotenv_path=os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), '.env'))
+import threading
+import time
+from app import config  # noqa: F401  (loads .env)
+from app.utils import request_context, tracing
+from app.utils.metrics import REGISTRY
 
 SECRET_KEY = os.getenv("JWT_SECRET", "secret")
+# Accepted algorithms; HS* verify with JWT_SECRET, RS*/ES*/PS* with the JWKS file
+JWT_ALGORITHMS = tuple(a.strip() for a in os.getenv("JWT_ALGORITHMS", "HS256").split(",") if a.strip())
+# Local JWKS ({"keys": [...]}); replaced on disk to rotate keys without a redeploy
+JWT_JWKS_PATH = os.getenv("JWT_JWKS_PATH", "")
+# How often the JWKS file's mtime is checked for a rotation
+JWT_JWKS_RELOAD_SECONDS = float(os.getenv("JWT_JWKS_RELOAD_SECONDS", "30"))
+# Verified claims cached by token digest until the token's exp (or this age, if sooner)
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "4096"))
+AUTH_CACHE_MAX_AGE = float(os.getenv("AUTH_CACHE_MAX_AGE", "300"))
+
+auth_cache_lookups = REGISTRY.counter("auth_cache_lookups_total", "Token verifications by cache outcome", ("outcome",))
+
+
+class JWKS:
+    """Keys from a local JWKS file by kid, reloaded when the file changes."""
+
+    def __init__(self, path: str, reload_seconds: float):
+        self.path = path
+        self.reload_seconds = reload_seconds
+        self._keys: Dict[Optional[str], Dict] = {}
+        self._mtime = 0.0
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def _refresh(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._checked < self.reload_seconds:
+            return
+        with self._lock:
+            self._checked = now
+            mtime = os.stat(self.path).st_mtime
+            if mtime == self._mtime:
+                return
+            with open(self.path) as f:
+                keys = json.load(f)["keys"]
+            self._keys = {key.get("kid"): key for key in keys}
+            self._mtime = mtime
+
+    def key_for(self, kid: Optional[str]) -> Dict:
+        self._refresh()
+        key = self._keys.get(kid)
+        if key is None:
+            # An unknown kid may mean the file was just rotated
+            self._refresh(force=True)
+            key = self._keys.get(kid)
+        if key is None:
+            raise jwt.JWTError("Unknown signing key")
+        return key
+
+
+class TokenCache:
+    """LRU of verified claims by token digest; an entry never outlives its token."""
+
+    def __init__(self, max_entries: int, max_age: float):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._entries: "OrderedDict[bytes, Tuple[float, Dict]]" = OrderedDict()
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, digest: bytes) -> Optional[Dict]:
+        entry = self._entries.get(digest)
+        if entry is None:
+            return None
+        expires, claims = entry
+        if expires <= time.time():
+            del self._entries[digest]
+            return None
+        self._entries.move_to_end(digest)
+        return claims
+
+    def set(self, digest: bytes, claims: Dict) -> None:
+        expires = time.time() + self.max_age
+        if isinstance(claims.get("exp"), (int, float)):
+            expires = min(expires, claims["exp"])
+        self._entries[digest] = (expires, claims)
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+jwks = JWKS(JWT_JWKS_PATH, JWT_JWKS_RELOAD_SECONDS) if JWT_JWKS_PATH else None
+token_cache = TokenCache(AUTH_CACHE_SIZE, AUTH_CACHE_MAX_AGE) if AUTH_CACHE_SIZE > 0 else None
+
+
+def verify_token(token: str) -> Dict[str, Any]:
+    header = jwt.get_unverified_header(token)
+    algorithm = header.get("alg")
+    if algorithm not in JWT_ALGORITHMS:
+        raise jwt.JWTError("Signing algorithm not allowed")
+    if algorithm.startswith("HS"):
+        key: Any = SECRET_KEY
+    elif jwks is not None:
+        key = jwks.key_for(header.get("kid"))
+    else:
+        raise jwt.JWTError("No key configured for algorithm")
+    return jwt.decode(token, key, algorithms=[algorithm])
+
+
+def verified_claims(token: str) -> Dict[str, Any]:
+    if token_cache is None:
+        return verify_token(token)
+    digest = token_cache.digest(token)
+    claims = token_cache.get(digest)
+    if claims is not None:
+        auth_cache_lookups.inc(("hit",))
+        return claims
+    auth_cache_lookups.inc(("miss",))
+    claims = verify_token(token)
+    token_cache.set(digest, claims)
+    return claims
+
 
 async def get_current_user(request: Request):
+    # Resolved once per request; the limiter, routes and metrics all share it
+    resolved = getattr(request.state, "user", None)
+    if resolved is not None:
+        return resolved
     token = request.cookies.get("auth_token")
     if not token:
         raise HTTPException(status_code=401, detail="Unauthorized: Missing token")
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        user_id = payload.get("userId")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Unauthorized: Invalid token - Missing userId")
-        request.state.user = payload
-        return payload
+        with tracing.span("jwt_decode"):
+            payload = verified_claims(token)
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Unauthorized: Token expired")
-    except jwt.JWTError:
-        raise HTTPException(status_code=401, detail="Unauthorized: Invalid token")
\ No newline at end of file
+    except (jwt.JWTError, ValueError, KeyError, OSError):
+        raise HTTPException(status_code=401, detail="Unauthorized: Invalid token")
+    user_id = payload.get("userId")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Unauthorized: Invalid token - Missing userId")
+    request.state.user = payload
+    request_context.user_id.set(str(user_id))
+    return payload
+
+
+REGISTRY.register_collector(lambda: [
+    ("auth_cache_entries", "Verified tokens in the auth cache", len(token_cache) if token_cache is not None else 0),
+])
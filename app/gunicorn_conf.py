@@ -0,0 +1,40 @@
+# gunicorn -c app/gunicorn_conf.py app.main:app
+import multiprocessing
+import os
+
+from uvicorn.workers import UvicornWorker
+
+bind = os.getenv("BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+# One event loop per worker; each overlaps I/O for many requests, so one
+# worker per vCPU is enough
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+worker_class = "app.gunicorn_conf.ServerWorker"
+# Import the app once in the master; workers fork with modules already loaded
+preload_app = os.getenv("PRELOAD_APP", "true").lower() == "true"
+keepalive = int(os.getenv("KEEPALIVE_SECONDS", "75"))
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+# SIGTERM: in-flight requests and SSE streams get this long to finish
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+max_requests = int(os.getenv("MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", "0"))
+accesslog = os.getenv("ACCESS_LOG") or None
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "warning")
+
+
+class ServerWorker(UvicornWorker):
+    CONFIG_KWARGS = {
+        "loop": "auto",
+        "http": "auto",
+        "lifespan": "on",
+        # Requests in flight per worker before new ones get a 503
+        "limit_concurrency": int(os.getenv("WORKER_MAX_CONCURRENCY", "0")) or None,
+        # Leave a margin for lifespan shutdown inside gunicorn's graceful timeout
+        "timeout_graceful_shutdown": max(graceful_timeout - 5, 1),
+    }
+
+
+def post_fork(server, worker):
+    from app.server import after_fork
+
+    after_fork()
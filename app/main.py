@@ -1,19 +1,20 @@
-import os
-import json
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from slowapi import _rate_limit_exceeded_handler
-from slowapi.errors import RateLimitExceeded
-from dotenv import load_dotenv
+from fastapi.responses import JSONResponse, PlainTextResponse
 from mangum import Mangum
-from app.utils.limiter import limiter
+from app import config
+from app.utils.limiter import RateLimitMiddleware
 from app.routes.resume import resume_router
+from app.routes.admin import admin_router
+from app.routes.jobs import jobs_router
+from app.utils.openai_helpers import prewarm
+from app.utils import log, metrics, tracing
+from app.utils.log import logger
+from app.utils.request_context import RequestContextMiddleware
+from app import server
 
-# Load environment variables from the root directory
-load_dotenv(dotenv_path=os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env'))
-
-app = FastAPI()
+# The lifespan only runs in server mode (gunicorn_conf.py); Mangum skips it
+app = FastAPI(lifespan=server.lifespan)
 
 # CORS configuration
 app.add_middleware(
@@ -24,36 +25,76 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Rate limiter configuration
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+# Request timing and error counts
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Token-bucket rate limiting: RateLimit-* headers and settling the real token usage
+app.add_middleware(RateLimitMiddleware)
+
+# Sampled per-request spans: Server-Timing and batched OTLP/JSON export.
+# Not installed at all when tracing is off
+if tracing.TRACING:
+    app.add_middleware(tracing.TracingMiddleware)
+
+# Request id / start time for logs and metrics (added last, so it runs first)
+app.add_middleware(RequestContextMiddleware)
 
 # Include routers
 app.include_router(resume_router, prefix="/api")
+app.include_router(admin_router, prefix="/api/admin")
+app.include_router(jobs_router, prefix="/api/jobs")
 
 # Add a simple root endpoint for testing
 @app.get("/")
 async def root():
     return {"message": "Resume Completion API is running on Lambda!", "status": "healthy", "version": "1.1.0"}
 
+# Readiness for load balancers: 503 while draining or while upstream is failing
+@app.get("/ready")
+async def ready():
+    is_ready, body = server.readiness()
+    return JSONResponse(body, status_code=200 if is_ready else 503)
+
+# Prometheus scrape endpoint (container mode only; Lambda flushes EMF logs instead)
+if metrics.METRICS_MODE == "prometheus":
+    @app.get("/metrics", include_in_schema=False)
+    async def prometheus_metrics():
+        return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
 # Lambda handler with better error handling
+# Built once per container; reused by every warm invocation
+adapter = Mangum(app, lifespan="off")
+
+# Runs during the Lambda init phase so the first request doesn't pay for it
+if config.PREWARM_CLIENT:
+    prewarm()
+
+
 def lambda_handler(event, context):
     """
-    AWS Lambda entry point with debugging
+    AWS Lambda entry point
     """
-    print(f"Event received: {json.dumps(event, default=str)}")
-    print(f"Context: {context}")
-    
-    # Initialize Mangum adapter
-    adapter = Mangum(app, lifespan="off")
-    
+    if config.LOG_LAMBDA_EVENTS:
+        # Serialised on the log thread, not here
+        logger.info("lambda_event", extra={"fields": {"event": event, "context": str(context)}})
+
     try:
         return adapter(event, context)
-    except Exception as e:
-        print(f"Error in Lambda handler: {str(e)}")
-        print(f"Event type: {type(event)}")
-        print(f"Event keys: {list(event.keys()) if isinstance(event, dict) else 'Not a dict'}")
+    except Exception:
+        logger.exception(
+            "lambda_handler_error",
+            extra={"fields": {
+                "event_type": type(event).__name__,
+                "event_keys": list(event.keys()) if isinstance(event, dict) else None,
+            }},
+        )
         raise
+    finally:
+        # One batch of EMF lines per invocation, written after the response is built
+        if metrics.METRICS_MODE == "emf":
+            metrics.flush_emf()
+        tracing.flush()
+        log.flush()
 
 # Keep the old handler for compatibility
-handler = lambda_handler
\ No newline at end of file
+handler = lambda_handler
@@ -0,0 +1,77 @@
+from fastapi import APIRouter, Depends
+from app.dependencies.auth import get_current_user
+from app.services.job_digest import digest_stats
+from app.utils.completion_cache import completion_cache
+from app.utils.singleflight import singleflight
+from app.utils.metrics import token_totals
+from app.utils.upstream_governor import governor
+from app.utils.execution_policy import hedge_stats
+from app.utils.fuzzy_reuse import fuzzy_stats
+from app.utils.candidate_pool import candidate_pool
+from app.utils.resumable_stream import streams
+from app.utils import request_context
+
+admin_router = APIRouter()
+
+
+@admin_router.get("/cache-stats")
+async def cache_stats(current_user: dict = Depends(get_current_user)):
+    if completion_cache is None:
+        return {"backend": "off"}
+    return completion_cache.stats()
+
+
+@admin_router.get("/coalescing-stats")
+async def coalescing_stats(current_user: dict = Depends(get_current_user)):
+    return singleflight.stats()
+
+
+@admin_router.get("/job-digest-stats")
+async def job_digest_stats(current_user: dict = Depends(get_current_user)):
+    return digest_stats()
+
+
+@admin_router.get("/token-stats")
+async def token_stats(current_user: dict = Depends(get_current_user)):
+    # Per-user usage only for the caller; /metrics carries no user label
+    return {**token_totals(), "user": token_totals(request_context.user_id.get())}
+
+
+@admin_router.get("/upstream-stats")
+async def upstream_stats(current_user: dict = Depends(get_current_user)):
+    return governor.stats()
+
+
+@admin_router.get("/hedge-stats")
+async def upstream_hedge_stats(current_user: dict = Depends(get_current_user)):
+    return hedge_stats()
+
+
+@admin_router.get("/connection-stats")
+async def openai_connection_stats(current_user: dict = Depends(get_current_user)):
+    # Loaded with the OpenAI client rather than at startup
+    from app.utils.http_transport import connection_stats
+
+    return connection_stats()
+
+
+@admin_router.get("/fuzzy-stats")
+async def fuzzy_reuse_stats(current_user: dict = Depends(get_current_user)):
+    return fuzzy_stats()
+
+
+@admin_router.get("/candidate-stats")
+async def candidate_stats(current_user: dict = Depends(get_current_user)):
+    return candidate_pool.stats()
+
+
+@admin_router.get("/stream-stats")
+async def stream_stats(current_user: dict = Depends(get_current_user)):
+    return streams.stats()
+
+
+@admin_router.get("/job-stats")
+async def jobs_stats(current_user: dict = Depends(get_current_user)):
+    from app.services.job_service import job_stats
+
+    return await job_stats()
@@ -0,0 +1,53 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import FileResponse, StreamingResponse
+from app.services.sections import JobInput
+from app.services import job_service
+from app.dependencies.auth import get_current_user
+from app.utils import request_context
+
+jobs_router = APIRouter()
+
+
+# Bulk work is queued, not served inline: no load shedding here; the worker
+# pool and the upstream governor pace it. Submitting counts as one request
+# against the user's rate limit; the work itself draws on the job budget
+@jobs_router.post("", status_code=202)
+async def create_job(input: JobInput, current_user: dict = Depends(get_current_user)):
+    request_context.section.set("job")
+    return await job_service.submit_job(request_context.user_id.get(), input)
+
+
+@jobs_router.get("/{job_id}")
+async def get_job(
+    job_id: str,
+    stream: bool = Query(False, description="Stream results as SSE while the job runs"),
+    current_user: dict = Depends(get_current_user),
+):
+    request_context.section.set("job")
+    user_id = request_context.user_id.get()
+    if stream:
+        await job_service.get_job_for(user_id, job_id)
+        return StreamingResponse(job_service.stream_job(user_id, job_id), media_type="text/event-stream")
+    return await job_service.job_status(user_id, job_id)
+
+
+@jobs_router.get("/{job_id}/batch-file")
+async def get_batch_file(job_id: str, current_user: dict = Depends(get_current_user)):
+    job = await job_service.get_job_for(request_context.user_id.get(), job_id)
+    if not job["batch_file"]:
+        raise HTTPException(status_code=404, detail="Job has no batch file")
+    return FileResponse(job["batch_file"], media_type="application/jsonl", filename=f"{job_id}.jsonl")
+
+
+@jobs_router.post("/{job_id}/batch-results")
+async def post_batch_results(job_id: str, request: Request, current_user: dict = Depends(get_current_user)):
+    # Body: a Batch API output or error file, as downloaded
+    job = await job_service.get_job_for(request_context.user_id.get(), job_id)
+    if job["mode"] != "batch":
+        raise HTTPException(status_code=409, detail="Not a batch job")
+    body = await request.body()
+    try:
+        text = body.decode()
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Batch results must be UTF-8 JSONL")
+    return await job_service.ingest_batch_output(job_id, text)
@@ -1,93 +1,65 @@
+from typing import Literal, Optional
 from fastapi import APIRouter, Depends, Query, Request
-from app.schemas.validation import (
-    SummaryInput,
-    EducationInput,
-    ExperienceInput,
-    ProjectInput,
-    CertificationInput,
-    PublicationInput,
-)
-from app.services.resume_service import (
-    generate_summary,
-    generate_education,
-    generate_experience,
-    generate_project,
-    generate_certification,
-    generate_publication,
-)
+from app.services.sections import SECTIONS, ResumeInput, SectionSpec
+from app.services.resume_service import build_section_prompt
+from app.services.batch_service import generate_resume, stream_resume
 from app.utils.openai_helpers import handle_openai_completion
+from app.utils.completion_cache import cache_bypassed
+from app.utils.fuzzy_reuse import similar_key
+from app.utils.candidate_pool import CANDIDATES_MAX
+from app.utils.resumable_stream import sse_response
 from app.dependencies.auth import get_current_user
-from app.utils.limiter import limiter
+from app.utils.limiter import rate_limit
+from app.utils.upstream_governor import shed_load
+from app.utils.execution_policy import set_deadline
+from app.utils import request_context, tracing
 
 resume_router = APIRouter()
 
-@resume_router.post("/generate-summary")
-@limiter.limit("5/minute")
-async def generate_summary_route(
-    request: Request,
-    input: SummaryInput,
-    stream: bool = Query(False),
-    current_user: dict = Depends(get_current_user),
-):
-    messages, tools, tool_name, _ = generate_summary(input)
-    return await handle_openai_completion(messages, tools, stream, tool_name)
-
-
-@resume_router.post("/generate-education")
-@limiter.limit("5/minute")
-async def generate_education_route(
-    request: Request,
-    input: EducationInput,
-    stream: bool = Query(False),
-    current_user: dict = Depends(get_current_user),
-):
-    messages, tools, tool_name, _ = generate_education(input)
-    return await handle_openai_completion(messages, tools, stream, tool_name)
-
-
-@resume_router.post("/generate-experience")
-@limiter.limit("5/minute")
-async def generate_experience_route(
-    request: Request,
-    input: ExperienceInput,
-    stream: bool = Query(False),
-    current_user: dict = Depends(get_current_user),
-):
-    messages, tools, tool_name, _ = generate_experience(input)
-    return await handle_openai_completion(messages, tools, stream, tool_name)
 
+def section_route(spec: SectionSpec):
+    # One POST /generate-<section> handler per registry entry
+    async def route(
+        request: Request,
+        input: spec.schema,
+        stream: bool = Query(False),
+        jd_mode: Optional[Literal["raw", "condensed"]] = Query(None),
+        fuzzy: bool = Query(True, description="Allow reuse of a near-identical recent result"),
+        candidates: int = Query(1, ge=1, le=CANDIDATES_MAX, description="Variants to generate in one upstream call"),
+        current_user: dict = Depends(get_current_user),
+    ):
+        # Body parsing and Pydantic validation ran between the dependencies and here
+        tracing.mark("validation")
+        request_context.section.set(spec.name)
+        set_deadline(spec.name)
+        use_cache = not cache_bypassed(request)
+        with tracing.span("prompt_build", section=spec.name):
+            messages, tools, tool_name, _ = build_section_prompt(spec, input, jd_mode)
+            similar = similar_key(spec.name, input, jd_mode, use_cache, fuzzy)
+        return await handle_openai_completion(messages, tools, stream, tool_name, use_cache, similar, candidates)
 
-@resume_router.post("/generate-project")
-@limiter.limit("5/minute")
-async def generate_project_route(
-    request: Request,
-    input: ProjectInput,
-    stream: bool = Query(False),
-    current_user: dict = Depends(get_current_user),
-):
-    messages, tools, tool_name, _ = generate_project(input)
-    return await handle_openai_completion(messages, tools, stream, tool_name)
+    route.__name__ = f"generate_{spec.name}_route"
+    route.__qualname__ = route.__name__
+    return route
 
 
-@resume_router.post("/generate-certification")
-@limiter.limit("5/minute")
-async def generate_certification_route(
-    request: Request,
-    input: CertificationInput,
-    stream: bool = Query(False),
-    current_user: dict = Depends(get_current_user),
-):
-    messages, tools, tool_name, _ = generate_certification(input)
-    return await handle_openai_completion(messages, tools, stream, tool_name)
+for _spec in SECTIONS.values():
+    resume_router.post(_spec.path, dependencies=[Depends(shed_load), Depends(rate_limit)])(section_route(_spec))
 
 
-@resume_router.post("/generate-publication")
-@limiter.limit("5/minute")
-async def generate_publication_route(
+@resume_router.post("/generate-resume", dependencies=[Depends(shed_load), Depends(rate_limit)])
+async def generate_resume_route(
     request: Request,
-    input: PublicationInput,
+    input: ResumeInput,
     stream: bool = Query(False),
+    jd_mode: Optional[Literal["raw", "condensed"]] = Query(None),
+    fuzzy: bool = Query(True, description="Allow reuse of near-identical recent results"),
     current_user: dict = Depends(get_current_user),
 ):
-    messages, tools, tool_name, _ = generate_publication(input)
-    return await handle_openai_completion(messages, tools, stream, tool_name)
+    tracing.mark("validation")
+    request_context.section.set("resume")
+    set_deadline("resume")
+    use_cache = not cache_bypassed(request)
+    if stream:
+        return sse_response(stream_resume(input.sections, use_cache, jd_mode, fuzzy))
+    return {"sections": await generate_resume(input.sections, use_cache, jd_mode, fuzzy)}
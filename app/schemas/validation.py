@@ -66,4 +66,5 @@ class PublicationInput(BaseModel):
     authors: Optional[List[str]] = None
     url: Optional[str] = None
     jobDescription: Optional[str] = None
-    rawDescription: Optional[str] = None
\ No newline at end of file
+    rawDescription: Optional[str] = None
+
@@ -0,0 +1,73 @@
+import os
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Tuple
+
+from app import config  # noqa: F401  (loads .env)
+from app.utils import completion_cache, limiter, log, metrics, openai_helpers, tracing
+from app.utils.log import logger
+from app.utils.resumable_stream import streams
+from app.utils.upstream_governor import OPEN, governor
+
+# Long-running server mode (gunicorn + uvicorn workers, see gunicorn_conf.py).
+# Lambda never runs the lifespan: Mangum is built with lifespan="off".
+
+# How long shutdown waits for SSE generations still running after their
+# connections closed (uvicorn already waits for open connections)
+SERVER_DRAIN_SECONDS = float(os.getenv("SERVER_DRAIN_SECONDS", "25"))
+# Restart the bulk job worker pool at startup so queued live jobs resume
+SERVER_RESUME_JOBS = os.getenv("SERVER_RESUME_JOBS", "true").lower() == "true"
+
+draining = False
+
+
+def after_fork() -> None:
+    """gunicorn post_fork: per-process state the preloaded master must not share."""
+    log.after_fork()
+    completion_cache.after_fork()
+    limiter.after_fork()
+
+
+async def startup() -> None:
+    global draining
+    draining = False
+    # Client, HTTP pool and fuzzy index are built on the worker's own loop
+    openai_helpers.prewarm()
+    if SERVER_RESUME_JOBS:
+        from app.services import job_service
+
+        job_service.ensure_workers()
+    logger.info("server_started", extra={"fields": {"pid": os.getpid()}})
+
+
+async def shutdown() -> None:
+    global draining
+    draining = True
+    cancelled = await streams.drain(SERVER_DRAIN_SECONDS)
+    from app.services import job_service
+
+    await job_service.stop_workers()
+    job_service.close()
+    await openai_helpers.close_client()
+    completion_cache.close()
+    if metrics.METRICS_MODE == "emf":
+        metrics.flush_emf()
+    tracing.flush()
+    logger.info("server_stopped", extra={"fields": {"pid": os.getpid(), "streams_cancelled": cancelled}})
+    log.flush()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    await startup()
+    try:
+        yield
+    finally:
+        await shutdown()
+
+
+def readiness() -> Tuple[bool, Dict[str, Any]]:
+    # Not ready while shutting down or while the upstream circuit is open:
+    # a load balancer should route new work elsewhere in both cases
+    upstream = governor.stats()
+    ready = not draining and upstream["circuit"] != OPEN
+    return ready, {"status": "ready" if ready else "unavailable", "draining": draining, "upstream": upstream}
@@ -0,0 +1,108 @@
+import asyncio
+import json
+import os
+from typing import AsyncIterator, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from app import config  # noqa: F401  (loads .env)
+from app.services.sections import ResumeSection
+from app.services.resume_service import SECTION_BUILDERS
+from app.utils import metrics, request_context, tracing
+from app.utils.fuzzy_reuse import similar_key
+from app.utils.openai_helpers import CompletionError, Reused, complete_description, observe_first_event, stream_description
+
+# Upper bound on section completions running at once for a single resume
+BATCH_CONCURRENCY = int(os.getenv("RESUME_BATCH_CONCURRENCY", "6"))
+
+
+def section_error_message(e: Exception) -> str:
+    if isinstance(e, HTTPException):
+        return str(e.detail)
+    if isinstance(e, CompletionError):
+        return str(e) or "Unexpected tool call from AI"
+    return f"AI service error: {str(e)}"
+
+
+def _section_tag(index: int, section: ResumeSection) -> Dict:
+    return {"index": index, "id": section.id, "type": section.type}
+
+
+async def generate_resume(
+    sections: List[ResumeSection], use_cache: bool = True, jd_mode: Optional[str] = None, fuzzy: bool = True
+) -> List[Dict]:
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def run(index: int, section: ResumeSection) -> Dict:
+        result = _section_tag(index, section)
+        # Each section runs in its own task, so this only labels this section's metrics
+        request_context.section.set(section.type)
+        async with semaphore:
+            try:
+                with tracing.span("prompt_build", section=section.type):
+                    messages, tools, tool_name, _ = SECTION_BUILDERS[section.type](section.input, jd_mode)
+                    similar = similar_key(section.type, section.input, jd_mode, use_cache, fuzzy)
+                args = await complete_description(messages, tools, tool_name, use_cache, similar)
+            except Exception as e:
+                metrics.errors.inc((section.type, "section_error"))
+                # A failed section is reported on its own; the rest of the batch still completes
+                result.update(status="error", error=section_error_message(e))
+                return result
+        result.update(status="ok", description=args.get("description"))
+        if "reused" in args:
+            result["reused"] = args["reused"]
+        return result
+
+    return await asyncio.gather(*(run(i, s) for i, s in enumerate(sections)))
+
+
+async def stream_resume(
+    sections: List[ResumeSection], use_cache: bool = True, jd_mode: Optional[str] = None, fuzzy: bool = True
+) -> AsyncIterator[str]:
+    """
+    Multiplexes the streams of every section into one SSE stream. Each event
+    carries the section index and id; a section ends with either a "done" or
+    an "error" event, and the whole stream ends with [DONE].
+    """
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def run(index: int, section: ResumeSection) -> None:
+        tag = _section_tag(index, section)
+        request_context.section.set(section.type)
+        done = {**tag, "done": True}
+        async with semaphore:
+            try:
+                with tracing.span("prompt_build", section=section.type):
+                    messages, tools, tool_name, _ = SECTION_BUILDERS[section.type](section.input, jd_mode)
+                    similar = similar_key(section.type, section.input, jd_mode, use_cache, fuzzy)
+                async for piece in stream_description(messages, tools, tool_name, use_cache, similar):
+                    if isinstance(piece, Reused):
+                        # Reported on the section's "done" event
+                        done["reused"] = piece.kind
+                        continue
+                    await queue.put({**tag, "data": piece})
+            except Exception as e:
+                metrics.errors.inc((section.type, "stream_error"))
+                await queue.put({**tag, "error": section_error_message(e)})
+            else:
+                await queue.put(done)
+
+    tasks = [asyncio.ensure_future(run(i, s)) for i, s in enumerate(sections)]
+    try:
+        with tracing.span("sse_delivery", sections=len(tasks)):
+            remaining = len(tasks)
+            first = True
+            while remaining:
+                event = await queue.get()
+                if first:
+                    observe_first_event()
+                    first = False
+                if "data" not in event:
+                    remaining -= 1
+                yield f"data: {json.dumps(event)}\n\n"
+            yield "data: [DONE]\n\n"
+    finally:
+        # Client went away: stop the sections that are still running
+        for task in tasks:
+            task.cancel()
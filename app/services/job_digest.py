@@ -0,0 +1,143 @@
+import hashlib
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Optional
+
+from app import config  # noqa: F401  (loads .env)
+from app.utils.completion_cache import MemoryCache
+from app.utils.metrics import REGISTRY
+from app.utils.tokens import estimate_tokens
+
+# "raw" sends the job description as pasted, "condensed" sends the digest
+JD_MODE_DEFAULT = os.getenv("JOB_DESCRIPTION_MODE", "raw").lower()
+JD_DIGEST_MAX_CHARS = int(os.getenv("JOB_DIGEST_MAX_CHARS", "700"))
+JD_DIGEST_MAX_KEYWORDS = int(os.getenv("JOB_DIGEST_MAX_KEYWORDS", "25"))
+
+# Lines that state what the role needs, as opposed to company boilerplate
+_REQUIREMENT_HINTS = re.compile(
+    r"\b(require|must|experience|proficien|knowledge|familiar|skill|degree|years?|"
+    r"responsib|ability|expert|strong|background|understanding|hands-on|certif|plus|preferred)",
+    re.IGNORECASE,
+)
+_BULLET = re.compile(r"^\s*(?:[-*•·▪◦]|\d+[.)])\s*")
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?;])\s+|\n+")
+_WORD = re.compile(r"[A-Za-z][A-Za-z0-9+#./-]*[A-Za-z0-9+#]|[A-Za-z]")
+_STOPWORDS = frozenset(
+    """
+    a about above after all also an and any are as at be been being both but by can could do does
+    for from has have having how if in into is it its join just least may more most must new not
+    of on or our out over own per plus preferred required role should so some such team than that
+    the their them then there these they this those through to under up us using we well what when
+    where which while who will with within work working would you your years year experience
+    ability strong including etc looking candidate candidates company job position opportunity
+    """.split()
+)
+
+
+class JobDigest:
+    def __init__(self, text: str, original_tokens: int):
+        self.text = text
+        self.original_tokens = original_tokens
+        self.digest_tokens = estimate_tokens(text)
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(self.original_tokens - self.digest_tokens, 0)
+
+
+_digests = MemoryCache(max_entries=256, ttl=24 * 3600)
+_stats = {"digests_built": 0, "digest_cache_hits": 0, "condensed_prompts": 0, "prompt_tokens_saved": 0}
+
+
+def _keywords(text: str) -> List[str]:
+    counts: Counter = Counter()
+    display: Dict[str, str] = {}
+    technical = set()
+    for segment in _SENTENCE_SPLIT.split(text):
+        for position, word in enumerate(_WORD.findall(_BULLET.sub("", segment))):
+            word = word.rstrip(".")
+            lowered = word.lower()
+            if len(lowered) < 2 or lowered in _STOPWORDS:
+                continue
+            counts[lowered] += 1
+            display.setdefault(lowered, word)
+            # Capitalisation only means something away from the start of a sentence
+            if any(c.isdigit() or c in "+#./" for c in word) or any(c.isupper() for c in word[1:]) or (
+                position > 0 and word[0].isupper()
+            ):
+                technical.add(lowered)
+                display[lowered] = word
+
+    ranked = sorted(counts.items(), key=lambda item: item[1] + (2 if item[0] in technical else 0), reverse=True)
+    return [display[word] for word, _ in ranked[:JD_DIGEST_MAX_KEYWORDS]]
+
+
+def _requirements(text: str) -> List[str]:
+    lines = []
+    seen = set()
+    for raw in _SENTENCE_SPLIT.split(text):
+        line = " ".join(_BULLET.sub("", raw).split())
+        # Skip headings ("Requirements:") and fragments
+        if len(line) < 12 or line.endswith(":") or not _REQUIREMENT_HINTS.search(line):
+            continue
+        key = line.lower()
+        if key not in seen:
+            seen.add(key)
+            lines.append(line.rstrip(".;"))
+    return lines
+
+
+def _build_digest(text: str) -> str:
+    keywords = "keywords: " + ", ".join(_keywords(text))
+    budget = JD_DIGEST_MAX_CHARS - len(keywords) - len("requirements: ; ")
+    requirements: List[str] = []
+    for line in _requirements(text):
+        if budget - len(line) - 2 < 0:
+            break
+        requirements.append(line)
+        budget -= len(line) + 2
+    if requirements:
+        return "requirements: " + "; ".join(requirements) + "; " + keywords
+    return keywords
+
+
+def condense_job_description(text: str) -> JobDigest:
+    """
+    Reduces a pasted job posting to its requirement lines and ranked keywords.
+    Digests are cached by content hash so every section of a resume (and every
+    regenerate) reuses the same one.
+    """
+    key = hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+    digest = _digests.get(key)
+    if digest is not None:
+        _stats["digest_cache_hits"] += 1
+        return digest
+    original_tokens = estimate_tokens(text)
+    condensed = _build_digest(text)
+    # Short postings are already compact; never make a prompt longer
+    if len(condensed) >= len(text):
+        condensed = text
+    digest = JobDigest(condensed, original_tokens)
+    _digests.set(key, digest)
+    _stats["digests_built"] += 1
+    return digest
+
+
+def job_description_text(job_description: Optional[str], mode: Optional[str] = None) -> Optional[str]:
+    if not job_description or (mode or JD_MODE_DEFAULT) != "condensed":
+        return job_description
+    digest = condense_job_description(job_description)
+    _stats["condensed_prompts"] += 1
+    _stats["prompt_tokens_saved"] += digest.tokens_saved
+    return digest.text
+
+
+def digest_stats() -> Dict[str, int]:
+    return dict(_stats, cached_digests=len(_digests))
+
+
+REGISTRY.register_collector(lambda: [
+    ("job_digest_prompt_tokens_saved_total", "Estimated prompt tokens saved by condensed job descriptions", _stats["prompt_tokens_saved"]),
+    ("job_digest_cache_hits_total", "Job description digests served from cache", _stats["digest_cache_hits"]),
+])
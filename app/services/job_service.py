@@ -0,0 +1,386 @@
+import asyncio
+import contextvars
+import json
+import math
+import os
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from app import config  # noqa: F401  (loads .env)
+from app.services.batch_service import section_error_message
+from app.services.job_store import JobStore, NewItem
+from app.services.resume_service import SECTION_BUILDERS
+from app.services.sections import MAX_JOB_RESUMES, MAX_RESUME_SECTIONS, SECTIONS, JobInput
+from app.utils import metrics, request_context
+from app.utils.broadcast import Signal
+from app.utils.execution_policy import set_deadline
+from app.utils.limiter import RATE_LIMIT_WINDOW, admit
+from app.utils.log import logger
+from app.utils.openai_helpers import MODEL, cached_tokens, complete_description, get_client, tool_arguments, tool_choice_for
+from app.utils.upstream_governor import UpstreamOverloaded
+
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "/tmp/jobs.sqlite3")
+# Section completions in flight for all jobs in this process; kept small so
+# bulk work leaves upstream capacity for the interactive routes
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "4"))
+# How often idle workers and open result streams look for work done by other processes
+JOBS_POLL_INTERVAL = float(os.getenv("JOBS_POLL_INTERVAL", "1.0"))
+# A claimed item not finished within this long is assumed lost and requeued
+JOBS_CLAIM_TIMEOUT = float(os.getenv("JOBS_CLAIM_TIMEOUT", "300"))
+JOBS_BATCH_DIR = os.getenv("JOBS_BATCH_DIR", "/tmp/batches")
+# Upload batch-mode jobs to the OpenAI Batch API; otherwise only the JSONL
+# file is written and the results are ingested through the API
+JOBS_BATCH_SUBMIT = os.getenv("JOBS_BATCH_SUBMIT", "false").lower() == "true"
+JOBS_BATCH_POLL_INTERVAL = float(os.getenv("JOBS_BATCH_POLL_INTERVAL", "60"))
+# Per-user job budget: section items a user may have unfinished across all
+# their jobs. Bulk work is paced by the worker pool and the upstream governor,
+# not by the interactive per-minute token bucket
+JOBS_MAX_PENDING_ITEMS = int(os.getenv("JOBS_MAX_PENDING_ITEMS", str(MAX_JOB_RESUMES * MAX_RESUME_SECTIONS)))
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+
+jobs_processed = metrics.REGISTRY.counter("job_items_total", "Bulk job section items finished", ("section", "status"))
+
+_store: Optional[JobStore] = None
+_workers: List[asyncio.Task] = []
+# Wakes open result streams and idle workers. Created on the running loop by
+# the first waiter (not at import, which may happen in a pre-fork server master)
+_progress: Optional[Signal] = None
+
+
+def get_store() -> JobStore:
+    global _store
+    if _store is None:
+        _store = JobStore(JOBS_DB_PATH)
+    return _store
+
+
+def _notify() -> None:
+    if _progress is not None:
+        _progress.notify()
+
+
+async def _wait_for_progress() -> None:
+    global _progress
+    if _progress is None:
+        _progress = Signal()
+    await _progress.wait(JOBS_POLL_INTERVAL)
+
+
+def ensure_workers() -> None:
+    """Starts the worker pool on the running loop (again, if that loop changed)."""
+    global _workers
+    loop = asyncio.get_running_loop()
+    _workers = [w for w in _workers if not w.done() and w.get_loop() is loop]
+    if _workers:
+        return
+    # Started from a clean context: a task copies the caller's context, and the
+    # pool outlives the request (its trace, rate-limit charge and request id)
+    # that happened to start it
+    _workers = [contextvars.Context().run(loop.create_task, _worker(requeue=i == 0)) for i in range(JOBS_WORKERS)]
+
+
+async def stop_workers() -> None:
+    for worker in _workers:
+        worker.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+
+
+# Store calls run in the threadpool: they take SQLite's write lock (BEGIN
+# IMMEDIATE, up to a 5 s busy timeout when other processes share the file),
+# which must not stall the event loop
+
+
+async def _worker(requeue: bool = False) -> None:
+    store = get_store()
+    if requeue:
+        requeued = await run_in_threadpool(store.requeue_stale, JOBS_CLAIM_TIMEOUT)
+        if requeued:
+            logger.info("job_items_requeued", extra={"fields": {"count": requeued}})
+    while True:
+        item = await run_in_threadpool(store.claim_next)
+        if item is None:
+            await _wait_for_progress()
+            continue
+        await _run_item(store, item)
+
+
+async def _run_item(store: JobStore, item: Dict[str, Any]) -> None:
+    section = item["type"]
+    # Each item is accounted to the job owner, like an interactive request
+    request_context.request_id.set(f"job-{item['job_id']}-{item['idx']}")
+    request_context.user_id.set(item["user_id"])
+    request_context.section.set(section)
+    request_context.started.set(time.perf_counter())
+    set_deadline(section)
+    try:
+        input = SECTIONS[section].schema.model_validate(item["input"])
+        messages, tools, tool_name, _ = SECTION_BUILDERS[section](input, item["jd_mode"])
+        args = await complete_description(messages, tools, tool_name)
+    except asyncio.CancelledError:
+        # Shutting down: hand the item to whichever process starts next
+        await run_in_threadpool(store.release, item["job_id"], item["idx"])
+        raise
+    except UpstreamOverloaded as e:
+        # Not the item's fault: put it back and give upstream room
+        await run_in_threadpool(store.release, item["job_id"], item["idx"])
+        await asyncio.sleep(int(e.headers["Retry-After"]))
+        return
+    except Exception as e:
+        await run_in_threadpool(store.finish_item, item["job_id"], item["idx"], error=section_error_message(e))
+        jobs_processed.inc((section, "error"))
+    else:
+        await run_in_threadpool(store.finish_item, item["job_id"], item["idx"], result=args.get("description"))
+        jobs_processed.inc((section, "ok"))
+    _notify()
+
+
+def _flatten(job: JobInput) -> List[NewItem]:
+    return [
+        (resume_index, section.id, section.type, section.input.model_dump(exclude_none=True))
+        for resume_index, resume in enumerate(job.resumes)
+        for section in resume.sections
+    ]
+
+
+async def _admit_job(user_id: str, items: List[NewItem]) -> None:
+    if len(items) > JOBS_MAX_PENDING_ITEMS:
+        # Could never be admitted, however long the client waits
+        raise HTTPException(
+            status_code=413,
+            detail=f"Job too large ({len(items)} sections, limit {JOBS_MAX_PENDING_ITEMS}); split it",
+        )
+    unfinished = await run_in_threadpool(get_store().unfinished_items, user_id)
+    if unfinished + len(items) > JOBS_MAX_PENDING_ITEMS:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Too many unfinished job items ({unfinished} queued, limit {JOBS_MAX_PENDING_ITEMS})",
+            headers={"Retry-After": str(math.ceil(RATE_LIMIT_WINDOW))},
+        )
+    # The submission itself counts as one request against the user's rate limit
+    await admit(user_id, 0, settle=False)
+
+
+async def submit_job(user_id: str, job: JobInput) -> Dict[str, Any]:
+    store = get_store()
+    items = _flatten(job)
+    await _admit_job(user_id, items)
+    job_id = await run_in_threadpool(store.create_job, user_id, job.mode, job.jd_mode, items)
+    if job.mode == "batch":
+        path = await write_batch_file(job_id, job.jd_mode)
+        await run_in_threadpool(store.update_job, job_id, batch_file=path, status="prepared")
+        if JOBS_BATCH_SUBMIT:
+            await submit_batch(job_id, path)
+    else:
+        ensure_workers()
+        _notify()
+    return job_view(await run_in_threadpool(store.get_job, job_id))
+
+
+def job_view(job: Dict[str, Any], results: Optional[List[Dict]] = None) -> Dict[str, Any]:
+    view = {name: job[name] for name in ("id", "status", "mode", "total", "completed", "failed", "created", "updated")}
+    if job["mode"] == "batch":
+        view["batch_id"] = job["batch_id"]
+    if results is not None:
+        view["results"] = results
+    return view
+
+
+async def get_job_for(user_id: str, job_id: str) -> Dict[str, Any]:
+    job = await run_in_threadpool(get_store().get_job, job_id)
+    # Someone else's job is indistinguishable from a missing one
+    if job is None or job["user_id"] != user_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+async def job_status(user_id: str, job_id: str) -> Dict[str, Any]:
+    job = await get_job_for(user_id, job_id)
+    store = get_store()
+    if job["mode"] == "live" and job["status"] != "completed":
+        # Resumes work after a restart; a no-op while workers are running
+        ensure_workers()
+    elif job["batch_id"] and job["status"] == "submitted":
+        await refresh_batch(job)
+        job = await run_in_threadpool(store.get_job, job_id)
+    finished = await run_in_threadpool(store.finished_items, job_id)
+    return job_view(job, [_public(item) for item in finished])
+
+
+def _public(item: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in item.items() if k != "seq"}
+
+
+async def stream_job(user_id: str, job_id: str) -> AsyncIterator[str]:
+    """SSE: every finished item (already done ones first), then [DONE] once the job completes."""
+    await get_job_for(user_id, job_id)
+    store = get_store()
+    after = 0
+    while True:
+        for item in await run_in_threadpool(store.finished_items, job_id, after):
+            after = item["seq"]
+            yield f"data: {json.dumps(_public(item))}\n\n"
+        job = await run_in_threadpool(store.get_job, job_id)
+        if job["status"] == "completed" and job["completed"] <= after:
+            yield f"data: {json.dumps(job_view(job))}\n\n"
+            yield "data: [DONE]\n\n"
+            return
+        if job["batch_id"] and job["status"] == "submitted":
+            await refresh_batch(job)
+        await _wait_for_progress()
+
+
+# -- Batch API mode ------------------------------------------------------------
+
+async def write_batch_file(job_id: str, jd_mode: Optional[str]) -> str:
+    """Writes one Batch API request line per section item; custom_id is "<job>:<index>"."""
+    lines = []
+    # Prompts are built on the loop (the JD digest cache isn't thread-safe);
+    # the store read and the file write are not
+    for item in await run_in_threadpool(get_store().items, job_id):
+        section = item["type"]
+        input = SECTIONS[section].schema.model_validate(item["input"])
+        messages, tools, tool_name, _ = SECTION_BUILDERS[section](input, jd_mode)
+        body = {"model": MODEL, "messages": messages, "tools": list(tools), "tool_choice": tool_choice_for(tools, tool_name)}
+        lines.append(json.dumps({"custom_id": f"{job_id}:{item['idx']}", "method": "POST", "url": BATCH_ENDPOINT, "body": body}) + "\n")
+    return await run_in_threadpool(_write_lines, os.path.join(JOBS_BATCH_DIR, f"{job_id}.jsonl"), lines)
+
+
+def _write_lines(path: str, lines: List[str]) -> str:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.writelines(lines)
+    return path
+
+
+async def submit_batch(job_id: str, path: str) -> None:
+    client = get_client()
+    with open(path, "rb") as f:
+        uploaded = await client.files.create(file=f, purpose="batch")
+    batch = await client.batches.create(input_file_id=uploaded.id, endpoint=BATCH_ENDPOINT, completion_window="24h")
+    await run_in_threadpool(get_store().update_job, job_id, batch_id=batch.id, status="submitted")
+    logger.info("batch_submitted", extra={"fields": {"job_id": job_id, "batch_id": batch.id}})
+
+
+async def refresh_batch(job: Dict[str, Any]) -> None:
+    if time.time() - job["polled"] < JOBS_BATCH_POLL_INTERVAL:
+        return
+    store = get_store()
+    await run_in_threadpool(store.update_job, job["id"], polled=time.time())
+    client = get_client()
+    batch = await client.batches.retrieve(job["batch_id"])
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if file_id:
+            content = await client.files.content(file_id)
+            await ingest_batch_output(job["id"], content.text)
+    if batch.status in ("failed", "expired", "cancelled"):
+        # Anything the batch never answered fails with the batch's status
+        await run_in_threadpool(_fail_unanswered, job["id"], f"Batch {batch.status}")
+        _notify()
+
+
+def _fail_unanswered(job_id: str, error: str) -> None:
+    store = get_store()
+    for item in store.items(job_id, status="pending"):
+        store.finish_item(job_id, item["idx"], error=error)
+
+
+# Invalid lines reported back by line number, up to this many
+_INVALID_LINES_REPORTED = 20
+
+
+def _parse_batch_line(line: str) -> Tuple[str, Optional[str], Any]:
+    """(custom_id, error, completion) of one output line; raises ValueError if malformed."""
+    from openai.types.chat import ChatCompletion
+
+    record = json.loads(line)
+    if not isinstance(record, dict) or not isinstance(record.get("custom_id"), str):
+        raise ValueError("missing custom_id")
+    response = record.get("response") or {}
+    error = record.get("error")
+    if error or response.get("status_code") != 200:
+        message = error.get("message") if isinstance(error, dict) else None
+        return record["custom_id"], message or f"AI service error: status {response.get('status_code')}", None
+    if "body" not in response:
+        raise ValueError("missing response body")
+    # ValidationError is a ValueError
+    return record["custom_id"], None, ChatCompletion.model_validate(response["body"])
+
+
+def _apply_batch_output(job_id: str, text: str) -> Tuple[Dict[str, Any], List[Tuple[str, str, Any]]]:
+    # Runs in a worker thread: SQLite and parsing only; metrics are left to the caller
+    store = get_store()
+    types = {item["idx"]: item["type"] for item in store.items(job_id)}
+    applied = skipped = 0
+    invalid: List[int] = []
+    finished_items = []
+    for number, line in enumerate(text.splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            custom_id, error, completion = _parse_batch_line(line)
+        except (ValueError, TypeError, AttributeError):
+            invalid.append(number)
+            continue
+        owner, _, idx = custom_id.partition(":")
+        if owner != job_id or not idx.isdigit() or int(idx) not in types:
+            skipped += 1
+            continue
+        idx = int(idx)
+        section = types[idx]
+        status = "error"
+        if completion is None:
+            finished = store.finish_item(job_id, idx, error=error)
+        else:
+            try:
+                args = tool_arguments(completion, SECTIONS[section].tool_name)
+            except Exception as e:
+                finished = store.finish_item(job_id, idx, error=section_error_message(e))
+            else:
+                finished = store.finish_item(job_id, idx, result=args.get("description"))
+                status = "ok"
+        if finished:
+            applied += 1
+            finished_items.append((section, status, completion.usage if completion is not None else None))
+        else:
+            skipped += 1
+    summary = {"applied": applied, "skipped": skipped, "invalid": len(invalid)}
+    if invalid:
+        summary["invalid_lines"] = invalid[:_INVALID_LINES_REPORTED]
+    return summary, finished_items
+
+
+async def ingest_batch_output(job_id: str, text: str) -> Dict[str, Any]:
+    """
+    Applies a Batch API output (or error) file to the job. Lines for other
+    jobs or items that already finished are skipped, so ingesting the same
+    file twice is harmless; malformed lines are counted as invalid and
+    reported by line number.
+    """
+    user_id = (await run_in_threadpool(get_store().get_job, job_id))["user_id"]
+    summary, finished_items = await run_in_threadpool(_apply_batch_output, job_id, text)
+    for section, status, usage in finished_items:
+        jobs_processed.inc((section, status))
+        # Only for newly finished items, so a re-ingested file isn't billed twice
+        if usage:
+            metrics.record_usage(section, user_id, MODEL, usage.prompt_tokens, usage.completion_tokens, cached_tokens(usage))
+    if summary["invalid"]:
+        logger.warning("batch_output_invalid_lines", extra={"fields": {"job_id": job_id, **summary}})
+    _notify()
+    return summary
+
+
+def close() -> None:
+    global _store
+    if _store is not None:
+        _store.close()
+        _store = None
+
+
+async def job_stats() -> Dict[str, Any]:
+    counts = await run_in_threadpool(get_store().counts)
+    return {"workers": len([w for w in _workers if not w.done()]), "items": counts}
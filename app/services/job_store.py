@@ -0,0 +1,208 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id TEXT PRIMARY KEY,
+        user_id TEXT NOT NULL,
+        mode TEXT NOT NULL,
+        jd_mode TEXT,
+        status TEXT NOT NULL,
+        total INTEGER NOT NULL,
+        completed INTEGER NOT NULL DEFAULT 0,
+        failed INTEGER NOT NULL DEFAULT 0,
+        batch_id TEXT,
+        batch_file TEXT,
+        polled REAL NOT NULL DEFAULT 0,
+        created REAL NOT NULL,
+        updated REAL NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS job_items (
+        job_id TEXT NOT NULL,
+        idx INTEGER NOT NULL,
+        resume INTEGER NOT NULL,
+        section_id TEXT,
+        type TEXT NOT NULL,
+        input TEXT NOT NULL,
+        status TEXT NOT NULL,
+        claimed REAL,
+        seq INTEGER,
+        result TEXT,
+        error TEXT,
+        PRIMARY KEY (job_id, idx)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS job_items_status ON job_items (status, job_id)",
+    "CREATE INDEX IF NOT EXISTS jobs_user ON jobs (user_id, status)",
+)
+
+_JOB_COLUMNS = ("id", "user_id", "mode", "jd_mode", "status", "total", "completed", "failed", "batch_id", "batch_file", "polled", "created", "updated")
+
+# Item: (resume index, section id, section type, input as a dict)
+NewItem = Tuple[int, Optional[str], str, Dict[str, Any]]
+
+
+class JobStore:
+    """
+    Job and per-section item state in SQLite. The item table doubles as the
+    work queue: workers claim pending items under BEGIN IMMEDIATE, so several
+    processes can share one database file without handing out an item twice.
+    Finished items get a per-job sequence number for incremental reads.
+    """
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        for statement in _SCHEMA:
+            self._conn.execute(statement)
+
+    def _transaction(self, fn):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._conn)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return result
+
+    def create_job(self, user_id: str, mode: str, jd_mode: Optional[str], items: List[NewItem]) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+
+        def insert(conn):
+            conn.execute(
+                "INSERT INTO jobs (id, user_id, mode, jd_mode, status, total, created, updated) VALUES (?, ?, ?, ?, 'queued', ?, ?, ?)",
+                (job_id, user_id, mode, jd_mode, len(items), now, now),
+            )
+            conn.executemany(
+                "INSERT INTO job_items (job_id, idx, resume, section_id, type, input, status) VALUES (?, ?, ?, ?, ?, ?, 'pending')",
+                [(job_id, idx, resume, section_id, type_, json.dumps(input)) for idx, (resume, section_id, type_, input) in enumerate(items)],
+            )
+
+        self._transaction(insert)
+        return job_id
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(f"SELECT {', '.join(_JOB_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(zip(_JOB_COLUMNS, row)) if row else None
+
+    def update_job(self, job_id: str, **fields) -> None:
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE jobs SET {assignments}, updated = ? WHERE id = ?", (*fields.values(), time.time(), job_id)
+            )
+
+    def items(self, job_id: str, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        query = "SELECT idx, resume, section_id, type, input FROM job_items WHERE job_id = ?"
+        params: Tuple = (job_id,)
+        if status:
+            query += " AND status = ?"
+            params += (status,)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY idx", params).fetchall()
+        return [{"idx": r[0], "resume": r[1], "id": r[2], "type": r[3], "input": json.loads(r[4])} for r in rows]
+
+    def finished_items(self, job_id: str, after_seq: int = 0) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, idx, resume, section_id, type, status, result, error FROM job_items "
+                "WHERE job_id = ? AND seq > ? ORDER BY seq",
+                (job_id, after_seq),
+            ).fetchall()
+        finished = []
+        for seq, idx, resume, section_id, type_, status, result, error in rows:
+            item = {"seq": seq, "index": idx, "resume": resume, "id": section_id, "type": type_, "status": status}
+            if status == "ok":
+                item["description"] = json.loads(result)
+            else:
+                item["error"] = error
+            finished.append(item)
+        return finished
+
+    def claim_next(self) -> Optional[Dict[str, Any]]:
+        """Takes the oldest pending item of a live job, or returns None."""
+        now = time.time()
+
+        def claim(conn):
+            row = conn.execute(
+                "SELECT i.job_id, i.idx, i.type, i.input, j.user_id, j.jd_mode FROM job_items i "
+                "JOIN jobs j ON j.id = i.job_id "
+                "WHERE i.status = 'pending' AND j.mode = 'live' ORDER BY j.created, i.idx LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE job_items SET status = 'running', claimed = ? WHERE job_id = ? AND idx = ?", (now, row[0], row[1]))
+            conn.execute("UPDATE jobs SET status = 'running', updated = ? WHERE id = ? AND status = 'queued'", (now, row[0]))
+            return {"job_id": row[0], "idx": row[1], "type": row[2], "input": json.loads(row[3]), "user_id": row[4], "jd_mode": row[5]}
+
+        return self._transaction(claim)
+
+    def release(self, job_id: str, idx: int) -> None:
+        # Hand a claimed item back, e.g. when upstream is shedding load
+        with self._lock:
+            self._conn.execute(
+                "UPDATE job_items SET status = 'pending', claimed = NULL WHERE job_id = ? AND idx = ? AND status = 'running'",
+                (job_id, idx),
+            )
+
+    def requeue_stale(self, older_than: float) -> int:
+        # Items claimed by a worker that died (process restart) go back to the queue
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE job_items SET status = 'pending', claimed = NULL WHERE status = 'running' AND claimed < ?",
+                (time.time() - older_than,),
+            )
+        return cursor.rowcount
+
+    def finish_item(self, job_id: str, idx: int, result: Any = None, error: Optional[str] = None) -> bool:
+        """Records an item's outcome; False if it had already finished."""
+        now = time.time()
+
+        def finish(conn):
+            row = conn.execute("SELECT seq FROM job_items WHERE job_id = ? AND idx = ?", (job_id, idx)).fetchone()
+            if row is None or row[0] is not None:
+                return False
+            conn.execute(
+                "UPDATE jobs SET completed = completed + 1, failed = failed + ?, updated = ? WHERE id = ?",
+                (1 if error is not None else 0, now, job_id),
+            )
+            completed, total = conn.execute("SELECT completed, total FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            conn.execute(
+                "UPDATE job_items SET status = ?, seq = ?, result = ?, error = ? WHERE job_id = ? AND idx = ?",
+                ("error" if error is not None else "ok", completed, json.dumps(result) if error is None else None, error, job_id, idx),
+            )
+            if completed == total:
+                conn.execute("UPDATE jobs SET status = 'completed' WHERE id = ?", (job_id,))
+            return True
+
+        return self._transaction(finish)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def unfinished_items(self, user_id: str) -> int:
+        """Items of the user's jobs (live or batch) that have no outcome yet."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COALESCE(SUM(total - completed), 0) FROM jobs WHERE user_id = ? AND status != 'completed'",
+                (user_id,),
+            ).fetchone()
+        return row[0]
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows: Iterable = self._conn.execute("SELECT status, COUNT(*) FROM job_items GROUP BY status").fetchall()
+        return dict(rows)
@@ -6,182 +6,66 @@ from app.schemas.validation import (
     CertificationInput,
     PublicationInput,
 )
-from typing import List, Dict, Tuple
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from pydantic import BaseModel
+import os
+from app import config  # noqa: F401  (loads .env)
+from app.services.job_digest import job_description_text
+from app.services.sections import ALL_TOOLS, SECTIONS, SectionSpec, create_system_message, create_tool  # noqa: F401
 
-def create_system_message(section_type: str) -> Dict[str, str]:
-    content = (
-        "You are an ATS-optimized resume expert. "
-        + ("Craft a professional summary." if section_type == "summary" else f"Generate a detailed, keyword-rich description for a {section_type} entry.")
-    )
-    return {"role": "system", "content": content}
+# "legacy" keeps the original per-section prompts. "prefix" orders every
+# prompt from most- to least-shared content (static preamble, all tool
+# schemas, job description, entry fields) so consecutive calls share a long
+# token prefix and the provider's automatic prompt caching engages.
+PROMPT_LAYOUT = os.getenv("PROMPT_LAYOUT", "legacy").lower()
 
-def create_tool(tool_name: str, is_array_output: bool) -> Dict:
-    return {
-        "type": "function",
-        "function": {
-            "name": tool_name,
-            "description": f"Generates {tool_name.replace('generate_', '').replace('_description', '')}",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "description": (
-                        {"type": "array", "items": {"type": "string"}} if is_array_output else {"type": "string"}
-                    )
-                },
-                "required": ["description"],
-            },
-        },
-    }
+STATIC_SYSTEM_PREAMBLE = (
+    "You are an ATS-optimized resume expert. You craft professional summaries and detailed, "
+    "keyword-rich descriptions for education, experience, project, certification and publication "
+    "entries, tailored to the target job when one is given. Always answer by calling the requested function."
+)
+_STATIC_SYSTEM_MESSAGE = {"role": "system", "content": STATIC_SYSTEM_PREAMBLE}
+
+Prompt = Tuple[List[Dict], Sequence[Dict], str, str]
+
+def build_section_prompt(spec: SectionSpec, input: BaseModel, jd_mode: Optional[str] = None) -> Prompt:
+    parts = spec.format_parts(input)
+    job = job_description_text(getattr(input, "jobDescription", None), jd_mode)
+
+    if PROMPT_LAYOUT == "prefix":
+        messages = [
+            _STATIC_SYSTEM_MESSAGE,
+            {"role": "user", "content": f"Target job: {job or 'not specified'}"},
+            {"role": "user", "content": spec.instruction + ", ".join(parts) + "."},
+        ]
+        return messages, ALL_TOOLS, spec.tool_name, spec.name
+
+    if spec.job_first:
+        parts.insert(0, f"job: {job}")
+    else:
+        parts.append(f"for target job: {job}")
+    messages = [spec.system_message, {"role": "user", "content": spec.instruction + ", ".join(parts) + "."}]
+    return messages, spec.tools, spec.tool_name, spec.name
+
+def generate_summary(input: SummaryInput, jd_mode: Optional[str] = None) -> Prompt:
+    return build_section_prompt(SECTIONS["summary"], input, jd_mode)
+
+def generate_education(input: EducationInput, jd_mode: Optional[str] = None) -> Prompt:
+    return build_section_prompt(SECTIONS["education"], input, jd_mode)
 
-def generate_summary(input: SummaryInput) -> Tuple[List[Dict], List[Dict], str, str]:
-    parts = [
-        f"job: {input.jobDescription}",
-        f"position: {input.targetPosition}",
-        f"company: {input.targetCompany}"
-    ]
-    if input.fullName:
-        parts.append(f"candidate name: {input.fullName}")
-    if input.rawSummary:
-        parts.append(f"summary hints: {input.rawSummary}")
-    if input.rawDescription:
-        parts.append(f"additional notes: {'; '.join(input.rawDescription)}")
-    user_content = (
-        "Generate a concise, ATS-friendly summary using "
-        + ", ".join(parts)
-        + "."
-    )
-    messages = [create_system_message("summary"), {"role": "user", "content": user_content}]
-    tools = [create_tool("generate_summary", False)]
-    return messages, tools, "generate_summary", "summary"
+def generate_experience(input: ExperienceInput, jd_mode: Optional[str] = None) -> Prompt:
+    return build_section_prompt(SECTIONS["experience"], input, jd_mode)
 
-def generate_education(input: EducationInput) -> Tuple[List[Dict], List[Dict], str, str]:
-    parts = [
-        f"institution: {input.institution}",
-        f"degree: {input.degree}"
-    ]
-    if input.fieldOfStudy:
-        parts.append(f"field of study: {input.fieldOfStudy}")
-    if input.location:
-        parts.append(f"location: {input.location}")
-    if input.startDate or input.endDate:
-        parts.append(
-            f"tenure: {input.startDate or 'N/A'} to {input.endDate or 'Present'}"
-        )
-    if input.current:
-        parts.append("currently enrolled")
-    if input.gpa:
-        parts.append(f"GPA: {input.gpa}")
-    if input.rawDescription:
-        parts.append(f"notes: {'; '.join(input.rawDescription)}")
-    if input.achievements:
-        parts.append(f"achievements: {'; '.join(input.achievements)}")
-    parts.append(f"for target job: {input.jobDescription}")
-    user_content = (
-        "Generate ATS-optimized education bullets including "
-        + ", ".join(parts)
-        + "."
-    )
-    messages = [create_system_message("education"), {"role":"user","content":user_content}]
-    tools = [create_tool("generate_education_description", True)]
-    return messages, tools, "generate_education_description", "education"
+def generate_project(input: ProjectInput, jd_mode: Optional[str] = None) -> Prompt:
+    return build_section_prompt(SECTIONS["project"], input, jd_mode)
 
-def generate_experience(input: ExperienceInput) -> Tuple[List[Dict], List[Dict], str, str]:
-    parts = [
-        f"company: {input.company}",
-        f"position: {input.position}"
-    ]
-    if input.location:
-        parts.append(f"location: {input.location}")
-    if input.startDate or input.endDate:
-        parts.append(
-            f"tenure: {input.startDate or 'N/A'} to {input.endDate or 'Present'}"
-        )
-    if input.current:
-        parts.append("currently in role")
-    if input.technologies:
-        parts.append(f"technologies: {', '.join(input.technologies)}")
-    if input.achievements:
-        parts.append(f"achievements: {'; '.join(input.achievements)}")
-    if input.rawDescription:
-        parts.append(f"notes: {'; '.join(input.rawDescription)}")
-    parts.append(f"for target job: {input.jobDescription}")
-    user_content = (
-        "Generate ATS-friendly experience description with "
-        + ", ".join(parts)
-        + "."
-    )
-    messages = [create_system_message("experience"), {"role":"user","content":user_content}]
-    tools = [create_tool("generate_experience_description", True)]
-    return messages, tools, "generate_experience_description", "experience"
+def generate_certification(input: CertificationInput, jd_mode: Optional[str] = None) -> Prompt:
+    return build_section_prompt(SECTIONS["certification"], input, jd_mode)
 
-def generate_project(input: ProjectInput) -> Tuple[List[Dict], List[Dict], str, str]:
-    parts = [f"project: {input.projectName}"]
-    if input.role:
-        parts.append(f"role: {input.role}")
-    if input.organization:
-        parts.append(f"organization: {input.organization}")
-    if input.url:
-        parts.append(f"url: {input.url}")
-    if input.startDate or input.endDate:
-        parts.append(
-            f"duration: {input.startDate or 'N/A'} to {input.endDate or 'Present'}"
-        )
-    if input.ongoing:
-        parts.append("ongoing project")
-    if input.technologies:
-        parts.append(f"technologies: {', '.join(input.technologies)}")
-    if input.achievements:
-        parts.append(f"achievements: {'; '.join(input.achievements)}")
-    if input.rawDescription:
-        parts.append(f"notes: {'; '.join(input.rawDescription)}")
-    parts.append(f"for target job: {input.jobDescription}")
-    user_content = (
-        "Generate ATS-optimized project bullets using "
-        + ", ".join(parts)
-        + "."
-    )
-    messages = [create_system_message("project"), {"role":"user","content":user_content}]
-    tools = [create_tool("generate_project_description", True)]
-    return messages, tools, "generate_project_description", "project"
+def generate_publication(input: PublicationInput, jd_mode: Optional[str] = None) -> Prompt:
+    return build_section_prompt(SECTIONS["publication"], input, jd_mode)
 
-def generate_certification(input: CertificationInput) -> Tuple[List[Dict], List[Dict], str, str]:
-    parts = [f"certification: {input.certificationName}"]
-    if input.issuer:
-        parts.append(f"issued by: {input.issuer}")
-    if input.issueDate:
-        parts.append(f"issue date: {input.issueDate}")
-    if input.expirationDate:
-        parts.append(f"expires: {input.expirationDate}")
-    if input.credentialUrl:
-        parts.append(f"url: {input.credentialUrl}")
-    if input.rawDescription:
-        parts.append(f"notes: {input.rawDescription}")
-    parts.append(f"for target job: {input.jobDescription}")
-    user_content = (
-        "Generate a concise, ATS-friendly certification description with "
-        + ", ".join(parts)
-        + "."
-    )
-    messages = [create_system_message("certification"), {"role":"user","content":user_content}]
-    tools = [create_tool("generate_certification_description", False)]
-    return messages, tools, "generate_certification_description", "certification"
+def _builder(spec: SectionSpec) -> Callable[..., Prompt]:
+    return lambda input, jd_mode=None: build_section_prompt(spec, input, jd_mode)
 
-def generate_publication(input: PublicationInput) -> Tuple[List[Dict], List[Dict], str, str]:
-    parts = [f"title: {input.title}", f"publisher: {input.publisher}"]
-    if input.publicationDate:
-        parts.append(f"date: {input.publicationDate}")
-    if input.authors:
-        parts.append(f"authors: {', '.join(input.authors)}")
-    if input.url:
-        parts.append(f"url: {input.url}")
-    if input.rawDescription:
-        parts.append(f"notes: {input.rawDescription}")
-    parts.append(f"for target job: {input.jobDescription}")
-    user_content = (
-        "Generate ATS-optimized publication bullets using "
-        + ", ".join(parts)
-        + "."
-    )
-    messages = [create_system_message("publication"), {"role":"user","content":user_content}]
-    tools = [create_tool("generate_publication_description", True)]
-    return messages, tools, "generate_publication_description", "publication"
+SECTION_BUILDERS = {name: _builder(spec) for name, spec in SECTIONS.items()}
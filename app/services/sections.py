@@ -0,0 +1,260 @@
+from dataclasses import dataclass, field
+from typing import Annotated, Callable, Dict, List, Literal, Optional, Tuple, Type, Union
+
+from pydantic import BaseModel, Field, create_model
+
+from app.schemas.validation import (
+    SummaryInput,
+    EducationInput,
+    ExperienceInput,
+    ProjectInput,
+    CertificationInput,
+    PublicationInput,
+)
+
+# A rule turns one input into one prompt fragment, or None to leave it out
+Rule = Callable[[BaseModel], Optional[str]]
+
+
+def text(label: str, attr: str, always: bool = False) -> Rule:
+    prefix = f"{label}: "
+    if always:
+        return lambda input: prefix + str(getattr(input, attr))
+
+    def rule(input: BaseModel) -> Optional[str]:
+        value = getattr(input, attr)
+        return prefix + str(value) if value else None
+    return rule
+
+
+def joined(label: str, attr: str, separator: str) -> Rule:
+    prefix = f"{label}: "
+
+    def rule(input: BaseModel) -> Optional[str]:
+        value = getattr(input, attr)
+        return prefix + separator.join(value) if value else None
+    return rule
+
+
+def flag(attr: str, fragment: str) -> Rule:
+    return lambda input: fragment if getattr(input, attr) else None
+
+
+def span(label: str, start_attr: str, end_attr: str) -> Rule:
+    def rule(input: BaseModel) -> Optional[str]:
+        start, end = getattr(input, start_attr), getattr(input, end_attr)
+        if not (start or end):
+            return None
+        return f"{label}: {start or 'N/A'} to {end or 'Present'}"
+    return rule
+
+
+def create_system_message(section_type: str) -> Dict[str, str]:
+    content = (
+        "You are an ATS-optimized resume expert. "
+        + ("Craft a professional summary." if section_type == "summary" else f"Generate a detailed, keyword-rich description for a {section_type} entry.")
+    )
+    return {"role": "system", "content": content}
+
+
+def create_tool(tool_name: str, is_array_output: bool) -> Dict:
+    return {
+        "type": "function",
+        "function": {
+            "name": tool_name,
+            "description": f"Generates {tool_name.replace('generate_', '').replace('_description', '')}",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "description": (
+                        {"type": "array", "items": {"type": "string"}} if is_array_output else {"type": "string"}
+                    )
+                },
+                "required": ["description"],
+            },
+        },
+    }
+
+
+@dataclass(frozen=True)
+class SectionSpec:
+    """
+    Everything needed to serve one section type. The tool schema and system
+    message are built once here and shared by every request; treat them as
+    read-only.
+    """
+
+    name: str
+    schema: Type[BaseModel]
+    tool_name: str
+    instruction: str
+    rules: Tuple[Rule, ...]
+    is_array_output: bool
+    # The summary prompt leads with the job description instead of ending with it
+    job_first: bool = False
+    path: str = field(init=False)
+    tools: Tuple[Dict, ...] = field(init=False)
+    system_message: Dict[str, str] = field(init=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "path", f"/generate-{self.name}")
+        object.__setattr__(self, "tools", (create_tool(self.tool_name, self.is_array_output),))
+        object.__setattr__(self, "system_message", create_system_message(self.name))
+
+    def format_parts(self, input: BaseModel) -> List[str]:
+        parts = []
+        for rule in self.rules:
+            part = rule(input)
+            if part is not None:
+                parts.append(part)
+        return parts
+
+
+SECTIONS: Dict[str, SectionSpec] = {}
+
+
+def register(spec: SectionSpec) -> SectionSpec:
+    SECTIONS[spec.name] = spec
+    return spec
+
+
+register(SectionSpec(
+    name="summary",
+    schema=SummaryInput,
+    tool_name="generate_summary",
+    instruction="Generate a concise, ATS-friendly summary using ",
+    rules=(
+        text("position", "targetPosition", always=True),
+        text("company", "targetCompany", always=True),
+        text("candidate name", "fullName"),
+        text("summary hints", "rawSummary"),
+        joined("additional notes", "rawDescription", "; "),
+    ),
+    is_array_output=False,
+    job_first=True,
+))
+
+register(SectionSpec(
+    name="education",
+    schema=EducationInput,
+    tool_name="generate_education_description",
+    instruction="Generate ATS-optimized education bullets including ",
+    rules=(
+        text("institution", "institution", always=True),
+        text("degree", "degree", always=True),
+        text("field of study", "fieldOfStudy"),
+        text("location", "location"),
+        span("tenure", "startDate", "endDate"),
+        flag("current", "currently enrolled"),
+        text("GPA", "gpa"),
+        joined("notes", "rawDescription", "; "),
+        joined("achievements", "achievements", "; "),
+    ),
+    is_array_output=True,
+))
+
+register(SectionSpec(
+    name="experience",
+    schema=ExperienceInput,
+    tool_name="generate_experience_description",
+    instruction="Generate ATS-friendly experience description with ",
+    rules=(
+        text("company", "company", always=True),
+        text("position", "position", always=True),
+        text("location", "location"),
+        span("tenure", "startDate", "endDate"),
+        flag("current", "currently in role"),
+        joined("technologies", "technologies", ", "),
+        joined("achievements", "achievements", "; "),
+        joined("notes", "rawDescription", "; "),
+    ),
+    is_array_output=True,
+))
+
+register(SectionSpec(
+    name="project",
+    schema=ProjectInput,
+    tool_name="generate_project_description",
+    instruction="Generate ATS-optimized project bullets using ",
+    rules=(
+        text("project", "projectName", always=True),
+        text("role", "role"),
+        text("organization", "organization"),
+        text("url", "url"),
+        span("duration", "startDate", "endDate"),
+        flag("ongoing", "ongoing project"),
+        joined("technologies", "technologies", ", "),
+        joined("achievements", "achievements", "; "),
+        joined("notes", "rawDescription", "; "),
+    ),
+    is_array_output=True,
+))
+
+register(SectionSpec(
+    name="certification",
+    schema=CertificationInput,
+    tool_name="generate_certification_description",
+    instruction="Generate a concise, ATS-friendly certification description with ",
+    rules=(
+        text("certification", "certificationName", always=True),
+        text("issued by", "issuer"),
+        text("issue date", "issueDate"),
+        text("expires", "expirationDate"),
+        text("url", "credentialUrl"),
+        text("notes", "rawDescription"),
+    ),
+    is_array_output=False,
+))
+
+register(SectionSpec(
+    name="publication",
+    schema=PublicationInput,
+    tool_name="generate_publication_description",
+    instruction="Generate ATS-optimized publication bullets using ",
+    rules=(
+        text("title", "title", always=True),
+        text("publisher", "publisher", always=True),
+        text("date", "publicationDate"),
+        joined("authors", "authors", ", "),
+        text("url", "url"),
+        text("notes", "rawDescription"),
+    ),
+    is_array_output=True,
+))
+
+# Every section's tool in registry order; the prefix prompt layout sends all
+# of them so the tool block is identical across sections
+ALL_TOOLS: Tuple[Dict, ...] = tuple(spec.tools[0] for spec in SECTIONS.values())
+
+
+# Whole-resume batch input: one tagged model per registered section type
+def _section_model(spec: SectionSpec) -> Type[BaseModel]:
+    return create_model(
+        spec.schema.__name__.replace("Input", "") + "Section",
+        type=(Literal[spec.name], ...),
+        id=(Optional[str], None),
+        input=(spec.schema, ...),
+    )
+
+
+ResumeSection = Annotated[
+    Union[tuple(_section_model(spec) for spec in SECTIONS.values())],
+    Field(discriminator="type"),
+]
+
+
+MAX_RESUME_SECTIONS = 25
+# The per-user job budget (JOBS_MAX_PENDING_ITEMS) defaults to the largest job
+# these bounds allow, so any valid job fits when the user has nothing queued
+MAX_JOB_RESUMES = 500
+
+
+class ResumeInput(BaseModel):
+    sections: List[ResumeSection] = Field(min_length=1, max_length=MAX_RESUME_SECTIONS)
+
+
+# Bulk jobs: many resumes' worth of sections, processed in the background
+class JobInput(BaseModel):
+    resumes: List[ResumeInput] = Field(min_length=1, max_length=MAX_JOB_RESUMES)
+    mode: Literal["live", "batch"] = "live"
+    jd_mode: Optional[Literal["raw", "condensed"]] = None
@@ -0,0 +1,79 @@
+import asyncio
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Deque, Optional, Tuple
+
+
+class Signal:
+    """Wakes everything waiting on it; each notify swaps in a fresh event, so nothing needs clearing."""
+
+    def __init__(self):
+        self._event = asyncio.Event()
+
+    def notify(self) -> None:
+        self._event.set()
+        self._event = asyncio.Event()
+
+    async def wait(self, timeout: Optional[float] = None) -> bool:
+        # False if the timeout passed first
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+
+class Broadcast:
+    """
+    Items from one producer, numbered from 1 and buffered so any number of
+    subscribers, including late joiners, receive them in order. A subclass
+    may bound the buffer in trim(); subscribers then continue from the
+    oldest item still held.
+    """
+
+    def __init__(self):
+        self.items: Deque[Tuple[int, Any]] = deque()
+        self.next_seq = 1
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        # Called when the last subscriber leaves before the producer finished
+        self.on_detached: Optional[Callable[["Broadcast"], None]] = None
+        self._changed = Signal()
+
+    def publish(self, item: Any) -> None:
+        self.items.append((self.next_seq, item))
+        self.next_seq += 1
+        self.trim()
+        self._changed.notify()
+
+    def trim(self) -> None:
+        pass
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        self.done = True
+        self.error = error
+        self._changed.notify()
+
+    async def subscribe(self, after: int = 0, keepalive: Optional[float] = None, idle: Any = None) -> AsyncIterator[Any]:
+        """
+        Every item after sequence number `after`, until the producer finishes
+        (re-raising its error, if any). With keepalive, `idle` is yielded
+        whenever that many seconds pass without a new item.
+        """
+        self.subscribers += 1
+        try:
+            while True:
+                while self.items and self.items[-1][0] > after:
+                    index = max(0, after + 1 - self.items[0][0])
+                    after, item = self.items[index]
+                    yield item
+                if self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                if not await self._changed.wait(keepalive):
+                    yield idle
+        finally:
+            self.subscribers -= 1
+            if not self.subscribers and not self.done and self.on_detached is not None:
+                self.on_detached(self)
@@ -0,0 +1,72 @@
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from app import config  # noqa: F401  (loads .env)
+from app.utils import metrics, request_context
+
+# Most variants one request may ask for (the OpenAI "n" parameter)
+CANDIDATES_MAX = int(os.getenv("CANDIDATES_MAX", "5"))
+# How long unused variants stay available for a regenerate
+CANDIDATE_POOL_TTL = float(os.getenv("CANDIDATE_POOL_TTL", "600"))
+CANDIDATE_POOL_MAX_KEYS = int(os.getenv("CANDIDATE_POOL_MAX_KEYS", "2048"))
+
+stored = metrics.REGISTRY.counter("candidate_pool_stored_total", "Unused candidates kept for a later regenerate", ("section",))
+served = metrics.REGISTRY.counter("candidate_pool_served_total", "Regenerates served from a kept candidate", ("section",))
+
+
+class CandidatePool:
+    """
+    Unused completion variants per (user, prompt), handed out oldest first
+    on regenerate. LRU over keys; every key expires CANDIDATE_POOL_TTL after
+    its candidates were stored.
+    """
+
+    def __init__(self, max_keys: int, ttl: float):
+        self.max_keys = max_keys
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, deque]]" = OrderedDict()
+
+    def put(self, key: str, candidates: List[Dict]) -> None:
+        if not candidates:
+            return
+        scoped = (request_context.user_id.get(), key)
+        self._entries[scoped] = (time.time() + self.ttl, deque(candidates))
+        self._entries.move_to_end(scoped)
+        while len(self._entries) > self.max_keys:
+            self._entries.popitem(last=False)
+        stored.inc((request_context.section.get(),), len(candidates))
+
+    def take(self, key: str) -> Optional[Dict]:
+        scoped = (request_context.user_id.get(), key)
+        entry = self._entries.get(scoped)
+        if entry is None:
+            return None
+        expires, candidates = entry
+        if expires < time.time():
+            del self._entries[scoped]
+            return None
+        candidate = candidates.popleft()
+        if not candidates:
+            del self._entries[scoped]
+        served.inc((request_context.section.get(),))
+        return candidate
+
+    def __len__(self) -> int:
+        return sum(len(candidates) for _, candidates in self._entries.values())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "keys": len(self._entries),
+            "candidates": len(self),
+            "stored": stored.total(),
+            "served": served.total(),
+        }
+
+
+candidate_pool = CandidatePool(CANDIDATE_POOL_MAX_KEYS, CANDIDATE_POOL_TTL)
+
+metrics.REGISTRY.register_collector(lambda: [
+    ("candidate_pool_entries", "Unused candidates waiting for a regenerate", len(candidate_pool)),
+])
@@ -0,0 +1,219 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import Request
+
+from app import config  # noqa: F401  (loads .env)
+from app.utils.log import logger
+from app.utils.metrics import REGISTRY
+
+CACHE_BACKEND = os.getenv("COMPLETION_CACHE", "memory").lower()  # memory | sqlite | off
+CACHE_TTL = float(os.getenv("COMPLETION_CACHE_TTL", "3600"))
+CACHE_MAX_ENTRIES = int(os.getenv("COMPLETION_CACHE_MAX_ENTRIES", "512"))
+CACHE_PATH = os.getenv("COMPLETION_CACHE_PATH", "/tmp/completion_cache.sqlite3")
+
+
+# Registry tool tuples are immutable and shared, so their canonical JSON is
+# computed once and reused (keyed by identity)
+_tools_json: Dict[int, Tuple[Any, str]] = {}
+
+
+def _canonical(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def _serialize_tools(tools: Sequence[Dict]) -> str:
+    entry = _tools_json.get(id(tools))
+    if entry is not None and entry[0] is tools:
+        return entry[1]
+    serialized = _canonical(tools)
+    if isinstance(tools, tuple):
+        _tools_json[id(tools)] = (tools, serialized)
+    return serialized
+
+
+def cache_key(model: str, messages: List[Dict], tools: Sequence[Dict], tool_name: str) -> str:
+    # Canonical JSON so dict ordering / whitespace never changes the key
+    canonical = _canonical([model, messages, tool_name]) + _serialize_tools(tools)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def cache_bypassed(request: Request) -> bool:
+    cache_control = request.headers.get("cache-control", "").lower()
+    return "no-cache" in cache_control or "no-store" in cache_control
+
+
+class MemoryCache:
+    """In-process LRU with a per-entry TTL."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evictions = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.time():
+            del self._entries[key]
+            self.evictions += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self._entries[key] = (time.time() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCache:
+    """
+    Disk-backed store, kept under /tmp so a warm Lambda container keeps its
+    entries across invocations.
+    """
+
+    def __init__(self, path: str, max_entries: int, ttl: float):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS completions ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS completions_accessed ON completions (accessed)")
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+                self.evictions += 1
+                return None
+            self._conn.execute("UPDATE completions SET accessed = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions (key, value, expires, accessed) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + self.ttl, now),
+            )
+            expired = self._conn.execute("DELETE FROM completions WHERE expires < ?", (now,)).rowcount
+            overflow = self._conn.execute(
+                "DELETE FROM completions WHERE key IN ("
+                "SELECT key FROM completions ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+            self.evictions += max(expired, 0) + max(overflow, 0)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CompletionCache:
+    """
+    Cache of parsed tool-call arguments keyed by cache_key(). The in-process
+    LRU is always consulted first; the optional disk tier sits behind it.
+    """
+
+    def __init__(self, memory: MemoryCache, disk: Optional[SQLiteCache] = None):
+        self.memory = memory
+        self.disk = disk
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Dict]:
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: Dict) -> None:
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "sqlite" if self.disk is not None else "memory",
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.memory.evictions + (self.disk.evictions if self.disk is not None else 0),
+            "entries": len(self.memory),
+            "disk_entries": len(self.disk) if self.disk is not None else None,
+        }
+
+
+def _create_cache() -> Optional[CompletionCache]:
+    if CACHE_BACKEND == "off":
+        return None
+    memory = MemoryCache(CACHE_MAX_ENTRIES, CACHE_TTL)
+    if CACHE_BACKEND == "sqlite":
+        try:
+            return CompletionCache(memory, SQLiteCache(CACHE_PATH, CACHE_MAX_ENTRIES, CACHE_TTL))
+        except sqlite3.Error as e:
+            logger.warning("completion cache at %s unavailable, using memory only: %s", CACHE_PATH, e)
+    return CompletionCache(memory)
+
+
+completion_cache = _create_cache()
+
+
+def after_fork() -> None:
+    # A SQLite connection must not be shared with the parent process
+    if completion_cache is not None and completion_cache.disk is not None:
+        completion_cache.disk = SQLiteCache(CACHE_PATH, CACHE_MAX_ENTRIES, CACHE_TTL)
+
+
+def close() -> None:
+    if completion_cache is not None and completion_cache.disk is not None:
+        completion_cache.disk.close()
+
+
+def _collect() -> List[Tuple[str, str, float]]:
+    if completion_cache is None:
+        return []
+    stats = completion_cache.stats()
+    return [
+        ("completion_cache_hits_total", "Completion cache hits", stats["hits"]),
+        ("completion_cache_misses_total", "Completion cache misses", stats["misses"]),
+        ("completion_cache_evictions_total", "Completion cache evictions (LRU and TTL)", stats["evictions"]),
+        ("completion_cache_entries", "Entries in the in-process completion cache", stats["entries"]),
+    ]
+
+
+REGISTRY.register_collector(_collect)
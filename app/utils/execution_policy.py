@@ -0,0 +1,203 @@
+import asyncio
+import inspect
+import json
+import os
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, replace
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+
+from app import config  # noqa: F401  (loads .env)
+from app.utils import metrics, request_context
+from app.utils.log import logger
+from app.utils.upstream_governor import CLOSED, REQUEST_BUDGET_SECONDS, UpstreamOverloaded, governor, is_overload_error
+
+# Hedges are only fired once this many latencies have been seen for a series
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+LATENCY_WINDOW = 200
+
+
+@dataclass(frozen=True)
+class ExecutionPolicy:
+    timeout: float = REQUEST_BUDGET_SECONDS
+    max_retries: int = 2
+    backoff_base: float = 0.25
+    backoff_cap: float = 2.0
+    hedge: bool = False
+    hedge_quantile: float = 0.95
+
+
+DEFAULT_POLICY = ExecutionPolicy(
+    timeout=float(os.getenv("UPSTREAM_TIMEOUT", str(REQUEST_BUDGET_SECONDS))),
+    max_retries=int(os.getenv("UPSTREAM_MAX_RETRIES", "2")),
+    backoff_base=float(os.getenv("UPSTREAM_BACKOFF_BASE", "0.25")),
+    backoff_cap=float(os.getenv("UPSTREAM_BACKOFF_CAP", "2.0")),
+    hedge=os.getenv("UPSTREAM_HEDGE", "false").lower() == "true",
+    hedge_quantile=float(os.getenv("UPSTREAM_HEDGE_QUANTILE", "0.95")),
+)
+
+
+def _load_overrides() -> Dict[str, ExecutionPolicy]:
+    # e.g. UPSTREAM_POLICY_OVERRIDES='{"summary": {"hedge": true}, "resume": {"timeout": 28}}'
+    raw = os.getenv("UPSTREAM_POLICY_OVERRIDES")
+    if not raw:
+        return {}
+    try:
+        return {section: replace(DEFAULT_POLICY, **fields) for section, fields in json.loads(raw).items()}
+    except (ValueError, TypeError) as e:
+        logger.warning("invalid UPSTREAM_POLICY_OVERRIDES, using defaults", extra={"fields": {"error": str(e)}})
+        return {}
+
+
+POLICIES = _load_overrides()
+
+
+def policy_for(section: str) -> ExecutionPolicy:
+    return POLICIES.get(section, DEFAULT_POLICY)
+
+
+def set_deadline(section: str) -> float:
+    """Called by the route; everything upstream of it shares this deadline."""
+    started = request_context.started.get() or time.perf_counter()
+    deadline = started + policy_for(section).timeout
+    request_context.deadline.set(deadline)
+    return deadline
+
+
+class DeadlineExceeded(HTTPException):
+    def __init__(self):
+        super().__init__(status_code=504, detail="AI service timed out")
+
+
+# (section, streaming) -> recent upstream latencies, the basis for hedge delays
+_latencies: Dict[Tuple[str, bool], Deque[float]] = {}
+
+
+def observe_latency(series: Tuple[str, bool], seconds: float) -> None:
+    window = _latencies.get(series)
+    if window is None:
+        window = _latencies[series] = deque(maxlen=LATENCY_WINDOW)
+    window.append(seconds)
+
+
+def latency_quantile(series: Tuple[str, bool], q: float) -> Optional[float]:
+    window = _latencies.get(series)
+    if window is None or len(window) < HEDGE_MIN_SAMPLES:
+        return None
+    ordered = sorted(window)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _abandon(task: asyncio.Task, cleanup: Optional[Callable[[Any], Any]]) -> None:
+    if not task.done():
+        task.cancel()
+        # Still clean up if it completes before the cancellation lands
+        task.add_done_callback(lambda t: _abandon(t, cleanup))
+        return
+    if cleanup and not task.cancelled() and task.exception() is None:
+        result = cleanup(task.result())
+        if inspect.isawaitable(result):
+            asyncio.ensure_future(result)
+
+
+async def _hedged(
+    attempt: Callable[[], Awaitable[Any]],
+    policy: ExecutionPolicy,
+    series: Tuple[str, bool],
+    deadline: float,
+    cleanup: Optional[Callable[[Any], Any]],
+) -> Any:
+    section = series[0]
+    primary = asyncio.ensure_future(attempt())
+    tasks = {primary}
+    hedge_after = latency_quantile(series, policy.hedge_quantile) if policy.hedge else None
+    try:
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                raise DeadlineExceeded()
+            timeout = min(remaining, hedge_after) if hedge_after is not None else remaining
+            done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                # Hedge only into spare capacity; never queue behind other requests for it
+                if hedge_after is not None and governor.state == CLOSED and governor.in_flight < governor.limit:
+                    metrics.hedges.inc((section,))
+                    tasks.add(asyncio.ensure_future(attempt()))
+                hedge_after = None
+                continue
+            for task in done:
+                tasks.discard(task)
+                if task.exception() is None:
+                    if task is not primary:
+                        metrics.hedge_wins.inc((section,))
+                    return task.result()
+            if not tasks:
+                # Every attempt in this round failed; surface the primary's error if it's among them
+                failed = primary if primary in done else next(iter(done))
+                raise failed.exception()
+    finally:
+        for task in tasks:
+            _abandon(task, cleanup)
+
+
+async def execute(
+    attempt: Callable[[], Awaitable[Any]],
+    streaming: bool = False,
+    cleanup: Optional[Callable[[Any], Any]] = None,
+) -> Any:
+    """
+    Runs one upstream call under the current section's policy: each try is
+    bounded by the request deadline, overload errors are retried with full
+    jitter backoff while time remains, and a hedge is fired once a try runs
+    past the observed latency quantile. cleanup() receives results that are
+    discarded (a losing hedge that completed anyway).
+    """
+    section = request_context.section.get()
+    policy = policy_for(section)
+    deadline = request_context.deadline.get() or set_deadline(section)
+    series = (section, streaming)
+    metrics.upstream_calls.inc((section,))
+
+    tries = 0
+    while True:
+        started = time.perf_counter()
+        try:
+            result = await _hedged(attempt, policy, series, deadline, cleanup)
+        except (UpstreamOverloaded, DeadlineExceeded):
+            raise
+        except Exception as e:
+            if not is_overload_error(e) or tries >= policy.max_retries:
+                raise
+            delay = random.uniform(0, min(policy.backoff_cap, policy.backoff_base * 2 ** tries))
+            # Retry only if a typical call still fits before the deadline
+            expected = latency_quantile(series, 0.5) or governor.latency
+            if time.perf_counter() + delay + expected >= deadline:
+                raise
+            tries += 1
+            metrics.upstream_retries.inc((section,))
+            logger.info("upstream_retry", extra={"fields": {"attempt": tries, "delay_ms": round(delay * 1000), "error": type(e).__name__}})
+            await asyncio.sleep(delay)
+            continue
+        observe_latency(series, time.perf_counter() - started)
+        return result
+
+
+def hedge_stats() -> Dict[str, Dict[str, float]]:
+    stats = {}
+    for (section,), calls in metrics.upstream_calls.series.items():
+        hedges = metrics.hedges.series.get((section,), 0)
+        wins = metrics.hedge_wins.series.get((section,), 0)
+        stats[section] = {
+            "calls": calls,
+            "retries": metrics.upstream_retries.series.get((section,), 0),
+            "hedges": hedges,
+            "hedge_wins": wins,
+            "hedge_rate": round(hedges / calls, 4) if calls else 0.0,
+            "win_rate": round(wins / hedges, 4) if hedges else 0.0,
+            "p95_s": latency_quantile((section, False), 0.95),
+            "stream_p95_s": latency_quantile((section, True), 0.95),
+        }
+    return stats
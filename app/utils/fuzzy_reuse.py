@@ -0,0 +1,177 @@
+import hashlib
+import os
+import re
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from app import config  # noqa: F401  (loads .env)
+from app.utils import metrics, request_context
+
+# Reuse the result of a recent, near-identical request from the same user for
+# the same section instead of calling the model again
+FUZZY_REUSE = os.getenv("FUZZY_REUSE", "on").lower() != "off"
+FUZZY_REUSE_THRESHOLD = float(os.getenv("FUZZY_REUSE_THRESHOLD", "0.85"))
+FUZZY_REUSE_TTL = int(os.getenv("FUZZY_REUSE_TTL", "3600"))
+FUZZY_REUSE_MAX_ENTRIES = int(os.getenv("FUZZY_REUSE_MAX_ENTRIES", "4096"))
+# A regenerate (Cache-Control: no-cache) this soon after a fuzzy hit on the
+# same section counts as a false match
+FUZZY_REGENERATE_WINDOW = int(os.getenv("FUZZY_REGENERATE_WINDOW", "300"))
+
+# Compared by similarity, each field on its own so a long job description
+# can't outweigh the user's notes; every other field must match after
+# normalisation
+FREE_TEXT_FIELDS = ("jobDescription", "rawDescription", "rawSummary", "achievements")
+
+_TOKEN = re.compile(r"[a-z0-9][a-z0-9+#.]*")
+_RECENT_HITS_LIMIT = 10000
+
+lookups = metrics.REGISTRY.counter("fuzzy_lookups_total", "Requests checked against the near-duplicate index", ("section",))
+hits = metrics.REGISTRY.counter("fuzzy_hits_total", "Requests served from a near-duplicate result", ("section",))
+rejected = metrics.REGISTRY.counter("fuzzy_rejected_candidates_total", "LSH candidates whose exact similarity fell below the threshold", ("section",))
+false_matches = metrics.REGISTRY.counter("fuzzy_false_matches_total", "Fuzzy hits followed by an explicit regenerate", ("section",))
+
+
+def tokens(text: str) -> List[str]:
+    return [t.rstrip(".") for t in _TOKEN.findall(text.lower())]
+
+
+def _normalised(value: Any) -> Any:
+    if isinstance(value, str):
+        return " ".join(tokens(value))
+    if isinstance(value, list):
+        # Order carries no meaning for tags such as technologies or authors
+        return sorted(_normalised(v) for v in value)
+    return value
+
+
+def _shingles(field: str, value: Any) -> Iterable[int]:
+    texts = value if isinstance(value, list) else [value]
+    for text in texts:
+        words = tokens(str(text))
+        for i, word in enumerate(words):
+            yield zlib.crc32(f"{field}:{word}".encode())
+            if i:
+                yield zlib.crc32(f"{field}:{words[i - 1]} {word}".encode())
+
+
+@dataclass(frozen=True)
+class SimilarKey:
+    scope: Tuple[str, str, str]  # (user, section, digest of the exact-match fields)
+    shingles: Tuple[int, ...]
+    # Per free-text field; a match needs each to reach the threshold
+    fields: Tuple[Tuple[str, Tuple[int, ...]], ...] = ()
+
+    @property
+    def section(self) -> str:
+        return self.scope[1]
+
+
+_index = None
+# (user, section) -> time of the last fuzzy hit, for false-match detection
+_recent_hits: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+
+
+def get_index():
+    global _index
+    if _index is None:
+        # Deferred: numpy is only needed once the first section is looked up
+        from app.utils.minhash import MinHashLSH
+
+        _index = MinHashLSH(FUZZY_REUSE_MAX_ENTRIES)
+    return _index
+
+
+def similar_key(section: str, input: BaseModel, jd_mode: Optional[str], use_cache: bool, opted_in: bool) -> Optional[SimilarKey]:
+    if not FUZZY_REUSE:
+        return None
+    user = request_context.user_id.get()
+    if not use_cache:
+        _note_regenerate(user, section)
+        return None
+    if not opted_in:
+        return None
+
+    fields = input.model_dump(exclude_none=True)
+    exact = {k: _normalised(v) for k, v in fields.items() if k not in FREE_TEXT_FIELDS}
+    exact["_jd_mode"] = jd_mode
+    digest = hashlib.sha256(repr(sorted(exact.items())).encode()).hexdigest()[:16]
+    shingles = set()
+    per_field = []
+    for field in FREE_TEXT_FIELDS:
+        if field in fields:
+            field_shingles = set(_shingles(field, fields[field]))
+            shingles.update(field_shingles)
+            per_field.append((field, tuple(sorted(field_shingles))))
+    if not shingles:
+        # No free text: only inputs equal after normalisation match
+        shingles.add(0)
+    return SimilarKey((user, section, digest), tuple(sorted(shingles)), tuple(per_field))
+
+
+def _parts(key: SimilarKey):
+    import numpy as np
+
+    return {field: np.array(values, dtype=np.uint32) for field, values in key.fields}
+
+
+def lookup(key: SimilarKey) -> Optional[Dict]:
+    import numpy as np
+
+    lookups.inc((key.section,))
+    value, _, rejected_count = get_index().query(
+        key.scope, np.array(key.shingles, dtype=np.uint32), FUZZY_REUSE_THRESHOLD, time.time() - FUZZY_REUSE_TTL,
+        _parts(key),
+    )
+    if rejected_count:
+        rejected.inc((key.section,), rejected_count)
+    if value is None:
+        return None
+    hits.inc((key.section,))
+    _recent_hits[key.scope[:2]] = time.time()
+    _recent_hits.move_to_end(key.scope[:2])
+    if len(_recent_hits) > _RECENT_HITS_LIMIT:
+        _recent_hits.popitem(last=False)
+    return value
+
+
+def remember(key: SimilarKey, result: Dict) -> None:
+    import numpy as np
+
+    get_index().add(key.scope, np.array(key.shingles, dtype=np.uint32), result, time.time(), _parts(key))
+
+
+def _note_regenerate(user: str, section: str) -> None:
+    hit_at = _recent_hits.pop((user, section), None)
+    if hit_at is not None and time.time() - hit_at <= FUZZY_REGENERATE_WINDOW:
+        false_matches.inc((section,))
+
+
+def fuzzy_stats() -> Dict[str, Any]:
+    sections = {}
+    for (section,), count in lookups.series.items():
+        hit_count = hits.series.get((section,), 0)
+        false_count = false_matches.series.get((section,), 0)
+        sections[section] = {
+            "lookups": count,
+            "hits": hit_count,
+            "hit_rate": round(hit_count / count, 4) if count else 0.0,
+            "rejected_candidates": rejected.series.get((section,), 0),
+            "false_matches": false_count,
+            "false_match_rate": round(false_count / hit_count, 4) if hit_count else 0.0,
+        }
+    return {
+        "enabled": FUZZY_REUSE,
+        "threshold": FUZZY_REUSE_THRESHOLD,
+        "entries": _index.size if _index is not None else 0,
+        "sections": sections,
+    }
+
+
+metrics.REGISTRY.register_collector(lambda: [
+    ("fuzzy_index_entries", "Entries in the near-duplicate index", _index.size if _index is not None else 0),
+])
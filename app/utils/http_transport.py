@@ -0,0 +1,111 @@
+import importlib.util
+import os
+import time
+from typing import Dict, Optional
+
+import httpx
+
+from app import config  # noqa: F401  (loads .env)
+from app.utils.log import logger
+from app.utils.metrics import REGISTRY
+from app.utils.upstream_governor import GOVERNOR_MAX_LIMIT
+
+# None means the SDK default (https://api.openai.com/v1); point it at a local
+# stand-in for benchmarks and offline development
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+OPENAI_HTTP2 = os.getenv("OPENAI_HTTP2", "false").lower() == "true"
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5"))
+OPENAI_READ_TIMEOUT = float(os.getenv("OPENAI_READ_TIMEOUT", "30"))
+OPENAI_WRITE_TIMEOUT = float(os.getenv("OPENAI_WRITE_TIMEOUT", "10"))
+OPENAI_POOL_TIMEOUT = float(os.getenv("OPENAI_POOL_TIMEOUT", "5"))
+# The governor never admits more calls than its max limit; the extra slack
+# covers hedges racing a cancelled attempt that hasn't closed its connection yet
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", str(int(GOVERNOR_MAX_LIMIT) + 8)))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", str(int(GOVERNOR_MAX_LIMIT))))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "60"))
+
+connections_opened = REGISTRY.counter("openai_connections_opened_total", "New TCP connections to the OpenAI API")
+requests_reused = REGISTRY.counter("openai_requests_reused_connection_total", "Requests sent on a pooled connection")
+connect_time = REGISTRY.histogram("openai_connect_seconds", "DNS resolution and TCP connect time")
+tls_time = REGISTRY.histogram("openai_tls_handshake_seconds", "TLS handshake time")
+
+# httpcore trace events whose duration we record
+_TIMED = {"connection.connect_tcp": connect_time, "connection.start_tls": tls_time}
+
+
+class TracingTransport(httpx.AsyncBaseTransport):
+    """
+    Wraps the pooled transport and uses the httpcore "trace" extension to
+    record connection setup timings and whether a request reused a
+    connection.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started: Dict[str, float] = {}
+        opened = []
+        outer = request.extensions.get("trace")
+
+        async def trace(event_name: str, info: dict) -> None:
+            step, _, phase = event_name.rpartition(".")
+            if step in _TIMED:
+                if phase == "started":
+                    started[step] = time.perf_counter()
+                elif phase == "complete" and step in started:
+                    _TIMED[step].observe((), time.perf_counter() - started.pop(step))
+                    if step == "connection.connect_tcp":
+                        opened.append(True)
+            if outer is not None:
+                await outer(event_name, info)
+
+        request.extensions["trace"] = trace
+        response = await self._transport.handle_async_request(request)
+        if opened:
+            connections_opened.inc()
+        else:
+            requests_reused.inc()
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def http2_enabled() -> bool:
+    # HTTP/2 support in httpx is optional (pip install "httpx[http2]")
+    return OPENAI_HTTP2 and importlib.util.find_spec("h2") is not None
+
+
+def client_timeout() -> httpx.Timeout:
+    return httpx.Timeout(
+        connect=OPENAI_CONNECT_TIMEOUT,
+        read=OPENAI_READ_TIMEOUT,
+        write=OPENAI_WRITE_TIMEOUT,
+        pool=OPENAI_POOL_TIMEOUT,
+    )
+
+
+def build_http_client(limits: Optional[httpx.Limits] = None) -> httpx.AsyncClient:
+    limits = limits or httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+        keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+    )
+    if OPENAI_HTTP2 and not http2_enabled():
+        logger.warning("OPENAI_HTTP2 is set but the h2 package is not installed; using HTTP/1.1")
+    # retries=0: connection retries belong to execution_policy, not the transport
+    pool = httpx.AsyncHTTPTransport(limits=limits, http2=http2_enabled(), retries=0)
+    return httpx.AsyncClient(transport=TracingTransport(pool), timeout=client_timeout(), follow_redirects=True)
+
+
+def connection_stats() -> Dict[str, float]:
+    opened = connections_opened.total()
+    reused = requests_reused.total()
+    return {
+        "connections_opened": opened,
+        "requests_reused": reused,
+        "reuse_ratio": round(reused / (opened + reused), 4) if opened + reused else 0.0,
+        "http2": http2_enabled(),
+        "base_url": OPENAI_BASE_URL,
+    }
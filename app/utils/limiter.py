@@ -1,5 +1,358 @@
-from slowapi import Limiter
-from slowapi.util import get_remote_address
+import math
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextvars import ContextVar
+from typing import Dict, Optional
 
-# Create limiter instance
-limiter = Limiter(key_func=lambda request: request.state.user.get("userId", get_remote_address(request)))
+from fastapi import Depends, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+
+from app import config  # noqa: F401  (loads .env)
+from app.dependencies.auth import get_current_user
+from app.utils import request_context, tracing
+from app.utils.resumable_stream import replay_target
+from app.utils.log import logger
+from app.utils.metrics import REGISTRY
+
+# Two token buckets per user: one counts requests, one counts LLM tokens.
+# Both refill continuously over RATE_LIMIT_WINDOW seconds.
+RATE_LIMIT_WINDOW = float(os.getenv("RATE_LIMIT_WINDOW", "60"))
+RATE_LIMIT_REQUESTS = float(os.getenv("RATE_LIMIT_REQUESTS", "5"))
+RATE_LIMIT_TOKENS = float(os.getenv("RATE_LIMIT_TOKENS", "20000"))
+# Completion tokens assumed up front; corrected once the real usage is known
+RATE_LIMIT_COMPLETION_ESTIMATE = int(os.getenv("RATE_LIMIT_COMPLETION_ESTIMATE", "300"))
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()  # memory | sqlite
+RATE_LIMIT_DB_PATH = os.getenv("RATE_LIMIT_DB_PATH", "/tmp/rate_limits.sqlite3")
+# How long a locally cached bucket snapshot may answer without the store
+RATE_LIMIT_LOCAL_TTL = float(os.getenv("RATE_LIMIT_LOCAL_TTL_MS", "1000")) / 1000
+# Local decisions are only taken while this fraction of both buckets remains
+RATE_LIMIT_LOCAL_HEADROOM = float(os.getenv("RATE_LIMIT_LOCAL_HEADROOM", "0.5"))
+# Cached snapshots are dropped wholesale past this many users (pending
+# refunds are lost, which only ever errs towards stricter limiting)
+LOCAL_VIEW_LIMIT = 10000
+
+
+class BucketState:
+    __slots__ = ("allowed", "requests", "tokens", "fetched_at")
+
+    def __init__(self, allowed: bool, requests: float, tokens: float, fetched_at: float):
+        self.allowed = allowed
+        self.requests = requests
+        self.tokens = tokens
+        self.fetched_at = fetched_at
+
+
+class RateLimitStore(ABC):
+    """
+    Shared bucket storage. consume() must be atomic per key: refill both
+    buckets, apply the unconditional debits, then take the requested cost only
+    if both buckets can cover it. A Redis backend would implement the same
+    steps in one Lua script (EVALSHA) against a hash per key.
+    """
+
+    # consume() may wait on I/O or another process's lock; the limiter then
+    # calls it from a worker thread instead of the event loop
+    blocking = True
+
+    @abstractmethod
+    def consume(self, key: str, requests: float, tokens: float, debit_requests: float = 0, debit_tokens: float = 0) -> BucketState:
+        ...
+
+
+def _refill(level: float, capacity: float, elapsed: float) -> float:
+    return min(capacity, level + capacity * elapsed / RATE_LIMIT_WINDOW)
+
+
+def _apply(levels, now: float, updated: float, requests: float, tokens: float, debit_requests: float, debit_tokens: float):
+    elapsed = max(0.0, now - updated)
+    req = _refill(levels[0], RATE_LIMIT_REQUESTS, elapsed) - debit_requests
+    tok = _refill(levels[1], RATE_LIMIT_TOKENS, elapsed) - debit_tokens
+    allowed = req >= requests and tok >= tokens
+    if allowed:
+        req -= requests
+        tok -= tokens
+    return allowed, req, tok
+
+
+class MemoryRateLimitStore(RateLimitStore):
+    blocking = False
+
+    def __init__(self):
+        self._buckets: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def consume(self, key, requests, tokens, debit_requests=0, debit_tokens=0):
+        now = time.time()
+        with self._lock:
+            entry = self._buckets.get(key) or [RATE_LIMIT_REQUESTS, RATE_LIMIT_TOKENS, now]
+            allowed, req, tok = _apply(entry, now, entry[2], requests, tokens, debit_requests, debit_tokens)
+            self._buckets[key] = [req, tok, now]
+        return BucketState(allowed, req, tok, now)
+
+
+class SQLiteRateLimitStore(RateLimitStore):
+    """
+    Local stand-in for a shared store: every worker process on the host sees
+    the same buckets, and BEGIN IMMEDIATE takes the file lock for the
+    read-modify-write.
+    """
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, requests REAL, tokens REAL, updated REAL)"
+        )
+
+    def consume(self, key, requests, tokens, debit_requests=0, debit_tokens=0):
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT requests, tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+                levels = row if row else (RATE_LIMIT_REQUESTS, RATE_LIMIT_TOKENS, now)
+                allowed, req, tok = _apply(levels, now, levels[2], requests, tokens, debit_requests, debit_tokens)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO buckets (key, requests, tokens, updated) VALUES (?, ?, ?, ?)",
+                    (key, req, tok, now),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return BucketState(allowed, req, tok, now)
+
+
+class _LocalView:
+    __slots__ = ("state", "pending_requests", "pending_tokens", "denied_until")
+
+    def __init__(self, state: BucketState):
+        self.state = state
+        self.pending_requests = 0.0
+        self.pending_tokens = 0.0
+        self.denied_until = 0.0
+
+
+class Charge:
+    """What one request has been charged so far; settled when it finishes."""
+
+    __slots__ = ("key", "estimated", "used", "state")
+
+    def __init__(self):
+        self.key: Optional[str] = None
+        self.estimated = 0
+        self.used = 0
+        self.state: Optional[BucketState] = None
+
+
+_charge: ContextVar[Optional[Charge]] = ContextVar("rate_limit_charge", default=None)
+
+
+class TokenBucketLimiter:
+    def __init__(self, store: RateLimitStore):
+        self.store = store
+        self._local: Dict[str, _LocalView] = {}
+        self.local_decisions = 0
+        self.store_decisions = 0
+        self.rejections = 0
+
+    def _projected(self, view: _LocalView, now: float):
+        elapsed = now - view.state.fetched_at
+        return (
+            _refill(view.state.requests, RATE_LIMIT_REQUESTS, elapsed) - view.pending_requests,
+            _refill(view.state.tokens, RATE_LIMIT_TOKENS, elapsed) - view.pending_tokens,
+        )
+
+    async def _consume(self, key: str, requests: float, tokens: float) -> BucketState:
+        # Takes over the pending debits of the current view. Local decisions
+        # made while the store call is in flight land on that same view and
+        # are carried over to the new one
+        view = self._local.get(key)
+        pending_requests = pending_tokens = 0.0
+        if view is not None:
+            pending_requests, pending_tokens = view.pending_requests, view.pending_tokens
+            view.pending_requests = view.pending_tokens = 0.0
+        args = (key, requests, tokens, pending_requests, pending_tokens)
+        state = await run_in_threadpool(self.store.consume, *args) if self.store.blocking else self.store.consume(*args)
+        current = self._local.get(key)
+        if len(self._local) >= LOCAL_VIEW_LIMIT:
+            self._local.clear()
+        fresh = self._local[key] = _LocalView(state)
+        if current is not None:
+            fresh.pending_requests = current.pending_requests
+            fresh.pending_tokens = current.pending_tokens
+        return state
+
+    async def acquire(self, key: str, tokens: float) -> BucketState:
+        now = time.time()
+        view = self._local.get(key)
+        if view is not None and view.denied_until > now:
+            # Known to be exhausted until then: reject without touching the store
+            self.local_decisions += 1
+            self.rejections += 1
+            req, tok = self._projected(view, now)
+            return BucketState(False, req, tok, now)
+        if view is not None and now - view.state.fetched_at < RATE_LIMIT_LOCAL_TTL:
+            req, tok = self._projected(view, now)
+            if (req - 1 >= RATE_LIMIT_REQUESTS * RATE_LIMIT_LOCAL_HEADROOM
+                    and tok - tokens >= RATE_LIMIT_TOKENS * RATE_LIMIT_LOCAL_HEADROOM):
+                # Plenty left: admit locally and settle the debit with the store later
+                view.pending_requests += 1
+                view.pending_tokens += tokens
+                self.local_decisions += 1
+                return BucketState(True, req - 1, tok - tokens, now)
+
+        state = await self._consume(key, 1, tokens)
+        self.store_decisions += 1
+        if not state.allowed:
+            self.rejections += 1
+            self._local[key].denied_until = now + self.retry_after(state, tokens)
+        return state
+
+    async def adjust(self, key: str, tokens: float) -> None:
+        # Positive charges more, negative refunds; folded into the next store call
+        view = self._local.get(key)
+        if view is not None and time.time() - view.state.fetched_at < RATE_LIMIT_LOCAL_TTL:
+            view.pending_tokens += tokens
+            return
+        if view is None:
+            view = self._local[key] = _LocalView(BucketState(True, RATE_LIMIT_REQUESTS, RATE_LIMIT_TOKENS, 0.0))
+        view.pending_tokens += tokens
+        await self._consume(key, 0, 0)
+
+    @staticmethod
+    def retry_after(state: BucketState, tokens: float) -> float:
+        wait_requests = max(0.0, 1 - state.requests) * RATE_LIMIT_WINDOW / RATE_LIMIT_REQUESTS
+        wait_tokens = max(0.0, tokens - state.tokens) * RATE_LIMIT_WINDOW / RATE_LIMIT_TOKENS
+        return max(wait_requests, wait_tokens, 1.0)
+
+
+def _create_store() -> RateLimitStore:
+    if RATE_LIMIT_BACKEND == "sqlite":
+        try:
+            return SQLiteRateLimitStore(RATE_LIMIT_DB_PATH)
+        except sqlite3.Error as e:
+            logger.warning("rate limit store at %s unavailable, using memory: %s", RATE_LIMIT_DB_PATH, e)
+    return MemoryRateLimitStore()
+
+
+limiter = TokenBucketLimiter(_create_store())
+
+
+def after_fork() -> None:
+    # A SQLite connection must not be shared with the parent process
+    if isinstance(limiter.store, SQLiteRateLimitStore):
+        limiter.store = _create_store()
+
+
+def rate_limit_headers(state: BucketState) -> Dict[str, str]:
+    # Report whichever bucket is closer to empty
+    request_share = state.requests / RATE_LIMIT_REQUESTS
+    token_share = state.tokens / RATE_LIMIT_TOKENS
+    if request_share <= token_share:
+        limit, remaining = RATE_LIMIT_REQUESTS, state.requests
+    else:
+        limit, remaining = RATE_LIMIT_TOKENS, state.tokens
+    reset = (limit - remaining) * RATE_LIMIT_WINDOW / limit
+    window = int(RATE_LIMIT_WINDOW)
+    return {
+        "RateLimit-Limit": str(int(limit)),
+        "RateLimit-Remaining": str(max(0, math.floor(remaining))),
+        "RateLimit-Reset": str(max(0, math.ceil(reset))),
+        "RateLimit-Policy": f"{int(RATE_LIMIT_REQUESTS)};w={window}, {int(RATE_LIMIT_TOKENS)};w={window};comment=\"tokens\"",
+    }
+
+
+def estimate_request_tokens(request: Request) -> int:
+    # Cheap upper-bound guess from the body size; the prompt isn't built yet
+    length = int(request.headers.get("content-length") or 0)
+    # Multi-candidate requests pay the prompt once but one completion per variant
+    candidates = request.query_params.get("candidates", "1")
+    completions = int(candidates) if candidates.isdigit() and int(candidates) > 0 else 1
+    return (length + 3) // 4 + RATE_LIMIT_COMPLETION_ESTIMATE * completions
+
+
+async def rate_limit(request: Request, current_user: dict = Depends(get_current_user)) -> None:
+    """
+    Route dependency. Runs after authentication and before the body is turned
+    into a prompt, so a rejected request costs one bucket lookup.
+    """
+    if _streamed(request) and replay_target() is not None:
+        # A reconnect replaying a buffered stream makes no upstream call
+        return
+    # The identity get_current_user resolved for this request
+    await admit(request_context.user_id.get(), estimate_request_tokens(request))
+
+
+def _streamed(request: Request) -> bool:
+    # The values FastAPI parses as true for the routes' `stream` query flag
+    return request.query_params.get("stream", "").lower() in ("1", "true", "t", "on", "yes", "y")
+
+
+async def admit(key: str, estimated: int, settle: bool = True) -> None:
+    """
+    Charges one request and the estimated tokens, or raises 429. With settle,
+    the estimate is replaced by the request's real usage once it finishes;
+    otherwise (work that runs after the response, e.g. bulk jobs) it stands.
+    """
+    with tracing.span("rate_limit"):
+        state = await limiter.acquire(key, estimated)
+    charge = _charge.get()
+    if charge is not None:
+        if settle:
+            charge.key = key
+            charge.estimated = estimated
+        # For the RateLimit-* response headers
+        charge.state = state
+    if not state.allowed:
+        headers = rate_limit_headers(state)
+        headers["Retry-After"] = str(math.ceil(limiter.retry_after(state, estimated)))
+        raise HTTPException(status_code=429, detail="Rate limit exceeded", headers=headers)
+
+
+def record_tokens(tokens: int) -> None:
+    # Called with the real usage of each upstream completion in this request
+    charge = _charge.get()
+    if charge is not None and charge.key is not None:
+        charge.used += tokens
+
+
+class RateLimitMiddleware:
+    """
+    Gives each request a Charge, adds RateLimit-* headers to its response and,
+    once the body is fully sent, replaces the estimate with the real usage.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        charge = Charge()
+        _charge.set(charge)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and charge.state is not None and charge.state.allowed:
+                headers = list(message.get("headers", []))
+                for name, value in rate_limit_headers(charge.state).items():
+                    headers.append((name.lower().encode("latin-1"), value.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if charge.key is not None and charge.state is not None and charge.state.allowed:
+                await limiter.adjust(charge.key, charge.used - charge.estimated)
+
+
+REGISTRY.register_collector(lambda: [
+    ("rate_limit_local_decisions_total", "Rate limit decisions answered from the local cache", limiter.local_decisions),
+    ("rate_limit_store_decisions_total", "Rate limit decisions that went to the shared store", limiter.store_decisions),
+    ("rate_limit_rejections_total", "Requests rejected by the rate limiter", limiter.rejections),
+])
@@ -0,0 +1,132 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+from app import config  # noqa: F401  (loads .env)
+from app.utils import request_context
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Fraction of completions whose prompt is attached to the log record; 0 means
+# prompts are never serialised
+LOG_PROMPT_SAMPLE_RATE = float(os.getenv("LOG_PROMPT_SAMPLE_RATE", "0"))
+LOG_PROMPT_MAX_CHARS = int(os.getenv("LOG_PROMPT_MAX_CHARS", "2000"))
+
+logger = logging.getLogger("resume_service")
+
+
+class JsonFormatter(logging.Formatter):
+    """One compact JSON object per line. Runs on the listener thread."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        if getattr(record, "raw", False):
+            return record.msg
+        entry: Dict[str, Any] = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "msg": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+            "user_id": getattr(record, "user_id", None),
+            "section": getattr(record, "section", None),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        prompt = getattr(record, "prompt", None)
+        if prompt is not None:
+            entry["prompt"] = json.dumps(prompt, ensure_ascii=False, default=str)[:LOG_PROMPT_MAX_CHARS]
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+class ContextQueueHandler(QueueHandler):
+    """
+    Captures the request context on the calling thread and hands the record
+    over as-is; all formatting and I/O happens on the listener thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.request_id = request_context.request_id.get()
+        record.user_id = request_context.user_id.get()
+        record.section = request_context.section.get()
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Shed log records rather than block the event loop
+            pass
+
+
+_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=10000)
+_listener: Optional[QueueListener] = None
+
+
+def setup_logging() -> None:
+    global _listener
+    if _listener is not None:
+        return
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter())
+    _listener = QueueListener(_queue, output, respect_handler_level=False)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    logger.setLevel(LOG_LEVEL)
+    logger.addHandler(ContextQueueHandler(_queue))
+    logger.propagate = False
+
+
+def after_fork() -> None:
+    # Threads don't survive fork(): a pre-forked worker needs its own listener
+    global _listener
+    if _listener is None:
+        return
+    _listener = QueueListener(_queue, *_listener.handlers, respect_handler_level=False)
+    _listener.start()
+
+
+def flush(timeout: float = 1.0) -> None:
+    # Lambda freezes the container once the handler returns; drain first
+    deadline = time.monotonic() + timeout
+    while _queue.unfinished_tasks and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+def emit_raw(line: str) -> None:
+    """Writes an already-serialised line (e.g. a trace batch) through the listener thread."""
+    record = logging.LogRecord(logger.name, logging.INFO, "", 0, line, None, None)
+    record.raw = True
+    try:
+        _queue.put_nowait(record)
+    except queue.Full:
+        pass
+
+
+def log_completion(tool_name: str, streaming: bool, usage, upstream_ms: float, messages) -> None:
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    fields = {
+        "tool": tool_name,
+        "stream": streaming,
+        "upstream_ms": round(upstream_ms, 1),
+        "prompt_tokens": usage.prompt_tokens if usage else None,
+        "completion_tokens": usage.completion_tokens if usage else None,
+        "cached_tokens": getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None),
+    }
+    extra: Dict[str, Any] = {"fields": fields}
+    if LOG_PROMPT_SAMPLE_RATE and random.random() < LOG_PROMPT_SAMPLE_RATE:
+        # Passed by reference; serialised and truncated on the listener thread
+        extra["prompt"] = messages
+    logger.info("completion", extra=extra)
+
+
+setup_logging()
@@ -0,0 +1,303 @@
+import json
+import os
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from app import config
+from app.utils import log
+
+# "prometheus" serves /metrics (container mode), "emf" prints CloudWatch
+# Embedded Metric Format lines after each Lambda invocation, "off" records
+# nothing beyond the in-process aggregates
+METRICS_MODE = os.getenv("METRICS_MODE", "emf" if config.IS_LAMBDA else "prometheus").lower()
+METRICS_NAMESPACE = os.getenv("METRICS_NAMESPACE", "ResumeCompletionService")
+# Raw histogram observations kept per series between EMF flushes
+EMF_MAX_VALUES = 100
+
+# Recorded (EMF properties, admin stats) but summed away on /metrics, which
+# has no authentication of its own
+PRIVATE_LABELS = ("user",)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0)
+
+# All recording happens on the event loop thread between awaits, so plain
+# dict/list updates are atomic with respect to other requests; no locks.
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.series: Dict[Tuple[str, ...], float] = {}
+        self._flushed: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, labels: Tuple[str, ...] = (), amount: float = 1) -> None:
+        series = self.series
+        series[labels] = series.get(labels, 0) + amount
+
+    def total(self) -> float:
+        return sum(self.series.values())
+
+    def samples(self) -> Iterable[Tuple[str, Tuple[str, ...], float]]:
+        for labels, value in self.series.items():
+            yield self.name, labels, value
+
+    def take_deltas(self) -> Dict[Tuple[str, ...], float]:
+        deltas = {}
+        for labels, value in self.series.items():
+            delta = value - self._flushed.get(labels, 0)
+            if delta:
+                deltas[labels] = delta
+                self._flushed[labels] = value
+        return deltas
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self.series: Dict[Tuple[str, ...], list] = {}
+        self._pending: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        entry = self.series.get(labels)
+        if entry is None:
+            entry = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+        if METRICS_MODE == "emf":
+            pending = self._pending.get(labels)
+            if pending is None:
+                pending = self._pending[labels] = []
+            if len(pending) < EMF_MAX_VALUES:
+                pending.append(value)
+
+    def samples(self) -> Iterable[Tuple[str, Tuple[str, ...], float]]:
+        for labels, (counts, total, count) in self.series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield f"{self.name}_bucket", labels + (le,), cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, count
+
+    def take_pending(self) -> Dict[Tuple[str, ...], List[float]]:
+        pending, self._pending = self._pending, {}
+        return pending
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List = []
+        # Callables returning [(name, help, value)] for state owned elsewhere
+        # (cache sizes, coalescing counts, ...), read only at export time
+        self.collectors: List[Callable[[], List[Tuple[str, str, float]]]] = []
+
+    def counter(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], List[Tuple[str, str, float]]]) -> None:
+        self.collectors.append(collector)
+
+
+REGISTRY = Registry()
+
+prompt_tokens = REGISTRY.counter("prompt_tokens_total", "Prompt tokens billed", ("section", "user", "model"))
+completion_tokens = REGISTRY.counter("completion_tokens_total", "Completion tokens billed", ("section", "user", "model"))
+cached_tokens = REGISTRY.counter("cached_prompt_tokens_total", "Prompt tokens served from the provider prompt cache", ("section", "user", "model"))
+errors = REGISTRY.counter("errors_total", "Failed requests by status", ("section", "status"))
+upstream_calls = REGISTRY.counter("upstream_calls_total", "Upstream completions requested, before retries and hedges", ("section",))
+upstream_retries = REGISTRY.counter("upstream_retries_total", "Upstream attempts retried after an overload error", ("section",))
+hedges = REGISTRY.counter("upstream_hedges_total", "Hedged duplicate requests fired", ("section",))
+hedge_wins = REGISTRY.counter("upstream_hedge_wins_total", "Hedged requests that returned before the original", ("section",))
+upstream_wait = REGISTRY.histogram("upstream_wait_seconds", "Time spent waiting on the OpenAI API", ("section",))
+first_event = REGISTRY.histogram("time_to_first_event_seconds", "Time from request start to the first SSE event", ("section",))
+request_time = REGISTRY.histogram("request_seconds", "Total request time, including streaming the body", ("section",))
+
+
+def record_usage(section: str, user: str, model: str, prompt: int, completion: int, cached: int) -> None:
+    labels = (section, user, model)
+    prompt_tokens.inc(labels, prompt)
+    completion_tokens.inc(labels, completion)
+    if cached:
+        cached_tokens.inc(labels, cached)
+
+
+def _user_total(counter: Counter, user: Optional[str]) -> float:
+    if user is None:
+        return counter.total()
+    return sum(value for (_, series_user, _), value in counter.series.items() if series_user == user)
+
+
+def token_totals(user: Optional[str] = None) -> Dict[str, float]:
+    """Token usage across all users, or only the given user's."""
+    prompt = _user_total(prompt_tokens, user)
+    cached = _user_total(cached_tokens, user)
+    completion = _user_total(completion_tokens, user)
+    return {
+        "total_tokens": prompt + completion,
+        "prompt_tokens": prompt,
+        "completion_tokens": completion,
+        "cached_prompt_tokens": cached,
+        "cached_ratio": round(cached / prompt, 4) if prompt else 0.0,
+    }
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _public_samples(metric) -> Iterable[Tuple[str, Tuple[str, ...], Tuple[str, ...], float]]:
+    # (name, label names, label values, value) with PRIVATE_LABELS summed away
+    hidden = [i for i, label in enumerate(metric.labelnames) if label in PRIVATE_LABELS]
+    if not hidden:
+        for name, labels, value in metric.samples():
+            names = metric.labelnames + ("le",) if name.endswith("_bucket") else metric.labelnames
+            yield name, names, labels, value
+        return
+    names = tuple(label for label in metric.labelnames if label not in PRIVATE_LABELS)
+    summed: Dict[Tuple[str, Tuple[str, ...]], float] = {}
+    for name, labels, value in metric.samples():
+        kept = tuple(v for i, v in enumerate(labels) if i not in hidden)
+        summed[(name, kept)] = summed.get((name, kept), 0) + value
+    for (name, labels), value in summed.items():
+        yield name, names, labels, value
+
+
+def render_prometheus() -> str:
+    lines = []
+    for metric in REGISTRY.metrics:
+        kind = "counter" if isinstance(metric, Counter) else "histogram"
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {kind}")
+        for name, names, labels, value in _public_samples(metric):
+            if names:
+                rendered = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(names, labels))
+                lines.append(f"{name}{{{rendered}}} {value}")
+            else:
+                lines.append(f"{name} {value}")
+    for collector in REGISTRY.collectors:
+        for name, help, value in collector():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {'counter' if name.endswith('_total') else 'gauge'}")
+            lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def _emf_line(dimensions: Dict[str, str], values: Dict[str, object], properties: Optional[Dict[str, str]] = None) -> str:
+    return json.dumps({
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": METRICS_NAMESPACE,
+                "Dimensions": [list(dimensions)],
+                "Metrics": [
+                    {"Name": name, "Unit": "Seconds" if name.endswith("_seconds") else "Count"} for name in values
+                ],
+            }],
+        },
+        **dimensions,
+        **(properties or {}),
+        **values,
+    }, separators=(",", ":"))
+
+
+def flush_emf() -> int:
+    """
+    Writes everything recorded since the previous flush as EMF log lines and
+    returns the number of lines. Token counters for one (section, user, model)
+    share a line; the user is a property, not a dimension, to keep CloudWatch
+    metric cardinality bounded. The lines go through the log listener thread,
+    so they never interleave with log lines on stdout.
+    """
+    grouped: Dict[Tuple[str, ...], Dict[str, object]] = {}
+    for counter in (prompt_tokens, completion_tokens, cached_tokens):
+        for labels, delta in counter.take_deltas().items():
+            grouped.setdefault(labels, {})[counter.name] = delta
+    lines = []
+    for (section, user, model), values in grouped.items():
+        lines.append(_emf_line({"section": section, "model": model}, values, {"user": user}))
+    for (section, status), delta in errors.take_deltas().items():
+        lines.append(_emf_line({"section": section, "status": status}, {errors.name: delta}))
+    per_section: Dict[str, Dict[str, object]] = {}
+    # Every counter labelled by section alone, including ones registered elsewhere
+    for counter in REGISTRY.metrics:
+        if not isinstance(counter, Counter) or counter.labelnames != ("section",):
+            continue
+        for (section,), delta in counter.take_deltas().items():
+            per_section.setdefault(section, {})[counter.name] = delta
+    for section, values in per_section.items():
+        lines.append(_emf_line({"section": section}, values))
+    for histogram in (upstream_wait, first_event, request_time):
+        for (section,), observed in histogram.take_pending().items():
+            lines.append(_emf_line({"section": section}, {histogram.name: observed}))
+    # Unlabelled metrics registered by other modules (connection pool, ...)
+    global_values: Dict[str, object] = {}
+    for metric in REGISTRY.metrics:
+        if metric.labelnames:
+            continue
+        if isinstance(metric, Counter):
+            delta = metric.take_deltas().get(())
+            if delta:
+                global_values[metric.name] = delta
+        else:
+            observed = metric.take_pending().get(())
+            if observed:
+                global_values[metric.name] = observed
+    if global_values:
+        lines.append(_emf_line({}, global_values))
+    for line in lines:
+        log.emit_raw(line)
+    return len(lines)
+
+
+def section_for_path(path: str) -> str:
+    # /api/generate-experience -> experience, /api/generate-resume -> resume
+    _, _, tail = path.rpartition("/generate-")
+    return tail if tail and "/" not in tail else "other"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing each request until its last body chunk is sent, so
+    streamed responses are measured in full, and counting error statuses.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        section = section_for_path(scope["path"])
+        status_holder = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder[0] = message["status"]
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                request_time.observe((section,), time.perf_counter() - started)
+                if status_holder[0] >= 400:
+                    errors.inc((section, str(status_holder[0])))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            errors.inc((section, "500"))
+            raise
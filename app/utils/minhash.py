@@ -0,0 +1,125 @@
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+# Universal hashing modulus; coefficients < 2**31 and 32-bit shingles keep
+# a * x + b inside uint64
+_PRIME = np.uint64((1 << 31) - 1)
+
+
+class MinHashLSH:
+    """
+    MinHash signatures over shingle sets with banded LSH, stored in a
+    fixed-capacity ring: signatures live in one (capacity, num_perm) uint32
+    array, and the oldest entry is overwritten when the ring is full.
+    Entries are only ever compared within the same scope. An entry may also
+    carry its shingles split into named parts; a match then needs every part
+    to reach the threshold on its own.
+    """
+
+    def __init__(self, capacity: int, num_perm: int = 64, bands: int = 16, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, int(_PRIME), num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(_PRIME), num_perm, dtype=np.uint64)
+        self.capacity = capacity
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.signatures = np.zeros((capacity, num_perm), dtype=np.uint32)
+        self.created = np.zeros(capacity, dtype=np.float64)
+        self.scopes: List[Optional[Hashable]] = [None] * capacity
+        self.values: List[Any] = [None] * capacity
+        self._shingles: List[Optional[np.ndarray]] = [None] * capacity
+        self._parts: List[Optional[Dict[str, np.ndarray]]] = [None] * capacity
+        self._slot_buckets: List[List[Tuple]] = [[] for _ in range(capacity)]
+        self._buckets: Dict[Tuple, List[int]] = {}
+        self._next = 0
+        self.size = 0
+
+    def signature(self, shingles: np.ndarray) -> np.ndarray:
+        # (num_perm, n) hash matrix, min over the set
+        x = shingles.astype(np.uint64)
+        hashed = (self._a[:, None] * x[None, :] + self._b[:, None]) % _PRIME
+        return hashed.min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, scope: Hashable, signature: np.ndarray) -> List[Tuple]:
+        rows = self.rows
+        return [(scope, band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(self.bands)]
+
+    def query(
+        self,
+        scope: Hashable,
+        shingles: np.ndarray,
+        threshold: float,
+        not_before: float = 0.0,
+        parts: Optional[Dict[str, np.ndarray]] = None,
+    ) -> Tuple[Optional[Any], float, int]:
+        """
+        Returns (value, jaccard, rejected) for the most similar live entry at
+        or above the threshold. Candidates come from shared LSH buckets, are
+        ranked by estimated similarity and confirmed against the exact
+        Jaccard of the stored shingles (with parts, the lowest per-part
+        Jaccard); rejected counts candidates whose estimate passed but exact
+        similarity did not.
+        """
+        signature = self.signature(shingles)
+        candidates = set()
+        for key in self._band_keys(scope, signature):
+            candidates.update(self._buckets.get(key, ()))
+        candidates = [slot for slot in candidates if self.created[slot] >= not_before]
+        if not candidates:
+            return None, 0.0, 0
+
+        slots = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        estimates = (self.signatures[slots] == signature).mean(axis=1)
+        rejected = 0
+        for index in np.argsort(-estimates):
+            if estimates[index] < threshold:
+                break
+            slot = int(slots[index])
+            if parts is None:
+                jaccard = _jaccard(self._shingles[slot], shingles)
+            else:
+                jaccard = _parts_jaccard(self._parts[slot] or {}, parts)
+            if jaccard >= threshold:
+                return self.values[slot], jaccard, rejected
+            rejected += 1
+        return None, 0.0, rejected
+
+    def add(
+        self, scope: Hashable, shingles: np.ndarray, value: Any, now: float, parts: Optional[Dict[str, np.ndarray]] = None
+    ) -> None:
+        slot = self._next
+        self._next = (slot + 1) % self.capacity
+        if self.scopes[slot] is None:
+            self.size += 1
+        for key in self._slot_buckets[slot]:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.remove(slot)
+                if not bucket:
+                    del self._buckets[key]
+
+        signature = self.signature(shingles)
+        self.signatures[slot] = signature
+        self.created[slot] = now
+        self.scopes[slot] = scope
+        self.values[slot] = value
+        self._shingles[slot] = shingles
+        self._parts[slot] = parts
+        keys = self._band_keys(scope, signature)
+        self._slot_buckets[slot] = keys
+        for key in keys:
+            self._buckets.setdefault(key, []).append(slot)
+
+
+def _jaccard(a: np.ndarray, b: np.ndarray) -> float:
+    union = np.union1d(a, b).size
+    return np.intersect1d(a, b, assume_unique=True).size / union if union else 1.0
+
+
+def _parts_jaccard(stored: Dict[str, np.ndarray], parts: Dict[str, np.ndarray]) -> float:
+    # A part present on only one side compares against the empty set
+    empty = np.zeros(0, dtype=np.uint32)
+    return min((_jaccard(stored.get(name, empty), parts.get(name, empty)) for name in stored.keys() | parts.keys()), default=1.0)
@@ -1,111 +1,420 @@
-from typing import Dict, List
-from openai import AsyncOpenAI
-from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
+import asyncio
 import json
-from app.utils.token_tracker import add_tokens
+import time
+from app.utils import metrics, request_context, tracing
+from app.utils.log import log_completion
+from app.utils.limiter import record_tokens
+from app.utils.tool_stream import DescriptionStreamParser
+from app.utils.completion_cache import cache_key, completion_cache
+from app.utils.singleflight import singleflight
+from app.utils.upstream_governor import UpstreamOverloaded, governor
+from app.utils.execution_policy import DeadlineExceeded, execute
+from app.utils import fuzzy_reuse
+from app.utils.fuzzy_reuse import SimilarKey
+from app.utils.candidate_pool import candidate_pool
+from app.utils.resumable_stream import sse_response
 from fastapi import HTTPException
 import os
-from dotenv import load_dotenv
-import sys
+from app import config  # noqa: F401  (loads .env)
 
-# Ensure environment variables are loaded from the root directory
-load_dotenv(dotenv_path=os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), '.env'))
+MODEL = "gpt-4o-mini"
 
-# Get API key from environment
-api_key = os.getenv("OPENAI_API_KEY")
-if not api_key:
-    print("ERROR: OPENAI_API_KEY environment variable not found. Please check your .env file.")
-    sys.exit(1)
+# Created on first use (or by prewarm() during Lambda init) and then reused
+# for the lifetime of the container
+_client = None
 
-client = AsyncOpenAI(api_key=api_key)
 
-async def handle_openai_completion(messages: List[Dict], tools: List[Dict], stream: bool, tool_name: str):
-    if stream:
-        async def stream_response():
-            import asyncio
-            
-            # Make a single non-streaming API call
-            response = await client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=messages,
-                tools=tools,
-                tool_choice="auto",
-                stream=False
-            )
-            
-            # Log request + token usage for streaming calls
-            print(f"\n[REQUEST → {tool_name}] (STREAMING)\n" +
-                  f"{json.dumps(messages, indent=2)}\n" +
-                  f"[TOKENS USED] total={response.usage.total_tokens if response.usage else 'N/A'}\n")
-            
-            # Track tokens for the complete response
-            if response.usage:
-                add_tokens(response.usage.total_tokens)
-            
-            # Extract the tool call
-            tc = next((tc for tc in response.choices[0].message.tool_calls
-                      if tc.function.name == tool_name), None)
-            if not tc:
-                yield "data: [ERROR]\n\n"
-                return
-            
-            # Parse the JSON arguments
-            try:
-                args = json.loads(tc.function.arguments)
-                description = args.get("description")
-                if description is None:
-                    yield "data: [ERROR] No description found in response\n\n"
-                    return
-            except json.JSONDecodeError:
-                yield "data: [ERROR] Invalid JSON in tool call arguments\n\n"
-                return
-            
-            # Handle streaming based on description type
-            if isinstance(description, str):
-                # For single-string output (e.g., summary)
-                words = description.split()
-                for word in words:
-                    yield f"data: {json.dumps(word)}\n\n"
-                    await asyncio.sleep(0.02)
-            elif isinstance(description, list):
-                # For array output (e.g., education)
-                for item in description:
-                    # Stream each bullet point as a whole (or split into words if desired)
-                    yield f"data: {json.dumps(item)}\n\n"
-                    await asyncio.sleep(0.02)
-            else:
-                yield "data: [ERROR] Unsupported description format\n\n"
-                return
-            
-            # Signal completion
-            yield "data: [DONE]\n\n"
-
-        return StreamingResponse(stream_response(), media_type="text/event-stream")
+def get_client():
+    global _client
+    if _client is None:
+        # Deferred: importing openai pulls in httpx and pydantic models and is
+        # the single largest import in the service
+        from openai import AsyncOpenAI
+        from app.utils.http_transport import OPENAI_BASE_URL, build_http_client, client_timeout
+
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise RuntimeError("OPENAI_API_KEY environment variable not found. Please check your .env file.")
+        # Retries are handled by execution_policy, within the request deadline
+        _client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=OPENAI_BASE_URL,
+            timeout=client_timeout(),
+            max_retries=0,
+            http_client=build_http_client(),
+        )
+    return _client
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+def prewarm() -> None:
+    get_client()
+    if fuzzy_reuse.FUZZY_REUSE:
+        fuzzy_reuse.get_index()
+
+
+class CompletionError(Exception):
+    pass
+
+
+class Reused:
+    """
+    Yielded by stream_description ahead of a result taken from an earlier
+    near-identical request, so the client knows it may want to regenerate.
+    """
+
+    def __init__(self, kind: str):
+        self.kind = kind
+
+
+FUZZY_REUSED = Reused("fuzzy")
+
+
+def tool_choice_for(tools: List[Dict], tool_name: str):
+    # The prefix prompt layout sends every section's tool; force the one we want
+    if len(tools) == 1:
+        return "auto"
+    return {"type": "function", "function": {"name": tool_name}}
+
+
+def cached_tokens(usage) -> int:
+    details = getattr(usage, "prompt_tokens_details", None)
+    return (getattr(details, "cached_tokens", None) or 0) if details else 0
+
+
+def record_usage(usage) -> None:
+    metrics.record_usage(
+        request_context.section.get(),
+        request_context.user_id.get(),
+        MODEL,
+        usage.prompt_tokens,
+        usage.completion_tokens,
+        cached_tokens(usage),
+    )
+    record_tokens(usage.total_tokens)
+
+
+def replay_description(description) -> List[str]:
+    # Same pieces the live stream emits: words for strings, whole bullets for arrays
+    if isinstance(description, str):
+        return description.split()
+    if isinstance(description, list):
+        return description
+    raise CompletionError("Unsupported description format")
+
+
+def is_array_output(tools: List[Dict], tool_name: str) -> bool:
+    tool = next(t for t in tools if t["function"]["name"] == tool_name)
+    return tool["function"]["parameters"]["properties"]["description"].get("type") == "array"
+
+
+async def complete_description(
+    messages: List[Dict], tools: List[Dict], tool_name: str, use_cache: bool = True, similar: Optional[SimilarKey] = None
+) -> Dict:
+    key = cache_key(MODEL, messages, tools, tool_name)
+    if completion_cache and use_cache:
+        cached = completion_cache.get(key)
+        if cached is not None:
+            return cached
+    if not use_cache:
+        pooled = _take_pooled(key)
+        if pooled is not None:
+            return pooled
+    if similar is not None:
+        reused = fuzzy_reuse.lookup(similar)
+        if reused is not None:
+            return {**reused, "reused": FUZZY_REUSED.kind}
+    # Identical in-flight requests share a single upstream call
+    candidates = await singleflight.do(key, lambda: _fetch_candidates(messages, tools, tool_name, key, 1))
+    args = candidates[0]
+    if similar is not None:
+        fuzzy_reuse.remember(similar, args)
+    return args
+
+
+async def complete_candidates(messages: List[Dict], tools: List[Dict], tool_name: str, n: int) -> List[Dict]:
+    """
+    n variants from one upstream call. Never served from the cache, since the
+    caller asked for fresh alternatives; the first variant is cached and the
+    rest are kept for the next regenerate.
+    """
+    key = cache_key(MODEL, messages, tools, tool_name)
+    return await singleflight.do(f"{key}:n{n}", lambda: _fetch_candidates(messages, tools, tool_name, key, n))
+
+
+def _take_pooled(key: str) -> Optional[Dict]:
+    # A regenerate takes a variant left over from an earlier multi-candidate call
+    pooled = candidate_pool.take(key)
+    if pooled is not None and completion_cache:
+        completion_cache.set(key, pooled)
+    return pooled
+
+
+async def _create_completion(messages: List[Dict], tools: List[Dict], tool_name: str, n: int = 1):
+    async with governor.slot():
+        return await get_client().chat.completions.create(
+            model=MODEL,
+            messages=messages,
+            tools=tools,
+            tool_choice=tool_choice_for(tools, tool_name),
+            n=n,
+            stream=False
+        )
+
+
+async def _fetch_candidates(messages: List[Dict], tools: List[Dict], tool_name: str, key: str, n: int) -> List[Dict]:
+    started = time.perf_counter()
+    with tracing.span("openai_wait", n=n):
+        response = await execute(lambda: _create_completion(messages, tools, tool_name, n))
+    elapsed = time.perf_counter() - started
+    metrics.upstream_wait.observe((request_context.section.get(),), elapsed)
+    log_completion(tool_name, False, response.usage, elapsed * 1000, messages)
+
+    if response.usage:
+        record_usage(response.usage)
+    with tracing.span("tool_args_parse"):
+        candidates = candidate_arguments(response, tool_name)
+    if completion_cache:
+        completion_cache.set(key, candidates[0])
+    candidate_pool.put(key, candidates[1:])
+    return candidates
+
+
+def candidate_arguments(response, tool_name: str) -> List[Dict]:
+    # Variants whose tool call is missing or malformed are dropped; with none
+    # left, the first choice's error is raised
+    candidates = []
+    for choice in range(len(response.choices)):
+        try:
+            candidates.append(tool_arguments(response, tool_name, choice))
+        except (HTTPException, ValueError):
+            continue
+    return candidates or [tool_arguments(response, tool_name)]
+
+
+def tool_arguments(response, tool_name: str, choice: int = 0) -> Dict:
+    if response.choices and response.choices[choice].message.tool_calls:
+        tool_call = next((tc for tc in response.choices[choice].message.tool_calls if tc.function.name == tool_name), None)
+        if tool_call:
+            return json.loads(tool_call.function.arguments)
+        else:
+            raise HTTPException(status_code=500, detail="Unexpected tool call from AI")
     else:
+        raise HTTPException(status_code=500, detail="Unexpected response from AI")
+
+
+async def stream_description(
+    messages: List[Dict], tools: List[Dict], tool_name: str, use_cache: bool = True, similar: Optional[SimilarKey] = None
+) -> AsyncIterator[Union[str, Reused]]:
+    """
+    Streams the tool call from the API and yields each word (string
+    description) or bullet (array description) as soon as it is complete.
+    A near-duplicate's result is preceded by FUZZY_REUSED.
+    """
+    key = cache_key(MODEL, messages, tools, tool_name)
+    if completion_cache and use_cache:
+        cached = completion_cache.get(key)
+        if cached is not None:
+            for piece in replay_description(cached.get("description")):
+                yield piece
+            return
+    if not use_cache:
+        pooled = _take_pooled(key)
+        if pooled is not None:
+            for piece in replay_description(pooled.get("description")):
+                yield piece
+            return
+    if similar is not None:
+        reused = fuzzy_reuse.lookup(similar)
+        if reused is not None:
+            yield FUZZY_REUSED
+            for piece in replay_description(reused.get("description")):
+                yield piece
+            return
+    pieces = []
+    # Identical in-flight streams fan out from one upstream stream
+    async for _, piece in singleflight.stream(key, lambda: _stream_upstream(messages, tools, tool_name, key, 1)):
+        pieces.append(piece)
+        yield piece
+    if similar is not None:
+        # Words are rejoined with single spaces; replay splits them again anyway
+        fuzzy_reuse.remember(similar, {"description": pieces if is_array_output(tools, tool_name) else " ".join(pieces)})
+
+
+async def stream_candidates(messages: List[Dict], tools: List[Dict], tool_name: str, n: int) -> AsyncIterator[Dict]:
+    """n variants from one upstream stream, interleaved as they arrive: {"candidate": i, "piece": ...}."""
+    key = cache_key(MODEL, messages, tools, tool_name)
+    async for candidate, piece in singleflight.stream(
+        f"{key}:n{n}", lambda: _stream_upstream(messages, tools, tool_name, key, n)
+    ):
+        yield {"candidate": candidate, "piece": piece}
+
+
+async def _open_stream(messages: List[Dict], tools: List[Dict], tool_name: str, n: int):
+    # The governor slot stays held by whoever reads the stream to the end
+    slot = await governor.acquire()
+    try:
+        response = await get_client().chat.completions.create(
+            model=MODEL,
+            messages=messages,
+            tools=tools,
+            tool_choice=tool_choice_for(tools, tool_name),
+            n=n,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+    except BaseException as e:
+        governor.release(slot, e)
+        raise
+    slot.first_byte = time.perf_counter()
+    return response, slot
+
+
+def _discard_stream(opened):
+    # A hedge that lost the race after its stream had already opened. Released
+    # as cancelled: an abandoned request is no latency sample for the governor
+    response, slot = opened
+    governor.release(slot, asyncio.CancelledError())
+    close = getattr(response, "close", None)
+    return close() if close else None
+
+
+def _stream_error(parser: DescriptionStreamParser, named: bool) -> Optional[str]:
+    if not named:
+        return ""
+    if parser.unsupported:
+        return "Unsupported description format"
+    if not parser.found:
+        return "No description found in response"
+    if not parser.complete:
+        return "Invalid JSON in tool call arguments"
+    return None
+
+
+async def _stream_upstream(
+    messages: List[Dict], tools: List[Dict], tool_name: str, key: str, n: int
+) -> AsyncIterator[Tuple[int, str]]:
+    """Yields (choice index, piece); with n > 1 the choices' chunks arrive interleaved."""
+    started = time.perf_counter()
+    with tracing.span("openai_wait", n=n, stream=True):
+        response, slot = await execute(
+            lambda: _open_stream(messages, tools, tool_name, n), streaming=True, cleanup=_discard_stream
+        )
+
+    parsers = [DescriptionStreamParser() for _ in range(n)]
+    names: Dict[Tuple[int, int], str] = {}
+    usage = None
+    # Tool arguments are parsed incrementally as the chunks arrive
+    with tracing.span("openai_stream", n=n):
+        try:
+            async for chunk in response:
+                # The usage-only chunk arrives last with an empty choices list
+                if chunk.usage:
+                    usage = chunk.usage
+                for choice in chunk.choices:
+                    for tc in choice.delta.tool_calls or []:
+                        if tc.function is None:
+                            continue
+                        if tc.function.name:
+                            names[(choice.index, tc.index)] = tc.function.name
+                        if tc.function.arguments and names.get((choice.index, tc.index)) == tool_name:
+                            for piece in parsers[choice.index].feed(tc.function.arguments):
+                                yield choice.index, piece
+        except BaseException as e:
+            governor.release(slot, e)
+            # Cancelled or failed mid-stream: drop the connection instead of draining it
+            close = getattr(response, "close", None)
+            if close:
+                await close()
+            raise
+    governor.release(slot)
+    elapsed = time.perf_counter() - started
+    metrics.upstream_wait.observe((request_context.section.get(),), elapsed)
+    log_completion(tool_name, True, usage, elapsed * 1000, messages)
+
+    # Track tokens for the complete response
+    if usage:
+        record_usage(usage)
+
+    named = {choice for (choice, _), name in names.items() if name == tool_name}
+    errors = [_stream_error(parser, choice in named) for choice, parser in enumerate(parsers)]
+    candidates = [{"description": parser.result()} for parser, error in zip(parsers, errors) if error is None]
+    if not candidates:
+        raise CompletionError(errors[0])
+
+    if completion_cache:
+        completion_cache.set(key, candidates[0])
+    candidate_pool.put(key, candidates[1:])
+
+
+def observe_first_event() -> None:
+    started = request_context.started.get()
+    if started:
+        metrics.first_event.observe((request_context.section.get(),), time.perf_counter() - started)
+
+
+async def sse_events(pieces: AsyncIterator[str]) -> AsyncIterator[str]:
+    with tracing.span("sse_delivery"):
+        first = True
         try:
-            response = await client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=messages,
-                tools=tools,
-                tool_choice="auto",
-                stream=False
-            )
-            
-            # Log request + token usage for non-streaming calls
-            print(f"\n[REQUEST → {tool_name}] (NON-STREAMING)\n" +
-                  f"{json.dumps(messages, indent=2)}\n" +
-                  f"[TOKENS USED] total={response.usage.total_tokens if response.usage else 'N/A'}\n")
-            
-            if response.usage:
-                add_tokens(response.usage.total_tokens)
-            if response.choices and response.choices[0].message.tool_calls:
-                tool_call = next((tc for tc in response.choices[0].message.tool_calls if tc.function.name == tool_name), None)
-                if tool_call:
-                    args = json.loads(tool_call.function.arguments)
-                    return args
-                else:
-                    raise HTTPException(status_code=500, detail="Unexpected tool call from AI")
-            else:
-                raise HTTPException(status_code=500, detail="Unexpected response from AI")
+            async for piece in pieces:
+                if first:
+                    observe_first_event()
+                    first = False
+                if isinstance(piece, Reused):
+                    # A named event: clients reading only data events are unaffected
+                    yield f"event: reused\ndata: {json.dumps(piece.kind)}\n\n"
+                    continue
+                yield f"data: {json.dumps(piece)}\n\n"
+        except CompletionError as e:
+            metrics.errors.inc((request_context.section.get(), "stream_error"))
+            yield f"data: [ERROR] {e}\n\n" if str(e) else "data: [ERROR]\n\n"
+            return
+        except (UpstreamOverloaded, DeadlineExceeded) as e:
+            metrics.errors.inc((request_context.section.get(), f"stream_{e.status_code}"))
+            yield f"data: [ERROR] {e.detail}\n\n"
+            return
         except Exception as e:
-            raise HTTPException(status_code=502, detail=f"AI service error: {str(e)}")
\ No newline at end of file
+            metrics.errors.inc((request_context.section.get(), "stream_error"))
+            yield f"data: [ERROR] AI service error: {str(e)}\n\n"
+            return
+
+        # Signal completion
+        yield "data: [DONE]\n\n"
+
+
+async def handle_openai_completion(
+    messages: List[Dict], tools: List[Dict], stream: bool, tool_name: str, use_cache: bool = True,
+    similar: Optional[SimilarKey] = None, candidates: int = 1,
+):
+    if candidates > 1:
+        return await _handle_candidates(messages, tools, stream, tool_name, candidates)
+    if stream:
+        pieces = stream_description(messages, tools, tool_name, use_cache, similar)
+        return sse_response(sse_events(pieces))
+    try:
+        return await complete_description(messages, tools, tool_name, use_cache, similar)
+    except (UpstreamOverloaded, DeadlineExceeded):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"AI service error: {str(e)}")
+
+
+async def _handle_candidates(messages: List[Dict], tools: List[Dict], stream: bool, tool_name: str, n: int):
+    if stream:
+        return sse_response(sse_events(stream_candidates(messages, tools, tool_name, n)))
+    try:
+        variants = await complete_candidates(messages, tools, tool_name, n)
+    except (UpstreamOverloaded, DeadlineExceeded):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"AI service error: {str(e)}")
+    # "description" stays the first variant so single-candidate clients keep working
+    return {"description": variants[0].get("description"), "candidates": [v.get("description") for v in variants]}
@@ -0,0 +1,34 @@
+import time
+import uuid
+from contextvars import ContextVar
+
+# Per-request values readable anywhere on the request's task (and in tasks it
+# spawns, which copy the context at creation)
+request_id: ContextVar[str] = ContextVar("request_id", default="-")
+user_id: ContextVar[str] = ContextVar("user_id", default="anonymous")
+section: ContextVar[str] = ContextVar("section", default="none")
+# perf_counter() at the moment the request entered the app
+started: ContextVar[float] = ContextVar("started", default=0.0)
+# perf_counter() by which the upstream work must be done; 0 means not set
+deadline: ContextVar[float] = ContextVar("deadline", default=0.0)
+# Last-Event-ID of a reconnecting SSE client, or ""
+last_event_id: ContextVar[str] = ContextVar("last_event_id", default="")
+
+# Request id sources, in order of preference (API Gateway / Lambda URL set the last)
+_REQUEST_ID_HEADERS = (b"x-request-id", b"x-amzn-requestid", b"x-amzn-trace-id")
+
+
+class RequestContextMiddleware:
+    """Outermost ASGI middleware: stamps the request id and start time."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            started.set(time.perf_counter())
+            headers = dict(scope["headers"])
+            rid = next((headers[h] for h in _REQUEST_ID_HEADERS if h in headers), None)
+            request_id.set(rid.decode("latin-1") if rid else uuid.uuid4().hex)
+            last_event_id.set(headers.get(b"last-event-id", b"").decode("latin-1"))
+        await self.app(scope, receive, send)
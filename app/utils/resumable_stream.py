@@ -0,0 +1,213 @@
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from fastapi.responses import StreamingResponse
+
+from app import config  # noqa: F401  (loads .env)
+from app.utils import metrics, request_context
+from app.utils.broadcast import Broadcast
+
+# Buffer SSE events so a client that drops the connection can reconnect with
+# Last-Event-ID and pick up where it left off
+SSE_RESUME = os.getenv("SSE_RESUME", "on").lower() != "off"
+# How long a finished stream stays available for replay
+SSE_RESUME_TTL = float(os.getenv("SSE_RESUME_TTL", "300"))
+SSE_RESUME_MAX_STREAMS = int(os.getenv("SSE_RESUME_MAX_STREAMS", "1000"))
+# Per-stream cap on buffered event bytes; the oldest events are dropped past it
+SSE_STREAM_MAX_BYTES = int(os.getenv("SSE_STREAM_MAX_BYTES", str(256 * 1024)))
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
+# A running generation with no connection attached for this long is
+# cancelled, so an abandoned stream stops spending upstream tokens
+SSE_RESUME_GRACE_SECONDS = float(os.getenv("SSE_RESUME_GRACE_SECONDS", "30"))
+
+KEEPALIVE_FRAME = ": keep-alive\n\n"
+
+resumes = metrics.REGISTRY.counter("sse_resumes_total", "Reconnects served from a buffered stream", ("section",))
+resume_misses = metrics.REGISTRY.counter(
+    "sse_resume_misses_total", "Reconnects whose stream was gone or truncated, answered with a new generation", ("section",)
+)
+abandoned = metrics.REGISTRY.counter(
+    "sse_abandoned_total", "Generations cancelled after no connection was attached for the grace period", ("section",)
+)
+
+
+class ResumableStream(Broadcast):
+    """
+    The SSE frames of one generation, tagged "id: <stream>:<seq>". A
+    background task publishes; every connection subscribes from the sequence
+    number it last saw.
+    """
+
+    def __init__(self, stream_id: str, user: str, section: str):
+        super().__init__()
+        self.id = stream_id
+        self.user = user
+        self.section = section
+        self.size = 0
+        self.finished_at = 0.0
+
+    def publish(self, frame: str) -> None:
+        framed = f"id: {self.id}:{self.next_seq}\n{frame}"
+        self.size += len(framed)
+        super().publish(framed)
+
+    def trim(self) -> None:
+        # Keep at least the newest event so live subscribers never miss one
+        while self.size > SSE_STREAM_MAX_BYTES and len(self.items) > 1:
+            _, dropped = self.items.popleft()
+            self.size -= len(dropped)
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        self.finished_at = time.monotonic()
+        super().finish(error)
+
+    def can_resume(self, after: int) -> bool:
+        # Every event after `after` must still be buffered
+        first = self.items[0][0] if self.items else self.next_seq
+        return first <= after + 1 and after < self.next_seq
+
+    def subscribe(self, after: int = 0) -> AsyncIterator[str]:
+        # Comment frames keep proxies and mobile radios from idling the connection out
+        return super().subscribe(after, SSE_KEEPALIVE_SECONDS, KEEPALIVE_FRAME)
+
+
+class StreamRegistry:
+    """Resumable streams by id: finished ones expire after SSE_RESUME_TTL, oldest evicted past the cap."""
+
+    def __init__(self, max_streams: int, ttl: float):
+        self.max_streams = max_streams
+        self.ttl = ttl
+        self._streams: "OrderedDict[str, ResumableStream]" = OrderedDict()
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def start(self, events: AsyncIterator[str]) -> ResumableStream:
+        self._evict()
+        stream = ResumableStream(uuid.uuid4().hex, request_context.user_id.get(), request_context.section.get())
+        self._streams[stream.id] = stream
+        # The generation outlives any one connection; it stops at its own end
+        # (or deadline), or once no connection has been attached for the grace period
+        task = asyncio.ensure_future(self._pump(stream, events))
+        self._tasks[stream.id] = task
+        task.add_done_callback(lambda t: self._tasks.pop(stream.id, None))
+        stream.on_detached = self._schedule_check
+        self._schedule_check(stream)
+        return stream
+
+    def _schedule_check(self, stream: ResumableStream) -> None:
+        asyncio.get_running_loop().call_later(SSE_RESUME_GRACE_SECONDS, self._cancel_if_abandoned, stream)
+
+    def _cancel_if_abandoned(self, stream: ResumableStream) -> None:
+        task = self._tasks.get(stream.id)
+        if stream.subscribers or stream.done or task is None:
+            return
+        task.cancel()
+        # Its buffer ends without [DONE]; a late reconnect gets a fresh generation instead
+        if self._streams.get(stream.id) is stream:
+            del self._streams[stream.id]
+        abandoned.inc((stream.section,))
+
+    @staticmethod
+    async def _pump(stream: ResumableStream, events: AsyncIterator[str]) -> None:
+        try:
+            async for frame in events:
+                stream.publish(frame)
+        finally:
+            stream.finish()
+
+    async def drain(self, timeout: float) -> int:
+        """Waits for running generations to finish; cancels (and returns the count of) any still running after timeout."""
+        tasks = list(self._tasks.values())
+        if not tasks:
+            return 0
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        return len(pending)
+
+    def get(self, stream_id: str) -> Optional[ResumableStream]:
+        self._evict()
+        return self._streams.get(stream_id)
+
+    def _evict(self) -> None:
+        cutoff = time.monotonic() - self.ttl
+        for stream_id in [s.id for s in self._streams.values() if s.done and s.finished_at < cutoff]:
+            del self._streams[stream_id]
+        while len(self._streams) > self.max_streams:
+            # Evicting a running stream only ends its resumability, not the generation
+            self._streams.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "streams": len(self._streams),
+            "running": len(self._tasks),
+            "buffered_bytes": sum(s.size for s in self._streams.values()),
+            "resumes": int(resumes.total()),
+            "resume_misses": int(resume_misses.total()),
+            "abandoned": int(abandoned.total()),
+        }
+
+
+streams = StreamRegistry(SSE_RESUME_MAX_STREAMS, SSE_RESUME_TTL)
+
+
+# The replay the rate limiter let through uncharged; honoured by sse_response
+# even if the stream is evicted in between
+_replay: ContextVar[Optional[Tuple[ResumableStream, int]]] = ContextVar("sse_replay", default=None)
+
+
+def _resumable(last_event_id: str) -> Optional[Tuple[ResumableStream, int]]:
+    stream_id, _, seq = last_event_id.partition(":")
+    stream = streams.get(stream_id)
+    # Another user's stream id is treated like an unknown one
+    if stream is None or stream.user != request_context.user_id.get() or not seq.isdigit():
+        return None
+    if not stream.can_resume(int(seq)):
+        return None
+    return stream, int(seq)
+
+
+def replay_target() -> Optional[Tuple[ResumableStream, int]]:
+    """The buffered stream this request's Last-Event-ID will replay, if any; pinned for sse_response."""
+    if not SSE_RESUME:
+        return None
+    last_event_id = request_context.last_event_id.get()
+    found = _resumable(last_event_id) if last_event_id else None
+    _replay.set(found)
+    return found
+
+
+def sse_response(events: AsyncIterator[str]) -> StreamingResponse:
+    """
+    StreamingResponse for an SSE generator. A request carrying the
+    Last-Event-ID of a buffered stream replays the missed events and follows
+    the still-running generation; `events` is then never started. An unknown,
+    expired or truncated stream gets a fresh generation with a new stream id.
+    """
+    if not SSE_RESUME:
+        return StreamingResponse(events, media_type="text/event-stream")
+    last_event_id = request_context.last_event_id.get()
+    if last_event_id:
+        found = _replay.get() or _resumable(last_event_id)
+        if found is not None:
+            stream, after = found
+            resumes.inc((stream.section,))
+            return StreamingResponse(stream.subscribe(after), media_type="text/event-stream")
+        resume_misses.inc((request_context.section.get(),))
+    stream = streams.start(events)
+    return StreamingResponse(stream.subscribe(), media_type="text/event-stream")
+
+
+def _collect():
+    stats = streams.stats()
+    return [
+        ("sse_buffered_streams", "Streams held for Last-Event-ID replay", stats["streams"]),
+        ("sse_buffered_bytes", "Bytes of buffered SSE events", stats["buffered_bytes"]),
+    ]
+
+
+metrics.REGISTRY.register_collector(_collect)
@@ -0,0 +1,88 @@
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+from app.utils.broadcast import Broadcast
+from app.utils.metrics import REGISTRY
+
+
+class StreamCancelled(Exception):
+    """Raised to subscribers when the shared stream stopped without finishing (e.g. cancelled)."""
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key onto one execution. Waiters
+    are shielded, so a disconnecting client never cancels the shared call; a
+    shared stream is cancelled once its last subscriber has left.
+    """
+
+    def __init__(self):
+        self.leaders = 0
+        self.collapsed = 0
+        self._calls: Dict[str, asyncio.Future] = {}
+        self._streams: Dict[str, Broadcast] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._forget(self._calls, key, t))
+        else:
+            self.collapsed += 1
+        return await asyncio.shield(task)
+
+    def stream(self, key: str, fn: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        broadcast = self._streams.get(key)
+        if broadcast is None:
+            self.leaders += 1
+            broadcast = Broadcast()
+            self._streams[key] = broadcast
+            task = asyncio.ensure_future(self._pump(fn, broadcast))
+            task.add_done_callback(lambda t: self._forget(self._streams, key, broadcast))
+            broadcast.on_detached = lambda b: self._abandon(key, b, task)
+        else:
+            self.collapsed += 1
+        return broadcast.subscribe()
+
+    @staticmethod
+    async def _pump(fn: Callable[[], AsyncIterator[Any]], broadcast: Broadcast) -> None:
+        # Subscribers must always be released: on cancellation (or any other
+        # BaseException) they get StreamCancelled instead of waiting forever
+        error: Optional[BaseException] = StreamCancelled("Upstream stream was cancelled")
+        try:
+            async for piece in fn():
+                broadcast.publish(piece)
+            error = None
+        except Exception as e:
+            error = e
+        finally:
+            broadcast.finish(error)
+
+    def _abandon(self, key: str, broadcast: Broadcast, task: asyncio.Task) -> None:
+        # Every subscriber left (client gone, resumable stream abandoned): stop
+        # reading upstream instead of paying for a completion nobody receives.
+        # Later callers with the same key start a fresh stream
+        self._forget(self._streams, key, broadcast)
+        task.cancel()
+
+    @staticmethod
+    def _forget(entries: Dict[str, Any], key: str, value: Any) -> None:
+        if entries.get(key) is value:
+            del entries[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "leaders": self.leaders,
+            "collapsed": self.collapsed,
+            "in_flight": len(self._calls) + len(self._streams),
+        }
+
+
+singleflight = SingleFlight()
+
+REGISTRY.register_collector(lambda: [
+    ("singleflight_leaders_total", "Upstream calls started by single-flight", singleflight.leaders),
+    ("singleflight_collapsed_total", "Requests served by joining an in-flight upstream call", singleflight.collapsed),
+])
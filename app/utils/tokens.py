@@ -0,0 +1,3 @@
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English prose; good enough for budgeting
+    return (len(text) + 3) // 4 if text else 0
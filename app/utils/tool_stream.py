@@ -0,0 +1,160 @@
+import json
+from typing import Any, List, Optional
+
+# Parser states
+_SEEK = 0       # scanning the top-level object for the "description" key
+_VALUE = 1      # found the key, waiting for the value to start
+_STRING = 2     # inside a string value (summary / certification)
+_ARRAY = 3      # inside an array value, between items
+_ITEM = 4       # inside a string item of the array value
+_DONE = 5       # value fully consumed
+_BAD = 6        # value is neither a string nor an array of strings
+
+# JSON escapes that decode to whitespace and therefore end a word
+_WHITESPACE_ESCAPES = {"n", "t", "r"}
+
+
+def _decode(raw: str) -> str:
+    return json.loads(f'"{raw}"', strict=False)
+
+
+class DescriptionStreamParser:
+    """
+    Incrementally parses the JSON arguments of a tool call as the fragments
+    arrive and extracts the "description" value.
+
+    feed() returns the pieces that became complete with that fragment: single
+    words for a string description, whole bullets for an array description.
+    """
+
+    def __init__(self, key: str = "description"):
+        self.key = key
+        self.state = _SEEK
+        self.is_array: Optional[bool] = None
+        self._depth = 0
+        self._in_str = False
+        self._escape = False
+        self._key_raw: List[str] = []
+        self._last_key: Optional[str] = None
+        self._raw: List[str] = []
+        self._text: List[str] = []
+        self._items: List[str] = []
+
+    @property
+    def found(self) -> bool:
+        return self.state in (_STRING, _ARRAY, _ITEM, _DONE)
+
+    @property
+    def complete(self) -> bool:
+        return self.state == _DONE
+
+    @property
+    def unsupported(self) -> bool:
+        return self.state == _BAD
+
+    def result(self) -> Any:
+        if self.is_array:
+            return list(self._items)
+        return _decode("".join(self._text))
+
+    def feed(self, fragment: str) -> List[str]:
+        pieces: List[str] = []
+        for ch in fragment:
+            state = self.state
+            if state == _SEEK:
+                self._seek(ch)
+            elif state == _VALUE:
+                if ch == '"':
+                    self.state = _STRING
+                    self.is_array = False
+                elif ch == "[":
+                    self.state = _ARRAY
+                    self.is_array = True
+                elif not ch.isspace():
+                    self.state = _BAD
+            elif state == _STRING:
+                self._string_char(ch, pieces)
+            elif state == _ARRAY:
+                if ch == '"':
+                    self.state = _ITEM
+                elif ch == "]":
+                    self.state = _DONE
+                elif ch in "{[":
+                    self.state = _BAD
+            elif state == _ITEM:
+                self._item_char(ch, pieces)
+            else:
+                break
+        return pieces
+
+    def _seek(self, ch: str) -> None:
+        # Track nesting so only keys of the top-level object are considered
+        if self._in_str:
+            if self._escape:
+                self._escape = False
+                self._key_raw.append(ch)
+            elif ch == "\\":
+                self._escape = True
+                self._key_raw.append(ch)
+            elif ch == '"':
+                self._in_str = False
+                self._last_key = "".join(self._key_raw) if self._depth == 1 else None
+            else:
+                self._key_raw.append(ch)
+            return
+        if ch == '"':
+            self._in_str = True
+            self._key_raw = []
+        elif ch in "{[":
+            self._depth += 1
+            self._last_key = None
+        elif ch in "}]":
+            self._depth -= 1
+            self._last_key = None
+        elif ch == ":":
+            if self._depth == 1 and self._last_key == self.key:
+                self.state = _VALUE
+            self._last_key = None
+        elif not ch.isspace():
+            self._last_key = None
+
+    def _flush_word(self, pieces: List[str]) -> None:
+        if self._raw:
+            pieces.extend(_decode("".join(self._raw)).split())
+            self._raw = []
+
+    def _string_char(self, ch: str, pieces: List[str]) -> None:
+        if self._escape:
+            self._escape = False
+            self._text.append("\\" + ch)
+            if ch in _WHITESPACE_ESCAPES:
+                self._flush_word(pieces)
+            else:
+                self._raw.append("\\" + ch)
+            return
+        if ch == "\\":
+            self._escape = True
+        elif ch == '"':
+            self._flush_word(pieces)
+            self.state = _DONE
+        else:
+            self._text.append(ch)
+            if ch.isspace():
+                self._flush_word(pieces)
+            else:
+                self._raw.append(ch)
+
+    def _item_char(self, ch: str, pieces: List[str]) -> None:
+        if self._escape:
+            self._escape = False
+            self._raw.append("\\" + ch)
+        elif ch == "\\":
+            self._escape = True
+        elif ch == '"':
+            item = _decode("".join(self._raw))
+            self._raw = []
+            self._items.append(item)
+            pieces.append(item)
+            self.state = _ARRAY
+        else:
+            self._raw.append(ch)
@@ -0,0 +1,289 @@
+import json
+import os
+import random
+import re
+import secrets
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from app import config  # noqa: F401  (loads .env)
+from app.utils import log
+
+# Per-request spans. Off by default; when off the middleware isn't installed
+# and span() is a single ContextVar lookup returning a shared no-op
+TRACING = os.getenv("TRACING", "off").lower() == "on"
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+# Server-Timing header (and a trailing "server-timing" SSE event on streams)
+# for sampled requests
+SERVER_TIMING = os.getenv("SERVER_TIMING", "on").lower() != "off"
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "stdout").lower()  # stdout | file | off
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "/tmp/traces.jsonl")
+TRACE_EXPORT_BATCH = int(os.getenv("TRACE_EXPORT_BATCH", "64"))
+TRACE_EXPORT_INTERVAL = float(os.getenv("TRACE_EXPORT_INTERVAL", "5"))
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "resume-completion-service")
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+_trace: ContextVar[Optional["Trace"]] = ContextVar("trace", default=None)
+
+
+class Span:
+    """One timed phase; perf_counter_ns for the duration, mapped to wall time on export."""
+
+    __slots__ = ("trace", "name", "start", "end", "attributes")
+
+    def __init__(self, trace: "Trace", name: str, attributes: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.attributes = attributes
+        self.start = 0
+        self.end = 0
+
+    def __enter__(self) -> "Span":
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        self.trace.spans.append(self)
+        return False
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+
+class _NoopSpan:
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Trace:
+    """
+    Spans of one sampled request. Every span is a direct child of the
+    request span, so spans recorded on spawned tasks (which copy the context)
+    need no bookkeeping.
+    """
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str]):
+        self.name = name
+        self.trace_id = trace_id
+        self.parent_id = parent_id
+        self.span_id = secrets.token_hex(8)
+        self.spans: List[Span] = []
+        self.attributes: Dict[str, Any] = {}
+        self.start = time.perf_counter_ns()
+        # Wall clock anchor: durations stay monotonic, timestamps are still absolute
+        self.start_unix = time.time_ns()
+        self.end = 0
+
+    def last_end(self) -> int:
+        return max((s.end for s in self.spans), default=self.start)
+
+    def server_timing(self) -> str:
+        # Durations per phase name, summed (a resume request has one upstream span per section)
+        totals: Dict[str, List[float]] = {}
+        for s in list(self.spans):
+            entry = totals.setdefault(s.name, [0.0, 0])
+            entry[0] += (s.end - s.start) / 1e6
+            entry[1] += 1
+        parts = [
+            f'{name};dur={ms:.2f}' + (f';desc="x{count}"' if count > 1 else "")
+            for name, (ms, count) in totals.items()
+        ]
+        parts.append(f"total;dur={(time.perf_counter_ns() - self.start) / 1e6:.2f}")
+        return ", ".join(parts)
+
+    def _unix(self, perf_ns: int) -> str:
+        return str(self.start_unix + perf_ns - self.start)
+
+    def otlp_spans(self) -> List[Dict[str, Any]]:
+        root = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 2,  # SERVER
+            "startTimeUnixNano": self._unix(self.start),
+            "endTimeUnixNano": self._unix(self.end),
+            "attributes": _attributes(self.attributes),
+        }
+        if self.parent_id:
+            root["parentSpanId"] = self.parent_id
+        spans = [root]
+        for s in self.spans:
+            spans.append({
+                "traceId": self.trace_id,
+                "spanId": secrets.token_hex(8),
+                "parentSpanId": self.span_id,
+                "name": s.name,
+                "kind": 1,  # INTERNAL
+                "startTimeUnixNano": self._unix(s.start),
+                "endTimeUnixNano": self._unix(s.end),
+                "attributes": _attributes(s.attributes),
+            })
+        return spans
+
+
+def _attributes(values: Dict[str, Any]) -> List[Dict[str, Any]]:
+    attributes = []
+    for key, value in values.items():
+        if isinstance(value, bool):
+            typed = {"boolValue": value}
+        elif isinstance(value, int):
+            typed = {"intValue": str(value)}
+        elif isinstance(value, float):
+            typed = {"doubleValue": value}
+        else:
+            typed = {"stringValue": str(value)}
+        attributes.append({"key": key, "value": typed})
+    return attributes
+
+
+def span(name: str, **attributes: Any):
+    """Context manager timing one phase of the current request; a no-op unless the request is sampled."""
+    trace = _trace.get()
+    if trace is None:
+        return _NOOP
+    return Span(trace, name, attributes)
+
+
+def mark(name: str) -> None:
+    """Records a span from the end of the last finished span (or request start) until now."""
+    trace = _trace.get()
+    if trace is None:
+        return
+    recorded = Span(trace, name, {})
+    recorded.start = trace.last_end()
+    recorded.end = time.perf_counter_ns()
+    trace.spans.append(recorded)
+
+
+def set_attribute(key: str, value: Any) -> None:
+    trace = _trace.get()
+    if trace is not None:
+        trace.attributes[key] = value
+
+
+class TraceExporter:
+    """
+    Buffers finished traces and writes them as OTLP/JSON
+    (ExportTraceServiceRequest), one batch per line. stdout batches go
+    through the log listener thread, so they never interleave with log lines.
+    """
+
+    def __init__(self, target: str, path: str, batch_size: int, interval: float):
+        self.target = target
+        self.path = path
+        self.batch_size = batch_size
+        self.interval = interval
+        self.exported = 0
+        self._pending: List[Trace] = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add(self, trace: Trace) -> None:
+        if self.target == "off":
+            return
+        self._pending.append(trace)
+        if len(self._pending) >= self.batch_size or time.monotonic() - self._last_flush >= self.interval:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        self._last_flush = time.monotonic()
+        payload = {"resourceSpans": [{
+            "resource": {"attributes": _attributes({"service.name": SERVICE_NAME})},
+            "scopeSpans": [{
+                "scope": {"name": "app.utils.tracing"},
+                "spans": [s for trace in batch for s in trace.otlp_spans()],
+            }],
+        }]}
+        line = json.dumps(payload, separators=(",", ":"), default=str)
+        if self.target == "file":
+            with self._lock, open(self.path, "a") as f:
+                f.write(line + "\n")
+        else:
+            log.emit_raw(line)
+        self.exported += len(batch)
+
+
+exporter = TraceExporter(TRACE_EXPORT, TRACE_EXPORT_PATH, TRACE_EXPORT_BATCH, TRACE_EXPORT_INTERVAL)
+
+
+def _start_trace(scope) -> Optional[Trace]:
+    name = f"{scope['method']} {scope['path']}"
+    for key, value in scope["headers"]:
+        if key == b"traceparent":
+            # Continue the caller's trace and honour its sampling decision
+            match = _TRACEPARENT.match(value.decode("latin-1").strip().lower())
+            if match:
+                if not int(match.group(3), 16) & 1:
+                    return None
+                return Trace(name, match.group(1), match.group(2))
+            break
+    if TRACE_SAMPLE_RATE < 1.0 and random.random() >= TRACE_SAMPLE_RATE:
+        return None
+    return Trace(name, secrets.token_hex(16), None)
+
+
+class TracingMiddleware:
+    """
+    Samples requests and collects their spans. Adds Server-Timing to the
+    response head; streamed (SSE) responses also end with a
+    "server-timing" event covering the phases that finished while streaming.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        trace = _start_trace(scope)
+        if trace is None:
+            return await self.app(scope, receive, send)
+        token = _trace.set(trace)
+        streaming = False
+
+        async def send_wrapper(message):
+            nonlocal streaming
+            if message["type"] == "http.response.start":
+                trace.attributes["http.status_code"] = message["status"]
+                headers = list(message.get("headers", []))
+                streaming = any(k == b"content-type" and v.startswith(b"text/event-stream") for k, v in headers)
+                if SERVER_TIMING:
+                    headers.append((b"server-timing", trace.server_timing().encode("latin-1")))
+                    # Lets cross-origin pages read the timings
+                    headers.append((b"timing-allow-origin", b"*"))
+                    message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                if streaming and SERVER_TIMING:
+                    event = f"event: server-timing\ndata: {json.dumps(trace.server_timing())}\n\n"
+                    await send({"type": "http.response.body", "body": event.encode(), "more_body": True})
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            trace.end = time.perf_counter_ns()
+            _trace.reset(token)
+            exporter.add(trace)
+
+
+def flush() -> None:
+    if TRACING:
+        exporter.flush()
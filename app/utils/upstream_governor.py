@@ -0,0 +1,250 @@
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Optional
+
+from fastapi import HTTPException
+
+from app import config  # noqa: F401  (loads .env)
+from app.utils import request_context
+from app.utils.log import logger
+from app.utils.metrics import REGISTRY
+
+GOVERNOR_INITIAL_LIMIT = float(os.getenv("GOVERNOR_INITIAL_LIMIT", "16"))
+GOVERNOR_MIN_LIMIT = float(os.getenv("GOVERNOR_MIN_LIMIT", "2"))
+GOVERNOR_MAX_LIMIT = float(os.getenv("GOVERNOR_MAX_LIMIT", "64"))
+GOVERNOR_QUEUE_SIZE = int(os.getenv("GOVERNOR_QUEUE_SIZE", "64"))
+# A sample slower than this multiple of the long-run latency counts as congestion
+GOVERNOR_LATENCY_TOLERANCE = float(os.getenv("GOVERNOR_LATENCY_TOLERANCE", "2.0"))
+# End-to-end budget when the route gives no deadline (Lambda times out at 30 s)
+REQUEST_BUDGET_SECONDS = float(os.getenv("REQUEST_BUDGET_SECONDS", "25"))
+BREAKER_FAILURES = int(os.getenv("GOVERNOR_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN = float(os.getenv("GOVERNOR_BREAKER_COOLDOWN", "15"))
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+
+class UpstreamOverloaded(HTTPException):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(
+            status_code=503,
+            detail=f"AI service overloaded: {reason}",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+        self.reason = reason
+
+
+def is_overload_error(error: BaseException) -> bool:
+    # 429 / 5xx responses, timeouts and connection failures; other 4xx are our fault
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return type(error).__name__ in ("APITimeoutError", "APIConnectionError", "TimeoutError", "ReadTimeout", "ConnectTimeout")
+
+
+def current_deadline() -> float:
+    deadline = request_context.deadline.get()
+    if deadline:
+        return deadline
+    started = request_context.started.get() or time.perf_counter()
+    return started + REQUEST_BUDGET_SECONDS
+
+
+class Slot:
+    __slots__ = ("started", "first_byte")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        # Streams set this when the response headers arrive, so the latency
+        # sample doesn't depend on how long the generated text is
+        self.first_byte: Optional[float] = None
+
+
+class UpstreamGovernor:
+    """
+    Adaptive concurrency limit (AIMD) for calls to the OpenAI API, with a
+    bounded, deadline-aware wait queue and a circuit breaker.
+    """
+
+    def __init__(self):
+        self.limit = GOVERNOR_INITIAL_LIMIT
+        self.in_flight = 0
+        self.latency = 0.0  # long-run EWMA of the latency samples, seconds
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.state = CLOSED
+        self._failures = 0
+        self._open_until = 0.0
+        self._probe_in_flight = False
+        self._last_decrease = 0.0
+        self.admitted = 0
+        self.shed = 0
+        self.breaker_opens = 0
+        self.overload_errors = 0
+
+    def precheck(self) -> None:
+        """Cheap rejection before any work is done for the request."""
+        now = time.monotonic()
+        if self.state == OPEN and now < self._open_until:
+            self._shed("circuit open", self._open_until - now)
+        if len(self._waiters) >= GOVERNOR_QUEUE_SIZE:
+            self._shed("queue full", self.latency or 1.0)
+
+    def _shed(self, reason: str, retry_after: float) -> None:
+        self.shed += 1
+        raise UpstreamOverloaded(reason, retry_after)
+
+    async def _admit(self, deadline: float) -> None:
+        now = time.monotonic()
+        if self.state == OPEN:
+            if now < self._open_until:
+                self._shed("circuit open", self._open_until - now)
+            self.state = HALF_OPEN
+            logger.info("circuit_half_open")
+        if self.state == HALF_OPEN:
+            # One probe at a time decides whether the breaker closes again
+            if self._probe_in_flight:
+                self._shed("circuit half-open", BREAKER_COOLDOWN / 2)
+            self._probe_in_flight = True
+            self.in_flight += 1
+            return
+
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            return
+        if len(self._waiters) >= GOVERNOR_QUEUE_SIZE:
+            self._shed("queue full", self.latency or 1.0)
+        # Only wait while a slot could still be followed by a typical call
+        remaining = deadline - time.perf_counter() - self.latency
+        if remaining <= 0:
+            self._shed("deadline cannot be met", self.latency or 1.0)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=remaining)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                return
+            waiter.cancel()
+            self._discard(waiter)
+            self._shed("deadline cannot be met", self.latency or 1.0)
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release_slot()
+            else:
+                waiter.cancel()
+                self._discard(waiter)
+            raise
+
+    def _discard(self, waiter: asyncio.Future) -> None:
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def _release_slot(self) -> None:
+        self.in_flight -= 1
+        while self._waiters and self.in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(True)
+
+    def _decrease(self, factor: float) -> None:
+        # At most once per typical call duration, so a burst of failures from
+        # the same congested period counts as one signal
+        now = time.monotonic()
+        if now - self._last_decrease >= max(self.latency, 0.1):
+            self._last_decrease = now
+            self.limit = max(GOVERNOR_MIN_LIMIT, self.limit * factor)
+
+    def _record(self, slot: Slot, error: Optional[BaseException]) -> None:
+        sample = (slot.first_byte or time.perf_counter()) - slot.started
+        probe = self.state == HALF_OPEN and self._probe_in_flight
+        if probe:
+            self._probe_in_flight = False
+
+        if error is not None and is_overload_error(error):
+            self.overload_errors += 1
+            self._failures += 1
+            self._decrease(0.5)
+            if probe or self._failures >= BREAKER_FAILURES:
+                self.state = OPEN
+                self._open_until = time.monotonic() + BREAKER_COOLDOWN
+                self.breaker_opens += 1
+                logger.warning("circuit_open", extra={"fields": {"failures": self._failures, "error": type(error).__name__}})
+            return
+        if error is not None:
+            return
+
+        self._failures = 0
+        if probe:
+            self.state = CLOSED
+            logger.info("circuit_closed")
+        if self.latency and sample > GOVERNOR_LATENCY_TOLERANCE * self.latency:
+            # Upstream is slowing down: back off gently before it starts failing
+            self._decrease(0.9)
+        elif self.in_flight >= self.limit / 2:
+            # Additive increase, about +1 per limit's worth of successful calls
+            self.limit = min(GOVERNOR_MAX_LIMIT, self.limit + 1 / self.limit)
+        self.latency = sample if not self.latency else 0.95 * self.latency + 0.05 * sample
+
+    async def acquire(self, deadline: Optional[float] = None) -> Slot:
+        await self._admit(deadline if deadline is not None else current_deadline())
+        self.admitted += 1
+        return Slot()
+
+    def release(self, slot: Slot, error: Optional[BaseException] = None) -> None:
+        if isinstance(error, (asyncio.CancelledError, GeneratorExit)):
+            # Client went away or a hedge lost; says nothing about upstream health
+            if self.state == HALF_OPEN:
+                self._probe_in_flight = False
+        else:
+            self._record(slot, error)
+        self._release_slot()
+
+    @asynccontextmanager
+    async def slot(self, deadline: Optional[float] = None) -> AsyncIterator[Slot]:
+        slot = await self.acquire(deadline)
+        try:
+            yield slot
+        except BaseException as e:
+            self.release(slot, e)
+            raise
+        self.release(slot)
+
+    def stats(self):
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "latency_ewma_s": round(self.latency, 3),
+            "circuit": self.state,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "breaker_opens": self.breaker_opens,
+            "overload_errors": self.overload_errors,
+        }
+
+
+governor = UpstreamGovernor()
+
+
+async def shed_load() -> None:
+    # Route dependency, ahead of rate_limit so shed requests aren't charged
+    governor.precheck()
+
+REGISTRY.register_collector(lambda: [
+    ("upstream_concurrency_limit", "Current adaptive concurrency limit", governor.limit),
+    ("upstream_in_flight", "OpenAI calls in flight", governor.in_flight),
+    ("upstream_queued", "Requests waiting for an upstream slot", len(governor._waiters)),
+    ("upstream_latency_ewma_seconds", "Long-run upstream latency estimate", governor.latency),
+    ("upstream_circuit_state", "Circuit breaker state (0 closed, 1 half-open, 2 open)", {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}[governor.state]),
+    ("upstream_admitted_total", "Upstream calls admitted", governor.admitted),
+    ("upstream_shed_total", "Requests shed with 503", governor.shed),
+    ("upstream_breaker_opens_total", "Times the circuit breaker opened", governor.breaker_opens),
+    ("upstream_overload_errors_total", "429/5xx/timeout errors from upstream", governor.overload_errors),
+])
@@ -0,0 +1,87 @@
+"""
+Micro-benchmark of per-request authentication in get_current_user.
+
+Each case resolves the identity of a fresh request carrying the same
+auth_token cookie, as consecutive requests from one client do. "uncached"
+verifies the signature every time (the old behaviour); "cached" serves the
+verified claims by token digest. RS256 uses a throwaway key written to a
+temporary JWKS file.
+
+    python benchmarks/auth_cache.py --number 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rsa  # noqa: E402
+from jose import jwk, jwt  # noqa: E402
+
+_workdir = tempfile.mkdtemp()
+_public, _private = rsa.newkeys(2048)
+PRIVATE_PEM = _private.save_pkcs1().decode()
+_jwk = jwk.construct(_public.save_pkcs1().decode(), "RS256").to_dict()
+_jwk.update(kid="bench", alg="RS256")
+JWKS_PATH = os.path.join(_workdir, "jwks.json")
+with open(JWKS_PATH, "w") as f:
+    json.dump({"keys": [_jwk]}, f)
+
+# Settings are read at import
+os.environ.update(JWT_ALGORITHMS="HS256,RS256", JWT_JWKS_PATH=JWKS_PATH)
+
+from starlette.requests import Request  # noqa: E402
+
+from app.dependencies import auth  # noqa: E402
+
+
+def token(algorithm: str) -> str:
+    claims = {"userId": "bench-user", "exp": int(time.time()) + 3600}
+    if algorithm == "HS256":
+        return jwt.encode(claims, auth.SECRET_KEY, algorithm="HS256")
+    return jwt.encode(claims, PRIVATE_PEM, algorithm="RS256", headers={"kid": "bench"})
+
+
+def request_with(cookie: str) -> Request:
+    return Request({"type": "http", "headers": [(b"cookie", f"auth_token={cookie}".encode())]})
+
+
+def per_call_us(loop, cookie: str, number: int, repeat: int) -> float:
+    async def run():
+        for _ in range(number):
+            await auth.get_current_user(request_with(cookie))
+
+    timings = timeit.repeat(lambda: loop.run_until_complete(run()), number=1, repeat=repeat)
+    return min(timings) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    loop = asyncio.new_event_loop()
+    cache = auth.token_cache
+    report = {}
+    for algorithm in ("HS256", "RS256"):
+        cookie = token(algorithm)
+        auth.token_cache = None
+        uncached = per_call_us(loop, cookie, args.number, args.repeat)
+        auth.token_cache = cache
+        cached = per_call_us(loop, cookie, args.number, args.repeat)
+        report[algorithm] = {
+            "uncached_us": round(uncached, 3),
+            "cached_us": round(cached, 3),
+            "speedup": round(uncached / cached, 1),
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Cold-start benchmark for the Lambda entry point.
+
+Each run starts a fresh interpreter, imports app.main and sends one synthetic
+API Gateway event through lambda_handler. Reports import time per module
+(from python -X importtime) and time to the first handled request.
+
+    python benchmarks/cold_start.py --runs 20 --output cold_start.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Executed in the child interpreter; prints one JSON line with its timings
+CHILD = r"""
+import json, time
+t0 = time.perf_counter()
+import app.main
+t1 = time.perf_counter()
+event = {
+    "version": "2.0",
+    "routeKey": "$default",
+    "rawPath": "/",
+    "rawQueryString": "",
+    "headers": {"host": "localhost"},
+    "requestContext": {
+        "http": {"method": "GET", "path": "/", "protocol": "HTTP/1.1", "sourceIp": "127.0.0.1", "userAgent": "bench"},
+        "requestId": "bench",
+        "stage": "$default",
+    },
+    "isBase64Encoded": False,
+}
+response = app.main.lambda_handler(event, None)
+t2 = time.perf_counter()
+print(json.dumps({"import_ms": (t1 - t0) * 1000, "first_request_ms": (t2 - t1) * 1000,
+                  "total_ms": (t2 - t0) * 1000, "status": response["statusCode"]}))
+"""
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def summarize(values):
+    return {
+        "p50": round(percentile(values, 50), 2),
+        "p99": round(percentile(values, 99), 2),
+        "mean": round(statistics.mean(values), 2),
+        "max": round(max(values), 2),
+    }
+
+
+def child_env(prewarm: bool):
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    env["PREWARM_CLIENT"] = "true" if prewarm else "false"
+    env["PYTHONPATH"] = ROOT_DIR + os.pathsep + env.get("PYTHONPATH", "")
+    return env
+
+
+def parse_importtime(stderr: str):
+    # Lines look like: "import time:   self [us] | cumulative | imported package"
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, self_us, cumulative_us, name = line.replace("import time:", "|", 1).split("|")
+        # Nesting is encoded as two spaces of indentation per level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules[name.strip()] = {
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+            "depth": depth,
+        }
+    return modules
+
+
+def run_once(prewarm: bool, importtime: bool):
+    command = [sys.executable]
+    if importtime:
+        command += ["-X", "importtime"]
+    command += ["-c", CHILD]
+    proc = subprocess.run(command, cwd=ROOT_DIR, env=child_env(prewarm), capture_output=True, text=True, check=True)
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    return result, (parse_importtime(proc.stderr) if importtime else None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=15, help="number of slowest modules to report")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = {"runs": args.runs}
+    for prewarm in (False, True):
+        runs = [run_once(prewarm, importtime=False)[0] for _ in range(args.runs)]
+        report["prewarm" if prewarm else "lazy"] = {
+            key: summarize([r[key] for r in runs]) for key in ("import_ms", "first_request_ms", "total_ms")
+        }
+
+    # One extra run under -X importtime (it inflates timings, so it is kept separate)
+    _, modules = run_once(prewarm=False, importtime=True)
+    app_modules = {name: t for name, t in modules.items() if name == "app" or name.startswith("app.")}
+    slowest = sorted(modules.items(), key=lambda item: item[1]["self_ms"], reverse=True)
+    report["imports"] = {
+        "app_modules_cumulative_ms": {name: round(t["cumulative_ms"], 2) for name, t in app_modules.items()},
+        "slowest_self_ms": [{"module": name, "self_ms": round(t["self_ms"], 2), "cumulative_ms": round(t["cumulative_ms"], 2)}
+                            for name, t in slowest[: args.top]],
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
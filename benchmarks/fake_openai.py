@@ -0,0 +1,242 @@
+"""
+Local OpenAI-compatible stand-in for the chat completions endpoint.
+
+Answers POST /v1/chat/completions with a call to whichever tool the request
+forces (or its only tool), as a single JSON response or, with stream=true, as
+SSE chunks ending in a usage chunk. Array-typed tool outputs get a list of
+bullets, string outputs a paragraph. Latency, streaming pace, response size
+and injected errors are configurable; GET /stats reports what was served.
+
+Latency specs: "fixed:MS", "uniform:LO_MS,HI_MS" or "lognormal:MEDIAN_MS,SIGMA".
+
+    python benchmarks/fake_openai.py --port 8900 --latency lognormal:400,0.4 --error-rate 0.02
+    OPENAI_BASE_URL=http://127.0.0.1:8900/v1 uvicorn app.main:app
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import socket
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+WORDS = (
+    "Designed built and shipped scalable services improving reliability latency and cost "
+    "for customers across teams while mentoring engineers and owning delivery end to end"
+).split()
+
+
+@dataclass
+class StubConfig:
+    latency: str = "fixed:0"  # time to the first byte
+    chunk_delay_ms: float = 0.0  # between streamed chunks
+    chunk_chars: int = 8  # tool-argument characters per streamed chunk
+    completion_words: int = 40
+    bullets: int = 4  # for array outputs
+    # None estimates prompt tokens from the request size (~4 bytes per token)
+    prompt_tokens: Optional[int] = None
+    cached_tokens: int = 0
+    error_rate: float = 0.0
+    error_statuses: Tuple[int, ...] = (429, 500)
+    seed: Optional[int] = None
+
+
+def latency_sampler(spec: str, rng: random.Random) -> Callable[[], float]:
+    """Returns a function yielding latencies in seconds."""
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",")] if params else [0.0]
+    if kind == "fixed":
+        return lambda: values[0] / 1000
+    if kind == "uniform":
+        return lambda: rng.uniform(values[0], values[1]) / 1000
+    if kind == "lognormal":
+        median, sigma = values
+        return lambda: rng.lognormvariate(math.log(median), sigma) / 1000
+    raise ValueError(f"Unknown latency spec: {spec}")
+
+
+def requested_tool(body: dict) -> dict:
+    choice = body.get("tool_choice")
+    if isinstance(choice, dict):
+        name = choice["function"]["name"]
+        return next(t for t in body["tools"] if t["function"]["name"] == name)
+    return body["tools"][0]
+
+
+def description_for(tool: dict, config: StubConfig, rng: random.Random):
+    schema = tool["function"]["parameters"]["properties"]["description"]
+    per_bullet = max(1, config.completion_words // config.bullets)
+
+    def words(n):
+        return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + "."
+
+    if schema.get("type") == "array":
+        return [words(per_bullet) for _ in range(config.bullets)]
+    return words(config.completion_words)
+
+
+def usage_for(body_size: int, arguments: str, config: StubConfig) -> dict:
+    prompt = config.prompt_tokens if config.prompt_tokens is not None else body_size // 4
+    completion = max(1, len(arguments) // 4)
+    return {
+        "prompt_tokens": prompt,
+        "completion_tokens": completion,
+        "total_tokens": prompt + completion,
+        "prompt_tokens_details": {"cached_tokens": min(config.cached_tokens, prompt)},
+    }
+
+
+def completion_body(tool_name: str, choices: List[str], usage: dict) -> dict:
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": "gpt-4o-mini",
+        "choices": [{
+            "index": index,
+            "finish_reason": "tool_calls",
+            "message": {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [{"id": "call_1", "type": "function", "function": {"name": tool_name, "arguments": arguments}}],
+            },
+        } for index, arguments in enumerate(choices)],
+        "usage": usage,
+    }
+
+
+def stream_chunks(tool_name: str, choices: List[str], usage: Optional[dict], chunk_chars: int) -> List[dict]:
+    # With several choices their chunks are interleaved round-robin, as the API does
+    base = {"id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "object": "chat.completion.chunk", "created": int(time.time()), "model": "gpt-4o-mini"}
+
+    def chunk(index, delta, finish_reason=None):
+        return {**base, "choices": [{"index": index, "delta": delta, "finish_reason": finish_reason}]}
+
+    chunks = [chunk(index, {"role": "assistant", "content": None, "tool_calls": [
+        {"index": 0, "id": "call_1", "type": "function", "function": {"name": tool_name, "arguments": ""}},
+    ]}) for index in range(len(choices))]
+    for i in range(0, max(len(arguments) for arguments in choices), chunk_chars):
+        for index, arguments in enumerate(choices):
+            if i < len(arguments):
+                chunks.append(chunk(index, {"tool_calls": [{"index": 0, "function": {"arguments": arguments[i:i + chunk_chars]}}]}))
+    chunks.extend(chunk(index, {}, "tool_calls") for index in range(len(choices)))
+    if usage is not None:
+        chunks.append({**base, "choices": [], "usage": usage})
+    return chunks
+
+
+def create_app(config: Optional[StubConfig] = None) -> Starlette:
+    config = config or StubConfig()
+    rng = random.Random(config.seed)
+    sample_latency = latency_sampler(config.latency, rng)
+    stats: Dict[str, int] = {"requests": 0, "streams": 0, "errors": 0}
+
+    async def completions(request: Request):
+        raw = await request.body()
+        body = json.loads(raw)
+        stats["requests"] += 1
+        await asyncio.sleep(sample_latency())
+
+        if config.error_rate and rng.random() < config.error_rate:
+            stats["errors"] += 1
+            status = rng.choice(config.error_statuses)
+            headers = {"Retry-After": "1"} if status == 429 else None
+            error = {"message": "Injected failure", "type": "server_error" if status >= 500 else "rate_limit_exceeded", "code": None}
+            return JSONResponse({"error": error}, status_code=status, headers=headers)
+
+        tool = requested_tool(body)
+        tool_name = tool["function"]["name"]
+        choices = [json.dumps({"description": description_for(tool, config, rng)}) for _ in range(body.get("n") or 1)]
+        usage = usage_for(len(raw), "".join(choices), config)
+        if not body.get("stream"):
+            return JSONResponse(completion_body(tool_name, choices, usage))
+
+        stats["streams"] += 1
+        include_usage = (body.get("stream_options") or {}).get("include_usage")
+        chunks = stream_chunks(tool_name, choices, usage if include_usage else None, config.chunk_chars)
+
+        async def events():
+            for chunk in chunks:
+                if config.chunk_delay_ms:
+                    await asyncio.sleep(config.chunk_delay_ms / 1000)
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    async def stats_route(request: Request):
+        return JSONResponse(stats)
+
+    return Starlette(routes=[
+        Route("/v1/chat/completions", completions, methods=["POST"]),
+        Route("/stats", stats_route, methods=["GET"]),
+    ])
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class FakeServer:
+    """Runs the stand-in on a background thread for the duration of a with-block."""
+
+    def __init__(self, app, port: int = 0):
+        self.port = port or free_port()
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    def __enter__(self) -> "FakeServer":
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.server.should_exit = True
+        self.thread.join()
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency", default="fixed:0", help="stub time to first byte, e.g. lognormal:400,0.4")
+    parser.add_argument("--chunk-delay-ms", type=float, default=0.0)
+    parser.add_argument("--completion-words", type=int, default=40)
+    parser.add_argument("--prompt-tokens", type=int)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-statuses", default="429,500")
+    parser.add_argument("--seed", type=int)
+
+
+def stub_config(args: argparse.Namespace) -> StubConfig:
+    return StubConfig(
+        latency=args.latency,
+        chunk_delay_ms=args.chunk_delay_ms,
+        completion_words=args.completion_words,
+        prompt_tokens=args.prompt_tokens,
+        error_rate=args.error_rate,
+        error_statuses=tuple(int(s) for s in args.error_statuses.split(",")),
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8900)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(create_app(stub_config(args)), host="127.0.0.1", port=args.port, log_level="warning")
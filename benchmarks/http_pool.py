@@ -0,0 +1,114 @@
+"""
+Cold vs pooled connections to the OpenAI API, against a local stand-in.
+
+"cold" disables keep-alive so every completion opens a new connection, which
+is what a client rebuilt per request (or a pool that expired between Lambda
+invocations) pays. "pooled" is the client the service builds. Both go through
+the same tracing transport, so the report includes connection counts and
+connect times as the service would export them. Against a real endpoint the
+gap also includes DNS and the TLS handshake; point --base-url at one to see it.
+
+    python benchmarks/http_pool.py --requests 300 --concurrency 8
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+from openai import AsyncOpenAI  # noqa: E402
+
+from app.utils import http_transport  # noqa: E402
+from benchmarks.fake_openai import FakeServer, StubConfig, create_app  # noqa: E402
+
+TOOLS = [{
+    "type": "function",
+    "function": {
+        "name": "generate_summary_description",
+        "description": "Generates summary",
+        "parameters": {"type": "object", "properties": {"description": {"type": "string"}}, "required": ["description"]},
+    },
+}]
+MESSAGES = [{"role": "user", "content": "position: Backend Engineer, company: TechCorp"}]
+
+
+def connect_totals():
+    # (sum of seconds, count) recorded so far by the tracing transport
+    _, total, count = http_transport.connect_time.series.get((), (None, 0.0, 0))
+    return total, count
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run(base_url: str, limits, requests: int, concurrency: int):
+    client = AsyncOpenAI(
+        api_key="benchmark",
+        base_url=base_url,
+        max_retries=0,
+        http_client=http_transport.build_http_client(limits),
+    )
+    opened_before = http_transport.connections_opened.total()
+    connect_sum_before, connect_count_before = connect_totals()
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            await client.chat.completions.create(model="gpt-4o-mini", messages=MESSAGES, tools=TOOLS, tool_choice="auto")
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    await client.close()
+
+    connect_sum, connect_count = connect_totals()
+    new_connects = connect_count - connect_count_before
+    return {
+        "rps": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 3),
+        "connections_opened": http_transport.connections_opened.total() - opened_before,
+        "mean_connect_ms": round((connect_sum - connect_sum_before) / new_connects * 1000, 3) if new_connects else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="stand-in server latency")
+    parser.add_argument("--base-url", help="benchmark an existing endpoint instead of the local stand-in")
+    args = parser.parse_args()
+
+    cold = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=0)
+
+    def measure(base_url):
+        report = {}
+        # Warm up imports and the server before timing either mode
+        asyncio.run(run(base_url, None, args.concurrency, args.concurrency))
+        report["cold"] = asyncio.run(run(base_url, cold, args.requests, args.concurrency))
+        report["pooled"] = asyncio.run(run(base_url, None, args.requests, args.concurrency))
+        return report
+
+    if args.base_url:
+        report = measure(args.base_url)
+    else:
+        with FakeServer(create_app(StubConfig(latency=f"fixed:{args.latency_ms}"))) as server:
+            report = measure(server.base_url)
+    report["p50_saved_ms"] = round(report["cold"]["p50_ms"] - report["pooled"]["p50_ms"], 3)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+"""
+Load test for every generation route against the local OpenAI stand-in.
+
+Two targets:
+  uvicorn  the app served by uvicorn in a subprocess, driven over HTTP with
+           concurrent clients; streamed routes report time to first SSE event
+  lambda   Mangum's lambda_handler invoked in-process with synthetic API
+           Gateway events, one at a time as a single Lambda container would.
+           Mangum buffers the body, so there is no time to first event.
+
+Each route runs with stream=false and stream=true. The report is JSON
+(requests/s, p50/p95/p99 latency, time to first event, memory per request).
+With --baseline, p95 and requests/s are compared against an earlier report
+and the exit status is 1 if any regressed by more than --max-regression.
+
+    python benchmarks/load_test.py --target both --requests 100 --concurrency 8 \\
+        --latency lognormal:300,0.4 --chunk-delay-ms 5 --output perf.json
+    python benchmarks/load_test.py --baseline perf.json --max-regression 0.15
+"""
+import argparse
+import asyncio
+import base64
+import gc
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+import uuid
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.fake_openai import FakeServer, add_stub_arguments, create_app, free_port, stub_config  # noqa: E402
+
+# Applied before the app is imported (in-process) or started (subprocess):
+# no limits or caches in the way, quiet logs, the stand-in as upstream
+APP_ENV = {
+    "OPENAI_API_KEY": "benchmark",
+    "JWT_SECRET": "benchmark-secret",
+    "RATE_LIMIT_REQUESTS": "1000000000",
+    "RATE_LIMIT_TOKENS": "1000000000000",
+    "COMPLETION_CACHE": "off",
+    "FUZZY_REUSE": "off",
+    "LOG_LEVEL": "WARNING",
+    "METRICS_MODE": "off",
+    "PREWARM_CLIENT": "true",
+}
+
+JOB = "Senior backend engineer: Python, FastAPI, AWS Lambda, PostgreSQL, observability."
+PAYLOADS = {
+    "summary": {"jobDescription": JOB, "targetPosition": "Senior Backend Engineer", "targetCompany": "TechCorp"},
+    "education": {"institution": "MIT", "degree": "BS", "fieldOfStudy": "Computer Science", "jobDescription": JOB},
+    "experience": {"company": "Amazon", "position": "Software Developer", "technologies": ["Python", "AWS"], "jobDescription": JOB},
+    "project": {"projectName": "E-commerce Platform", "technologies": ["React", "Node.js"], "jobDescription": JOB},
+    "certification": {"certificationName": "Microsoft Azure Administrator", "jobDescription": JOB},
+    "publication": {"title": "Machine Learning Approaches", "publisher": "ACM Conference", "jobDescription": JOB},
+}
+
+
+def route_payloads() -> Dict[str, dict]:
+    routes = {f"/api/generate-{name}": body for name, body in PAYLOADS.items()}
+    routes["/api/generate-resume"] = {
+        "sections": [{"id": name, "type": name, "input": body} for name, body in PAYLOADS.items()],
+    }
+    return routes
+
+
+def unique(body: dict, n: int) -> dict:
+    # Distinct inputs so no request is served by caching or coalescing
+    body = json.loads(json.dumps(body))
+    if "sections" in body:
+        for section in body["sections"]:
+            section["input"]["jobDescription"] = f"{JOB} #{n}"
+    else:
+        body["jobDescription"] = f"{JOB} #{n}"
+    return body
+
+
+def auth_token() -> str:
+    from jose import jwt
+
+    return jwt.encode({"userId": "load-test", "exp": int(time.time()) + 3600}, APP_ENV["JWT_SECRET"], algorithm="HS256")
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+
+
+def summarize(latencies: List[float], first_events: List[float], errors: int, elapsed: float) -> dict:
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "rps": round((len(latencies) + errors) / elapsed, 2) if elapsed else None,
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        "ttfe_p50_ms": percentile(first_events, 0.50),
+        "ttfe_p95_ms": percentile(first_events, 0.95),
+    }
+
+
+def rss_kb(pid: int, field: str = "VmRSS") -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+# -- uvicorn -----------------------------------------------------------------
+
+async def drive_http(base: str, path: str, body: dict, stream: bool, requests: int, concurrency: int, token: str) -> dict:
+    import httpx
+
+    latencies, first_events, errors = [], [], [0]
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base, cookies={"auth_token": token}, limits=limits, timeout=60) as client:
+
+        async def one(n: int):
+            async with semaphore:
+                started = time.perf_counter()
+                async with client.stream("POST", path, params={"stream": str(stream).lower()}, json=unique(body, n)) as response:
+                    first = None
+                    failed = response.status_code != 200
+                    async for line in response.aiter_lines():
+                        if first is None and line.startswith("data:"):
+                            first = time.perf_counter() - started
+                        if line.startswith("data: [ERROR]"):
+                            failed = True
+                if failed:
+                    errors[0] += 1
+                    return
+                latencies.append(time.perf_counter() - started)
+                if stream and first is not None:
+                    first_events.append(first)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(n) for n in range(requests)))
+        elapsed = time.perf_counter() - started
+    return summarize(latencies, first_events, errors[0], elapsed)
+
+
+def run_uvicorn(args, stub_url: str) -> dict:
+    import httpx
+
+    port = free_port()
+    env = {**os.environ, **APP_ENV, "OPENAI_BASE_URL": stub_url}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning", "--no-access-log"],
+        cwd=ROOT, env=env, stdout=sys.stderr,
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(300):
+            try:
+                httpx.get(base + "/", timeout=1)
+                break
+            except httpx.HTTPError:
+                time.sleep(0.05)
+        token = auth_token()
+        payloads = route_payloads()
+        # Warm-up: first requests pay for lazy imports and connection setup
+        for path, body in payloads.items():
+            asyncio.run(drive_http(base, path, body, False, 2, 1, token))
+        rss_before = rss_kb(server.pid)
+
+        routes, total, started = {}, 0, time.perf_counter()
+        for path, body in payloads.items():
+            for stream in (False, True):
+                name = path.rsplit("-", 1)[1] + (":stream" if stream else "")
+                routes[name] = asyncio.run(drive_http(base, path, body, stream, args.requests, args.concurrency, token))
+                total += routes[name]["requests"]
+        elapsed = time.perf_counter() - started
+        rss_after = rss_kb(server.pid)
+        memory = {
+            "rss_before_kb": rss_before,
+            "rss_after_kb": rss_after,
+            "rss_peak_kb": rss_kb(server.pid, "VmHWM"),
+            "rss_growth_per_request_kb": round((rss_after - rss_before) / total, 3) if rss_before and rss_after else None,
+        }
+        return {"routes": routes, "overall_rps": round(total / elapsed, 2), "memory": memory}
+    finally:
+        server.terminate()
+        server.wait()
+
+
+# -- lambda ------------------------------------------------------------------
+
+def api_gateway_event(path: str, body: dict, stream: bool, token: str) -> dict:
+    raw = json.dumps(body)
+    headers = {"content-type": "application/json", "cookie": f"auth_token={token}", "host": "lambda.local", "content-length": str(len(raw))}
+    query = {"stream": str(stream).lower()}
+    return {
+        "resource": "/{proxy+}",
+        "path": path,
+        "httpMethod": "POST",
+        "headers": headers,
+        "multiValueHeaders": {k: [v] for k, v in headers.items()},
+        "queryStringParameters": query,
+        "multiValueQueryStringParameters": {k: [v] for k, v in query.items()},
+        "pathParameters": {"proxy": path.lstrip("/")},
+        "stageVariables": None,
+        "requestContext": {
+            "resourcePath": "/{proxy+}",
+            "httpMethod": "POST",
+            "path": path,
+            "stage": "prod",
+            "requestId": uuid.uuid4().hex,
+            "identity": {"sourceIp": "127.0.0.1"},
+        },
+        "body": raw,
+        "isBase64Encoded": False,
+    }
+
+
+def lambda_context():
+    return SimpleNamespace(
+        aws_request_id=uuid.uuid4().hex,
+        function_name="resume-completion-load-test",
+        memory_limit_in_mb=1024,
+        get_remaining_time_in_millis=lambda: 30000,
+    )
+
+
+def invoke_failed(response: dict) -> bool:
+    if response["statusCode"] != 200:
+        return True
+    body = response.get("body") or ""
+    if response.get("isBase64Encoded"):
+        body = base64.b64decode(body).decode()
+    return "data: [ERROR]" in body
+
+
+def run_lambda(args, stub_url: str) -> dict:
+    os.environ.update(APP_ENV)
+    os.environ["OPENAI_BASE_URL"] = stub_url
+    # The app's log handler binds sys.stdout at import; keep stdout for the report
+    stdout, sys.stdout = sys.stdout, sys.stderr
+    try:
+        from app.main import lambda_handler
+    finally:
+        sys.stdout = stdout
+
+    # Mangum runs each invocation on the thread's current loop, as the Lambda
+    # runtime provides; asyncio.run() in the uvicorn target leaves none set
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    token = auth_token()
+    payloads = route_payloads()
+    for path, body in payloads.items():
+        lambda_handler(api_gateway_event(path, unique(body, -1), False, token), lambda_context())
+
+    routes, total, started = {}, 0, time.perf_counter()
+    for path, body in payloads.items():
+        for stream in (False, True):
+            name = path.rsplit("-", 1)[1] + (":stream" if stream else "")
+            latencies, errors = [], 0
+            route_started = time.perf_counter()
+            for n in range(args.requests):
+                event = api_gateway_event(path, unique(body, n), stream, token)
+                invoked = time.perf_counter()
+                if invoke_failed(lambda_handler(event, lambda_context())):
+                    errors += 1
+                else:
+                    latencies.append(time.perf_counter() - invoked)
+            routes[name] = summarize(latencies, [], errors, time.perf_counter() - route_started)
+            total += args.requests
+    elapsed = time.perf_counter() - started
+
+    # Separate pass: tracemalloc slows allocation, so it never overlaps timing
+    peaks = []
+    for path, body in payloads.items():
+        for n in range(args.memory_samples):
+            gc.collect()
+            tracemalloc.start()
+            lambda_handler(api_gateway_event(path, unique(body, n), n % 2 == 1, token), lambda_context())
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+    memory = {
+        "peak_alloc_per_request_kb": round(sum(peaks) / len(peaks) / 1024, 3) if peaks else None,
+        "max_peak_alloc_kb": round(max(peaks) / 1024, 3) if peaks else None,
+        "rss_kb": rss_kb(os.getpid()),
+    }
+    return {"routes": routes, "overall_rps": round(total / elapsed, 2), "memory": memory}
+
+
+# -- regression gate -----------------------------------------------------------
+
+def regressions(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    found = []
+    for target in ("uvicorn", "lambda"):
+        if target not in report or target not in baseline:
+            continue
+        for route, now in report[target]["routes"].items():
+            before = baseline[target]["routes"].get(route)
+            if not before:
+                continue
+            if before.get("p95_ms") and now.get("p95_ms") and now["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+                found.append(f"{target} {route}: p95 {before['p95_ms']} -> {now['p95_ms']} ms")
+            if before.get("rps") and now.get("rps") and now["rps"] < before["rps"] * (1 - tolerance):
+                found.append(f"{target} {route}: rps {before['rps']} -> {now['rps']}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=("uvicorn", "lambda", "both"), default="both")
+    parser.add_argument("--requests", type=int, default=50, help="per route and stream mode")
+    parser.add_argument("--concurrency", type=int, default=8, help="uvicorn target only")
+    parser.add_argument("--memory-samples", type=int, default=5, help="tracemalloc invocations per route (lambda)")
+    parser.add_argument("--output", help="write the JSON report here as well as stdout")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.15)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    report = {"config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")}}
+    with FakeServer(create_app(stub_config(args))) as stub:
+        if args.target in ("uvicorn", "both"):
+            report["uvicorn"] = run_uvicorn(args, stub.base_url)
+        if args.target in ("lambda", "both"):
+            report["lambda"] = run_lambda(args, stub.base_url)
+
+    rendered = json.dumps(report, indent=2)
+    print(rendered)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(rendered + "\n")
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(report, json.load(f), args.max_regression)
+        for line in found:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        sys.exit(1 if found else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Micro-benchmark of per-request prompt assembly.
+
+"before" is a verbatim copy of the pre-registry builders (system message and
+tool schema rebuilt on every call, fields formatted by hand); "after" is the
+section registry. Both are timed with and without the cache fingerprint,
+which is computed for every request.
+
+    python benchmarks/prompt_build.py --number 20000
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.schemas.validation import ExperienceInput, SummaryInput  # noqa: E402
+from app.services.resume_service import generate_experience, generate_summary  # noqa: E402
+from app.utils.completion_cache import cache_key  # noqa: E402
+
+
+def legacy_create_system_message(section_type):
+    content = (
+        "You are an ATS-optimized resume expert. "
+        + ("Craft a professional summary." if section_type == "summary" else f"Generate a detailed, keyword-rich description for a {section_type} entry.")
+    )
+    return {"role": "system", "content": content}
+
+
+def legacy_create_tool(tool_name, is_array_output):
+    return {
+        "type": "function",
+        "function": {
+            "name": tool_name,
+            "description": f"Generates {tool_name.replace('generate_', '').replace('_description', '')}",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "description": (
+                        {"type": "array", "items": {"type": "string"}} if is_array_output else {"type": "string"}
+                    )
+                },
+                "required": ["description"],
+            },
+        },
+    }
+
+
+def legacy_generate_summary(input):
+    parts = [
+        f"job: {input.jobDescription}",
+        f"position: {input.targetPosition}",
+        f"company: {input.targetCompany}"
+    ]
+    if input.fullName:
+        parts.append(f"candidate name: {input.fullName}")
+    if input.rawSummary:
+        parts.append(f"summary hints: {input.rawSummary}")
+    if input.rawDescription:
+        parts.append(f"additional notes: {'; '.join(input.rawDescription)}")
+    user_content = "Generate a concise, ATS-friendly summary using " + ", ".join(parts) + "."
+    messages = [legacy_create_system_message("summary"), {"role": "user", "content": user_content}]
+    tools = [legacy_create_tool("generate_summary", False)]
+    return messages, tools, "generate_summary", "summary"
+
+
+def legacy_generate_experience(input):
+    parts = [
+        f"company: {input.company}",
+        f"position: {input.position}"
+    ]
+    if input.location:
+        parts.append(f"location: {input.location}")
+    if input.startDate or input.endDate:
+        parts.append(f"tenure: {input.startDate or 'N/A'} to {input.endDate or 'Present'}")
+    if input.current:
+        parts.append("currently in role")
+    if input.technologies:
+        parts.append(f"technologies: {', '.join(input.technologies)}")
+    if input.achievements:
+        parts.append(f"achievements: {'; '.join(input.achievements)}")
+    if input.rawDescription:
+        parts.append(f"notes: {'; '.join(input.rawDescription)}")
+    parts.append(f"for target job: {input.jobDescription}")
+    user_content = "Generate ATS-friendly experience description with " + ", ".join(parts) + "."
+    messages = [legacy_create_system_message("experience"), {"role": "user", "content": user_content}]
+    tools = [legacy_create_tool("generate_experience_description", True)]
+    return messages, tools, "generate_experience_description", "experience"
+
+
+SUMMARY = SummaryInput(
+    jobDescription="Senior backend engineer, Python, FastAPI, AWS Lambda, PostgreSQL.",
+    targetPosition="Senior Backend Engineer",
+    targetCompany="TechCorp",
+    fullName="Jane Doe",
+    rawDescription=["8 years of Python", "led a team of 5"],
+)
+EXPERIENCE = ExperienceInput(
+    company="Amazon",
+    position="Software Developer",
+    location="Seattle",
+    startDate="2019-01",
+    current=True,
+    technologies=["Python", "AWS", "DynamoDB"],
+    achievements=["cut p99 latency by 40%"],
+    rawDescription=["owned checkout service"],
+    jobDescription="Lead Developer position",
+)
+
+CASES = {
+    "summary": (lambda: legacy_generate_summary(SUMMARY), lambda: generate_summary(SUMMARY)),
+    "experience": (lambda: legacy_generate_experience(EXPERIENCE), lambda: generate_experience(EXPERIENCE)),
+}
+
+
+def fingerprinted(build):
+    def run():
+        messages, tools, tool_name, _ = build()
+        return cache_key("gpt-4o-mini", messages, tools, tool_name)
+    return run
+
+
+def per_call_us(fn, number, repeat):
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    report = {}
+    for name, (before, after) in CASES.items():
+        # Sanity check: the registry must produce the same prompt
+        assert before()[0] == after()[0] and before()[1] == list(after()[1]), name
+        report[name] = {
+            "build_us": {
+                "before": round(per_call_us(before, args.number, args.repeat), 3),
+                "after": round(per_call_us(after, args.number, args.repeat), 3),
+            },
+            "build_and_fingerprint_us": {
+                "before": round(per_call_us(fingerprinted(before), args.number, args.repeat), 3),
+                "after": round(per_call_us(fingerprinted(after), args.number, args.repeat), 3),
+            },
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
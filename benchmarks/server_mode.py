@@ -0,0 +1,193 @@
+"""
+Requests/s per vCPU: gunicorn server mode vs the Lambda path.
+
+Both drive every generation route (stream=false and stream=true) against the
+local OpenAI stand-in, which runs in its own process so its CPU is never
+counted.
+
+  server  gunicorn + uvicorn workers (app/gunicorn_conf.py), driven over HTTP
+          with --concurrency clients. CPU is read from /proc for the master
+          and its workers over the measured phase.
+  lambda  Mangum's lambda_handler invoked in-process one request at a time,
+          as a Lambda container runs. The container holds its vCPU share
+          (--lambda-memory-mb / 1769) for the whole invocation, upstream wait
+          included, so rps per vCPU is its throughput divided by that share.
+
+"rps_per_vcpu" divides throughput by the vCPUs provisioned; "requests_per_cpu_second"
+by the CPU time actually consumed.
+
+    python benchmarks/server_mode.py --requests 100 --workers 2 --concurrency 32 --latency lognormal:300,0.4
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import httpx  # noqa: E402
+
+from benchmarks.fake_openai import add_stub_arguments, free_port  # noqa: E402
+from benchmarks.load_test import (  # noqa: E402
+    APP_ENV, api_gateway_event, auth_token, drive_http, invoke_failed, lambda_context, route_payloads, unique,
+)
+
+# Lambda allocates one full vCPU at this memory size
+LAMBDA_MB_PER_VCPU = 1769
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+
+def wait_for(url: str) -> None:
+    for _ in range(300):
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.05)
+    raise RuntimeError(f"{url} did not come up")
+
+
+def start_stub(args) -> subprocess.Popen:
+    command = [sys.executable, os.path.join(ROOT, "benchmarks", "fake_openai.py"), "--port", str(args.stub_port),
+               "--latency", args.latency, "--chunk-delay-ms", str(args.chunk_delay_ms),
+               "--completion-words", str(args.completion_words), "--error-rate", str(args.error_rate),
+               "--error-statuses", args.error_statuses]
+    if args.prompt_tokens is not None:
+        command += ["--prompt-tokens", str(args.prompt_tokens)]
+    if args.seed is not None:
+        command += ["--seed", str(args.seed)]
+    stub = subprocess.Popen(command, stdout=sys.stderr, stderr=sys.stderr)
+    wait_for(f"http://127.0.0.1:{args.stub_port}/stats")
+    return stub
+
+
+def process_tree(pid: int):
+    pids = [pid]
+    for task in os.listdir(f"/proc/{pid}/task"):
+        with open(f"/proc/{pid}/task/{task}/children") as f:
+            pids.extend(int(child) for child in f.read().split())
+    return pids
+
+
+def cpu_seconds(pids) -> float:
+    total = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        total += int(fields[11]) + int(fields[12])  # utime, stime
+    return total / CLOCK_TICKS
+
+
+def drive_routes(run_one) -> tuple:
+    routes, total = {}, 0
+    started = time.perf_counter()
+    for path, body in route_payloads().items():
+        for stream in (False, True):
+            name = path.rsplit("-", 1)[1] + (":stream" if stream else "")
+            routes[name] = run_one(path, body, stream)
+            total += routes[name]["requests"]
+    return routes, total, time.perf_counter() - started
+
+
+def run_server(args, stub_url: str) -> dict:
+    port = free_port()
+    env = {**os.environ, **APP_ENV, "OPENAI_BASE_URL": stub_url, "PORT": str(port), "WEB_CONCURRENCY": str(args.workers),
+           "WORKER_MAX_CONCURRENCY": str(args.worker_concurrency), "SERVER_RESUME_JOBS": "false"}
+    server = subprocess.Popen(["gunicorn", "-c", "app/gunicorn_conf.py", "app.main:app"], cwd=ROOT, env=env, stdout=sys.stderr)
+    base = f"http://127.0.0.1:{port}"
+    try:
+        wait_for(base + "/ready")
+        token = auth_token()
+        for path, body in route_payloads().items():
+            asyncio.run(drive_http(base, path, body, False, args.workers * 2, args.workers, token))
+        pids = process_tree(server.pid)
+        cpu_before = cpu_seconds(pids)
+        routes, total, elapsed = drive_routes(
+            lambda path, body, stream: asyncio.run(drive_http(base, path, body, stream, args.requests, args.concurrency, token))
+        )
+        cpu = cpu_seconds(pids) - cpu_before
+    finally:
+        server.terminate()
+        server.wait()
+    vcpus = args.vcpus or min(args.workers, os.cpu_count() or 1)
+    rps = total / elapsed
+    return {
+        "workers": args.workers,
+        "vcpus": vcpus,
+        "rps": round(rps, 2),
+        "cpu_seconds": round(cpu, 3),
+        "rps_per_vcpu": round(rps / vcpus, 2),
+        "requests_per_cpu_second": round(total / cpu, 2) if cpu else None,
+        "routes": routes,
+    }
+
+
+def run_lambda(args, stub_url: str) -> dict:
+    os.environ.update(APP_ENV)
+    os.environ["OPENAI_BASE_URL"] = stub_url
+    # The app's log handler binds sys.stdout at import; keep stdout for the report
+    stdout, sys.stdout = sys.stdout, sys.stderr
+    try:
+        from app.main import lambda_handler
+    finally:
+        sys.stdout = stdout
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    token = auth_token()
+    for path, body in route_payloads().items():
+        lambda_handler(api_gateway_event(path, unique(body, -1), False, token), lambda_context())
+
+    def run_one(path, body, stream):
+        errors, started = 0, time.perf_counter()
+        for n in range(args.requests):
+            errors += invoke_failed(lambda_handler(api_gateway_event(path, unique(body, n), stream, token), lambda_context()))
+        elapsed = time.perf_counter() - started
+        return {"requests": args.requests, "errors": errors, "rps": round(args.requests / elapsed, 2)}
+
+    cpu_before = time.process_time()
+    routes, total, elapsed = drive_routes(run_one)
+    cpu = time.process_time() - cpu_before
+    share = args.lambda_memory_mb / LAMBDA_MB_PER_VCPU
+    rps = total / elapsed
+    return {
+        "memory_mb": args.lambda_memory_mb,
+        "vcpus": round(share, 3),
+        "rps": round(rps, 2),
+        "cpu_seconds": round(cpu, 3),
+        "rps_per_vcpu": round(rps / share, 2),
+        "requests_per_cpu_second": round(total / cpu, 2) if cpu else None,
+        "routes": routes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50, help="per route and stream mode")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--worker-concurrency", type=int, default=0, help="WORKER_MAX_CONCURRENCY; 0 is unlimited")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent clients against the server")
+    parser.add_argument("--vcpus", type=float, help="vCPUs the server is provisioned with (default: min(workers, cpus))")
+    parser.add_argument("--lambda-memory-mb", type=int, default=1024)
+    parser.add_argument("--stub-port", type=int, default=free_port())
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    stub = start_stub(args)
+    stub_url = f"http://127.0.0.1:{args.stub_port}/v1"
+    try:
+        report = {"config": vars(args), "server": run_server(args, stub_url), "lambda": run_lambda(args, stub_url)}
+    finally:
+        stub.terminate()
+        stub.wait()
+    report["server_vs_lambda_rps_per_vcpu"] = round(report["server"]["rps_per_vcpu"] / report["lambda"]["rps_per_vcpu"], 2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
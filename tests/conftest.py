@@ -0,0 +1,20 @@
+import os
+import sys
+
+# Settings are read at import; pin the ones the tests depend on before any app module loads
+os.environ.update(
+    RATE_LIMIT_WINDOW="60",
+    RATE_LIMIT_REQUESTS="5",
+    RATE_LIMIT_TOKENS="20000",
+    RATE_LIMIT_COMPLETION_ESTIMATE="300",
+    RATE_LIMIT_BACKEND="memory",
+    GOVERNOR_INITIAL_LIMIT="4",
+    GOVERNOR_MIN_LIMIT="2",
+    GOVERNOR_MAX_LIMIT="8",
+    GOVERNOR_BREAKER_FAILURES="3",
+    GOVERNOR_BREAKER_COOLDOWN="15",
+    LOG_LEVEL="WARNING",
+)
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,107 @@
+import json
+import os
+import time
+
+import pytest
+from jose import jwt
+
+from app.dependencies import auth as auth_module
+from app.dependencies.auth import JWKS, TokenCache, verified_claims
+
+
+class Clock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock(time.time())
+    monkeypatch.setattr(auth_module, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def verifications(monkeypatch):
+    calls = []
+    verify = auth_module.verify_token
+
+    def counting(token):
+        calls.append(token)
+        return verify(token)
+
+    monkeypatch.setattr(auth_module, "verify_token", counting)
+    monkeypatch.setattr(auth_module, "token_cache", TokenCache(max_entries=10, max_age=300))
+    return calls
+
+
+def token(**claims) -> str:
+    return jwt.encode({"userId": "u1", **claims}, auth_module.SECRET_KEY, algorithm="HS256")
+
+
+def test_claims_are_cached_until_the_token_expires(clock, verifications):
+    t = token(exp=int(clock.now) + 60)
+    assert verified_claims(t)["userId"] == "u1"
+    assert verified_claims(t)["userId"] == "u1"
+    assert len(verifications) == 1
+    clock.now += 61
+    # The cached entry is gone with the token's exp; the token is verified again
+    verified_claims(t)
+    assert len(verifications) == 2
+
+
+def test_cache_entries_are_bounded_by_max_age(clock, verifications):
+    t = token(exp=int(clock.now) + 3600)
+    verified_claims(t)
+    clock.now += 299
+    verified_claims(t)
+    assert len(verifications) == 1
+    clock.now += 2
+    verified_claims(t)
+    assert len(verifications) == 2
+
+
+def test_invalid_tokens_are_not_cached(clock, verifications):
+    bad = jwt.encode({"userId": "u1"}, "wrong", algorithm="HS256")
+    for _ in range(2):
+        with pytest.raises(jwt.JWTError):
+            verified_claims(bad)
+    assert len(verifications) == 2
+
+
+def write_jwks(path, *kids: str, mtime: float) -> None:
+    with open(path, "w") as f:
+        json.dump({"keys": [{"kty": "oct", "kid": kid, "k": kid} for kid in kids]}, f)
+    os.utime(path, (mtime, mtime))
+
+
+def test_jwks_reloads_on_an_unknown_kid(tmp_path, clock):
+    path = tmp_path / "jwks.json"
+    write_jwks(path, "a", mtime=1000)
+    jwks = JWKS(str(path), reload_seconds=30)
+    assert jwks.key_for("a")["kid"] == "a"
+    # Rotated within the reload interval: the unknown kid forces a reload
+    write_jwks(path, "b", mtime=2000)
+    assert jwks.key_for("b")["kid"] == "b"
+    with pytest.raises(jwt.JWTError):
+        jwks.key_for("a")
+
+
+def test_jwks_is_rechecked_after_the_reload_interval(tmp_path, clock):
+    path = tmp_path / "jwks.json"
+    write_jwks(path, "a", "b", mtime=1000)
+    jwks = JWKS(str(path), reload_seconds=30)
+    assert jwks.key_for("a")
+    write_jwks(path, "a", mtime=2000)
+    clock.now += 10
+    assert jwks.key_for("b")["kid"] == "b"
+    clock.now += 30
+    # The retired key is dropped once the file is checked again
+    with pytest.raises(jwt.JWTError):
+        jwks.key_for("b")
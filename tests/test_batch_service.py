@@ -0,0 +1,70 @@
+import asyncio
+import json
+
+from app.services import batch_service
+from app.services.sections import ResumeInput
+from app.utils.openai_helpers import CompletionError
+
+RESUME = ResumeInput.model_validate({"sections": [
+    {"type": "summary", "id": "s", "input": {"targetPosition": "Engineer", "targetCompany": "Acme", "rawSummary": "Builds APIs"}},
+    {"type": "experience", "id": "e", "input": {"company": "Acme", "position": "Engineer", "rawDescription": ["Billing"]}},
+    {"type": "project", "id": "p", "input": {"projectName": "Ledger", "rawDescription": ["Double entry"]}},
+]})
+
+
+def failing_experience(monkeypatch):
+    async def complete(messages, tools, tool_name, use_cache=True, similar=None):
+        await asyncio.sleep(0.001)
+        if "experience" in tool_name:
+            raise CompletionError("No description found in response")
+        return {"description": tool_name}
+
+    async def stream(messages, tools, tool_name, use_cache=True, similar=None):
+        for word in ("part", "one"):
+            await asyncio.sleep(0.001)
+            yield word
+        if "experience" in tool_name:
+            raise RuntimeError("connection reset")
+
+    monkeypatch.setattr(batch_service, "complete_description", complete)
+    monkeypatch.setattr(batch_service, "stream_description", stream)
+
+
+def test_failed_section_does_not_abort_the_resume(monkeypatch):
+    failing_experience(monkeypatch)
+    results = asyncio.run(batch_service.generate_resume(RESUME.sections))
+    assert [(r["index"], r["id"], r["status"]) for r in results] == [(0, "s", "ok"), (1, "e", "error"), (2, "p", "ok")]
+    assert results[1]["error"] == "No description found in response"
+    assert results[2]["description"] == "generate_project_description"
+
+
+def test_streamed_resume_reports_the_failed_section_and_finishes(monkeypatch):
+    failing_experience(monkeypatch)
+
+    async def scenario():
+        return [frame async for frame in batch_service.stream_resume(RESUME.sections)]
+
+    frames = asyncio.run(scenario())
+    assert frames[-1] == "data: [DONE]\n\n"
+    events = [json.loads(frame[len("data: "):]) for frame in frames[:-1]]
+    endings = {event["id"]: event for event in events if "data" not in event}
+    assert endings["s"]["done"] and endings["p"]["done"]
+    assert endings["e"]["error"] == "AI service error: connection reset"
+    assert sum(1 for event in events if event.get("data")) == 6
+
+
+def test_sections_run_concurrently_up_to_the_limit(monkeypatch):
+    running = []
+    peak = []
+
+    async def complete(messages, tools, tool_name, use_cache=True, similar=None):
+        running.append(1)
+        peak.append(len(running))
+        await asyncio.sleep(0.01)
+        running.pop()
+        return {"description": ""}
+
+    monkeypatch.setattr(batch_service, "complete_description", complete)
+    monkeypatch.setattr(batch_service, "BATCH_CONCURRENCY", 2)
+    asyncio.run(batch_service.generate_resume(RESUME.sections))
+    assert max(peak) == 2
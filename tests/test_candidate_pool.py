@@ -0,0 +1,70 @@
+import pytest
+
+from app.utils import candidate_pool as pool_module
+from app.utils import request_context
+from app.utils.candidate_pool import CandidatePool
+
+
+class Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(pool_module, "time", clock)
+    return clock
+
+
+def test_candidates_are_taken_oldest_first_then_the_key_is_gone(clock):
+    pool = CandidatePool(max_keys=10, ttl=60)
+    pool.put("k", [{"description": "a"}, {"description": "b"}])
+    assert len(pool) == 2
+    assert pool.take("k") == {"description": "a"}
+    assert pool.take("k") == {"description": "b"}
+    assert pool.take("k") is None
+    assert pool.stats()["keys"] == 0
+
+
+def test_candidates_expire_after_the_ttl(clock):
+    pool = CandidatePool(max_keys=10, ttl=60)
+    pool.put("k", [{"description": "a"}, {"description": "b"}])
+    clock.now += 59
+    assert pool.take("k") == {"description": "a"}
+    clock.now += 2
+    assert pool.take("k") is None
+    assert len(pool) == 0
+
+
+def test_candidates_are_scoped_to_the_user(clock):
+    pool = CandidatePool(max_keys=10, ttl=60)
+    token = request_context.user_id.set("alice")
+    try:
+        pool.put("k", [{"description": "a"}])
+    finally:
+        request_context.user_id.reset(token)
+    token = request_context.user_id.set("bob")
+    try:
+        assert pool.take("k") is None
+    finally:
+        request_context.user_id.reset(token)
+
+
+def test_least_recently_stored_key_is_evicted(clock):
+    pool = CandidatePool(max_keys=2, ttl=60)
+    pool.put("a", [{"description": "a"}])
+    pool.put("b", [{"description": "b"}])
+    pool.put("c", [{"description": "c"}])
+    assert pool.take("a") is None
+    assert pool.take("b") == {"description": "b"}
+    assert pool.take("c") == {"description": "c"}
+
+
+def test_empty_put_stores_nothing(clock):
+    pool = CandidatePool(max_keys=10, ttl=60)
+    pool.put("k", [])
+    assert pool.take("k") is None
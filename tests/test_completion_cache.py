@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+from starlette.requests import Request
+
+from app.utils import completion_cache as cache_module
+from app.utils import openai_helpers
+from app.utils.completion_cache import CompletionCache, MemoryCache, SQLiteCache, cache_bypassed, cache_key
+
+
+class Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module, "time", clock)
+    return clock
+
+
+TOOLS = ({"type": "function", "function": {"name": "t", "parameters": {"type": "object", "properties": {}}}},)
+
+
+def test_key_ignores_dict_order_but_not_content():
+    messages = [{"role": "user", "content": "hi"}]
+    reordered = [{"content": "hi", "role": "user"}]
+    assert cache_key("m", messages, TOOLS, "t") == cache_key("m", reordered, list(TOOLS), "t")
+    assert cache_key("m", messages, TOOLS, "t") != cache_key("other", messages, TOOLS, "t")
+    assert cache_key("m", messages, TOOLS, "t") != cache_key("m", [{"role": "user", "content": "hi!"}], TOOLS, "t")
+    assert cache_key("m", messages, TOOLS, "t") != cache_key("m", messages, TOOLS, "u")
+
+
+def test_memory_cache_expires_and_evicts_least_recently_used(clock):
+    cache = MemoryCache(max_entries=2, ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    # "b" was the least recently used
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+
+    clock.now += 11
+    assert cache.get("a") is None
+    assert cache.evictions == 2
+
+
+def test_sqlite_cache_persists_expires_and_evicts(clock, tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = SQLiteCache(path, max_entries=2, ttl=10)
+    cache.set("a", {"description": "x"})
+    clock.now += 1
+    cache.set("b", {"description": "y"})
+    clock.now += 1
+    assert cache.get("a") == {"description": "x"}
+    clock.now += 1
+    cache.set("c", {"description": "z"})
+    assert cache.get("b") is None
+    cache.close()
+
+    reopened = SQLiteCache(path, max_entries=2, ttl=10)
+    assert reopened.get("a") == {"description": "x"}
+    clock.now += 20
+    assert reopened.get("c") is None
+    assert len(reopened) == 1
+    reopened.close()
+
+
+def test_disk_hits_are_promoted_to_memory(clock, tmp_path):
+    disk = SQLiteCache(str(tmp_path / "cache.sqlite3"), 8, 60)
+    disk.set("k", {"description": "kept"})
+    cache = CompletionCache(MemoryCache(8, 60), disk)
+    assert cache.get("k") == {"description": "kept"}
+    assert cache.memory.get("k") == {"description": "kept"}
+    assert cache.get("missing") is None
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+    disk.close()
+
+
+def request(cache_control: str) -> Request:
+    return Request({"type": "http", "headers": [(b"cache-control", cache_control.encode())]})
+
+
+def test_no_cache_and_no_store_bypass_the_cache():
+    assert cache_bypassed(request("no-cache"))
+    assert cache_bypassed(request("max-age=0, No-Store"))
+    assert not cache_bypassed(request("max-age=60"))
+
+
+def test_bypassed_request_calls_upstream_and_refreshes_the_entry(monkeypatch):
+    cache = CompletionCache(MemoryCache(8, 60))
+    monkeypatch.setattr(openai_helpers, "completion_cache", cache)
+    calls = []
+
+    async def fetch(messages, tools, tool_name, key, n):
+        calls.append(key)
+        result = {"description": f"call {len(calls)}"}
+        cache.set(key, result)
+        return [result]
+
+    monkeypatch.setattr(openai_helpers, "_fetch_candidates", fetch)
+    messages = [{"role": "user", "content": "cache me"}]
+
+    async def scenario():
+        first = await openai_helpers.complete_description(messages, list(TOOLS), "t")
+        cached = await openai_helpers.complete_description(messages, list(TOOLS), "t")
+        fresh = await openai_helpers.complete_description(messages, list(TOOLS), "t", use_cache=False)
+        after = await openai_helpers.complete_description(messages, list(TOOLS), "t")
+        return first, cached, fresh, after
+
+    first, cached, fresh, after = asyncio.run(scenario())
+    assert first == cached == {"description": "call 1"}
+    assert fresh == after == {"description": "call 2"}
+    assert len(calls) == 2
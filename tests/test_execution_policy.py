@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+
+from app.utils import execution_policy, request_context
+from app.utils.execution_policy import HEDGE_MIN_SAMPLES, DeadlineExceeded, ExecutionPolicy, execute, observe_latency
+from app.utils.upstream_governor import UpstreamGovernor
+
+
+class StatusError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(status_code)
+        self.status_code = status_code
+
+
+@pytest.fixture(autouse=True)
+def isolated(monkeypatch):
+    monkeypatch.setattr(execution_policy, "_latencies", {})
+    monkeypatch.setattr(execution_policy, "governor", UpstreamGovernor())
+
+
+def use_policy(monkeypatch, **fields):
+    monkeypatch.setattr(execution_policy, "POLICIES", {"test": ExecutionPolicy(**fields)})
+
+
+def run(coro):
+    async def scenario():
+        request_context.section.set("test")
+        request_context.deadline.set(0.0)
+        return await coro
+
+    return asyncio.run(scenario())
+
+
+def test_overload_errors_are_retried(monkeypatch):
+    use_policy(monkeypatch, timeout=5, max_retries=2, backoff_base=0.001, backoff_cap=0.001)
+    calls = []
+
+    async def attempt():
+        calls.append(1)
+        if len(calls) < 3:
+            raise StatusError(429)
+        return "ok"
+
+    assert run(execute(attempt)) == "ok"
+    assert len(calls) == 3
+
+
+def test_retries_stop_at_max_retries_and_skip_caller_errors(monkeypatch):
+    use_policy(monkeypatch, timeout=5, max_retries=1, backoff_base=0.001, backoff_cap=0.001)
+    calls = []
+
+    async def overloaded():
+        calls.append(1)
+        raise StatusError(503)
+
+    with pytest.raises(StatusError):
+        run(execute(overloaded))
+    assert len(calls) == 2
+
+    calls.clear()
+
+    async def bad_request():
+        calls.append(1)
+        raise StatusError(400)
+
+    with pytest.raises(StatusError):
+        run(execute(bad_request))
+    assert len(calls) == 1
+
+
+def test_deadline_bounds_the_call(monkeypatch):
+    use_policy(monkeypatch, timeout=0.05)
+
+    async def attempt():
+        await asyncio.sleep(1)
+
+    with pytest.raises(DeadlineExceeded):
+        run(execute(attempt))
+
+
+def test_hedge_fires_past_the_latency_quantile_and_the_loser_is_cleaned_up(monkeypatch):
+    use_policy(monkeypatch, timeout=5, hedge=True, hedge_quantile=0.95)
+    for _ in range(HEDGE_MIN_SAMPLES):
+        observe_latency(("test", False), 0.01)
+    calls = []
+    cleaned = []
+
+    async def attempt():
+        calls.append(1)
+        if len(calls) == 1:
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                # Completed before the cancellation could take effect
+                return "primary"
+        return "hedge"
+
+    async def scenario():
+        result = await execute(attempt, cleanup=cleaned.append)
+        await asyncio.sleep(0.01)
+        return result
+
+    assert run(scenario()) == "hedge"
+    assert len(calls) == 2
+    assert cleaned == ["primary"]
+
+
+def test_no_hedge_without_enough_samples(monkeypatch):
+    use_policy(monkeypatch, timeout=5, hedge=True)
+    calls = []
+
+    async def attempt():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    assert run(execute(attempt)) == "ok"
+    assert len(calls) == 1
@@ -0,0 +1,87 @@
+import asyncio
+import uuid
+
+from app.schemas.validation import SummaryInput
+from app.services.sections import SECTIONS
+from app.utils import openai_helpers, request_context
+from app.utils.fuzzy_reuse import similar_key
+
+SPEC = SECTIONS["summary"]
+SUMMARY = (
+    "Backend engineer with nine years of experience building payment platforms in Python and Go. "
+    "Led a team of eight engineers that rebuilt the settlement pipeline, cut reconciliation time from "
+    "two days to four hours, and moved card processing to an event driven architecture serving three regions. "
+    "Mentors junior developers and runs the architecture review for the payments group."
+)
+
+
+def request(raw_summary: str):
+    input = SummaryInput(targetPosition="Staff Engineer", targetCompany="Acme", rawSummary=raw_summary)
+    messages = [{"role": "user", "content": raw_summary}]
+    return messages, similar_key(SPEC.name, input, None, True, True)
+
+
+def new_user() -> None:
+    request_context.user_id.set(uuid.uuid4().hex)
+    request_context.section.set(SPEC.name)
+
+
+def test_near_duplicate_result_is_marked_as_reused(monkeypatch):
+    calls = []
+
+    async def fetch(messages, tools, tool_name, key, n):
+        calls.append(messages)
+        return [{"description": "Generated summary"}]
+
+    monkeypatch.setattr(openai_helpers, "_fetch_candidates", fetch)
+
+    async def scenario():
+        new_user()
+        messages, similar = request(SUMMARY)
+        first = await openai_helpers.complete_description(messages, SPEC.tools, SPEC.tool_name, True, similar)
+        messages, similar = request(SUMMARY.replace("nine years", "ten years"))
+        second = await openai_helpers.complete_description(messages, SPEC.tools, SPEC.tool_name, True, similar)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first == {"description": "Generated summary"}
+    assert second == {"description": "Generated summary", "reused": "fuzzy"}
+    assert len(calls) == 1
+
+
+def test_reused_stream_starts_with_a_named_event(monkeypatch):
+    async def stream_upstream(messages, tools, tool_name, key, n):
+        for word in ("Generated", "summary"):
+            yield 0, word
+
+    monkeypatch.setattr(openai_helpers, "_stream_upstream", stream_upstream)
+
+    async def frames(raw_summary: str):
+        messages, similar = request(raw_summary)
+        pieces = openai_helpers.stream_description(messages, SPEC.tools, SPEC.tool_name, True, similar)
+        return [frame async for frame in openai_helpers.sse_events(pieces)]
+
+    async def scenario():
+        new_user()
+        return await frames(SUMMARY), await frames(SUMMARY.replace("four hours", "five hours"))
+
+    live, reused = asyncio.run(scenario())
+    body = ['data: "Generated"\n\n', 'data: "summary"\n\n', "data: [DONE]\n\n"]
+    assert live == body
+    assert reused == ['event: reused\ndata: "fuzzy"\n\n'] + body
+
+
+def test_unrelated_input_is_not_reused(monkeypatch):
+    async def fetch(messages, tools, tool_name, key, n):
+        return [{"description": messages[0]["content"][:20]}]
+
+    monkeypatch.setattr(openai_helpers, "_fetch_candidates", fetch)
+
+    async def scenario():
+        new_user()
+        messages, similar = request(SUMMARY)
+        await openai_helpers.complete_description(messages, SPEC.tools, SPEC.tool_name, True, similar)
+        messages, similar = request("Product designer focused on onboarding flows for consumer banking apps.")
+        return await openai_helpers.complete_description(messages, SPEC.tools, SPEC.tool_name, True, similar)
+
+    assert "reused" not in asyncio.run(scenario())
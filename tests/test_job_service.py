@@ -0,0 +1,91 @@
+import asyncio
+import json
+import uuid
+
+import pytest
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+from app.services import job_service
+from app.services.job_store import JobStore
+from app.services.sections import MAX_JOB_RESUMES, JobInput
+
+RESUME = {"sections": [
+    {"type": "summary", "input": {"targetPosition": "Engineer", "targetCompany": "Acme", "rawSummary": "Builds APIs"}},
+    {"type": "experience", "input": {"company": "Acme", "position": "Engineer", "rawDescription": ["Built the billing API"]}},
+]}
+
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(job_service, "_store", store)
+    monkeypatch.setattr(job_service, "_workers", [])
+    monkeypatch.setattr(job_service, "_progress", None)
+    monkeypatch.setattr(job_service, "JOBS_POLL_INTERVAL", 0.05)
+    monkeypatch.setattr(job_service, "JOBS_BATCH_DIR", str(tmp_path / "batches"))
+    yield store
+    store.close()
+
+
+def job(resumes: int, mode: str = "live") -> JobInput:
+    return JobInput(resumes=[RESUME] * resumes, mode=mode)
+
+
+def test_job_input_accepts_up_to_the_resume_limit():
+    assert len(job(MAX_JOB_RESUMES).resumes) == MAX_JOB_RESUMES
+    with pytest.raises(ValidationError):
+        job(MAX_JOB_RESUMES + 1)
+
+
+def test_large_jobs_are_not_charged_against_the_interactive_token_bucket(store):
+    async def scenario():
+        user = uuid.uuid4().hex
+        # Far more than the interactive bucket's tokens per window
+        view = await job_service.submit_job(user, job(200, mode="batch"))
+        return user, view
+
+    user, view = asyncio.run(scenario())
+    assert view["total"] == 400 and view["status"] == "prepared"
+    assert store.unfinished_items(user) == 400
+
+
+def test_job_budget_caps_unfinished_items_per_user(monkeypatch):
+    monkeypatch.setattr(job_service, "JOBS_MAX_PENDING_ITEMS", 5)
+
+    async def scenario():
+        user = uuid.uuid4().hex
+        await job_service.submit_job(user, job(2, mode="batch"))
+        with pytest.raises(HTTPException) as over_budget:
+            await job_service.submit_job(user, job(1, mode="batch"))
+        with pytest.raises(HTTPException) as too_large:
+            await job_service.submit_job(uuid.uuid4().hex, job(3, mode="batch"))
+        # Another user's budget is untouched
+        await job_service.submit_job(uuid.uuid4().hex, job(2, mode="batch"))
+        return over_budget.value, too_large.value
+
+    over_budget, too_large = asyncio.run(scenario())
+    assert over_budget.status_code == 429 and "Retry-After" in over_budget.headers
+    assert too_large.status_code == 413
+
+
+def test_live_job_runs_to_completion_and_streams_results(monkeypatch):
+    async def complete(messages, tools, tool_name, use_cache=True, similar=None):
+        return {"description": f"done by {tool_name}"}
+
+    monkeypatch.setattr(job_service, "complete_description", complete)
+
+    async def scenario():
+        user = uuid.uuid4().hex
+        view = await job_service.submit_job(user, job(2))
+        events = [event async for event in job_service.stream_job(user, view["id"])]
+        status = await job_service.job_status(user, view["id"])
+        await job_service.stop_workers()
+        return events, status
+
+    events, status = asyncio.run(scenario())
+    assert events[-1] == "data: [DONE]\n\n"
+    items = [json.loads(event[len("data: "):]) for event in events[:-2]]
+    assert sorted(item["index"] for item in items) == [0, 1, 2, 3]
+    assert all(item["status"] == "ok" for item in items)
+    assert status["status"] == "completed" and status["completed"] == 4
@@ -0,0 +1,69 @@
+import pytest
+
+from app.services.job_store import JobStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    yield store
+    store.close()
+
+
+def items(count: int):
+    return [(0, f"s{i}", "experience", {"n": i}) for i in range(count)]
+
+
+def test_claims_pending_live_items_in_order(store):
+    first = store.create_job("u1", "live", None, items(2))
+    store.create_job("u1", "batch", None, items(1))
+    second = store.create_job("u2", "live", "analyze", items(1))
+
+    claimed = [store.claim_next() for _ in range(3)]
+    assert [(c["job_id"], c["idx"]) for c in claimed] == [(first, 0), (first, 1), (second, 0)]
+    assert claimed[2]["user_id"] == "u2" and claimed[2]["jd_mode"] == "analyze"
+    assert claimed[1]["input"] == {"n": 1}
+    # Batch items are never handed to workers
+    assert store.claim_next() is None
+    assert store.get_job(first)["status"] == "running"
+
+
+def test_finish_item_is_idempotent_and_completes_the_job(store):
+    job_id = store.create_job("u1", "live", None, items(2))
+    store.claim_next()
+    assert store.finish_item(job_id, 0, result={"text": "a"})
+    assert not store.finish_item(job_id, 0, result={"text": "again"})
+    assert not store.finish_item(job_id, 7, result={})
+    assert store.get_job(job_id)["completed"] == 1
+
+    assert store.finish_item(job_id, 1, error="upstream failed")
+    job = store.get_job(job_id)
+    assert (job["status"], job["completed"], job["failed"]) == ("completed", 2, 1)
+
+    finished = store.finished_items(job_id)
+    assert [(f["seq"], f["status"]) for f in finished] == [(1, "ok"), (2, "error")]
+    assert finished[0]["description"] == {"text": "a"}
+    assert finished[1]["error"] == "upstream failed"
+    assert [f["seq"] for f in store.finished_items(job_id, after_seq=1)] == [2]
+
+
+def test_released_and_stale_items_are_claimed_again(store):
+    job_id = store.create_job("u1", "live", None, items(2))
+    first = store.claim_next()
+    store.release(job_id, first["idx"])
+    assert store.claim_next()["idx"] == 0
+
+    store.claim_next()
+    assert store.claim_next() is None
+    assert store.requeue_stale(older_than=60) == 0
+    assert store.requeue_stale(older_than=-1) == 2
+    assert store.counts() == {"pending": 2}
+
+
+def test_unfinished_items_counts_open_jobs_of_the_user(store):
+    live = store.create_job("u1", "live", None, items(3))
+    store.create_job("u1", "batch", None, items(2))
+    store.create_job("u2", "live", None, items(4))
+    store.finish_item(live, 0, result={})
+    assert store.unfinished_items("u1") == 4
+    assert store.unfinished_items("nobody") == 0
@@ -0,0 +1,189 @@
+import asyncio
+import threading
+
+import pytest
+from starlette.requests import Request
+
+from app.utils import limiter as limiter_module
+from app.utils.limiter import (
+    BucketState,
+    MemoryRateLimitStore,
+    RATE_LIMIT_REQUESTS,
+    RATE_LIMIT_TOKENS,
+    RATE_LIMIT_WINDOW,
+    SQLiteRateLimitStore,
+    TokenBucketLimiter,
+    estimate_request_tokens,
+    rate_limit_headers,
+)
+
+
+class Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(limiter_module, "time", clock)
+    return clock
+
+
+@pytest.mark.parametrize("store_factory", [
+    lambda tmp_path: MemoryRateLimitStore(),
+    lambda tmp_path: SQLiteRateLimitStore(str(tmp_path / "buckets.sqlite3")),
+])
+def test_store_consumes_and_refills(clock, tmp_path, store_factory):
+    store = store_factory(tmp_path)
+    for _ in range(int(RATE_LIMIT_REQUESTS)):
+        assert store.consume("u", 1, 100).allowed
+    state = store.consume("u", 1, 100)
+    assert not state.allowed
+    assert state.requests == pytest.approx(0)
+    # A denied request takes nothing
+    assert state.tokens == pytest.approx(RATE_LIMIT_TOKENS - RATE_LIMIT_REQUESTS * 100)
+
+    clock.now += RATE_LIMIT_WINDOW / RATE_LIMIT_REQUESTS
+    assert store.consume("u", 1, 100).allowed
+    # Refill stops at capacity
+    clock.now += RATE_LIMIT_WINDOW * 10
+    state = store.consume("other", 0, 0)
+    assert (state.requests, state.tokens) == (RATE_LIMIT_REQUESTS, RATE_LIMIT_TOKENS)
+
+
+def test_store_applies_debits_even_when_denying(clock):
+    store = MemoryRateLimitStore()
+    state = store.consume("u", 1, RATE_LIMIT_TOKENS, debit_tokens=1)
+    assert not state.allowed
+    assert state.tokens == pytest.approx(RATE_LIMIT_TOKENS - 1)
+    # Negative debits refund, capped only by the next refill
+    state = store.consume("u", 0, 0, debit_tokens=-1)
+    assert state.tokens == pytest.approx(RATE_LIMIT_TOKENS)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_limiter_answers_locally_while_there_is_headroom(clock):
+    limiter = TokenBucketLimiter(MemoryRateLimitStore())
+    assert run(limiter.acquire("u", 100)).allowed
+    assert limiter.store_decisions == 1
+    assert run(limiter.acquire("u", 100)).allowed
+    assert limiter.local_decisions == 1
+    # Past the local TTL the pending debit is settled with the store
+    clock.now += 5
+    state = run(limiter.acquire("u", 100))
+    assert limiter.store_decisions == 2
+    assert state.requests == pytest.approx(RATE_LIMIT_REQUESTS - 3 + 5 * RATE_LIMIT_REQUESTS / RATE_LIMIT_WINDOW)
+
+
+def test_denied_key_is_rejected_locally_until_retry_after(clock):
+    limiter = TokenBucketLimiter(MemoryRateLimitStore())
+    state = run(limiter.acquire("u", RATE_LIMIT_TOKENS + 1))
+    assert not state.allowed
+    store_decisions = limiter.store_decisions
+    assert not run(limiter.acquire("u", 1)).allowed
+    assert limiter.store_decisions == store_decisions
+    assert limiter.rejections == 2
+
+
+def test_adjust_refunds_the_unused_estimate(clock):
+    store = MemoryRateLimitStore()
+    limiter = TokenBucketLimiter(store)
+    run(limiter.acquire("u", 5000))
+    run(limiter.adjust("u", -4000))
+    # The refund is folded into the next store call after the local TTL
+    clock.now += 1.5
+    run(limiter.adjust("u", 0))
+    assert store.consume("u", 0, 0).tokens == pytest.approx(RATE_LIMIT_TOKENS - 1000 + 1.5 * RATE_LIMIT_TOKENS / RATE_LIMIT_WINDOW)
+
+
+def test_blocking_store_is_called_off_the_event_loop(clock, tmp_path):
+    threads = []
+
+    class RecordingStore(SQLiteRateLimitStore):
+        def consume(self, *args, **kwargs):
+            threads.append(threading.current_thread())
+            return super().consume(*args, **kwargs)
+
+    limiter = TokenBucketLimiter(RecordingStore(str(tmp_path / "buckets.sqlite3")))
+    run(limiter.acquire("u", 100))
+    clock.now += 5
+    run(limiter.adjust("u", -50))
+    assert len(threads) == 2
+    assert all(thread is not threading.main_thread() for thread in threads)
+
+
+def test_local_decisions_during_a_store_call_are_not_lost(clock):
+    class SlowStore(MemoryRateLimitStore):
+        blocking = True
+
+        def consume(self, *args, **kwargs):
+            started.set()
+            release.wait(1)
+            return super().consume(*args, **kwargs)
+
+    started, release = threading.Event(), threading.Event()
+    store = SlowStore()
+    limiter = TokenBucketLimiter(store)
+
+    async def scenario():
+        await limiter.acquire("u", 100)
+        clock.now += 5
+        release.clear()
+        started.clear()
+        settling = asyncio.ensure_future(limiter.acquire("u", 100))
+        while not started.is_set():
+            await asyncio.sleep(0.001)
+        # Answered locally from the view the store call is replacing
+        limiter._local["u"].state.fetched_at = clock.now
+        await limiter.acquire("u", 100)
+        release.set()
+        await settling
+        assert limiter._local["u"].pending_tokens == 100
+
+    release.set()
+    run(scenario())
+
+
+def test_retry_after_covers_the_emptier_bucket():
+    state = BucketState(False, 0.0, RATE_LIMIT_TOKENS, 0.0)
+    assert TokenBucketLimiter.retry_after(state, 0) == pytest.approx(RATE_LIMIT_WINDOW / RATE_LIMIT_REQUESTS)
+    state = BucketState(False, RATE_LIMIT_REQUESTS, 0.0, 0.0)
+    assert TokenBucketLimiter.retry_after(state, RATE_LIMIT_TOKENS / 2) == pytest.approx(RATE_LIMIT_WINDOW / 2)
+    assert TokenBucketLimiter.retry_after(BucketState(False, 5, 20000, 0), 0) == 1.0
+
+
+def test_headers_report_the_bucket_closer_to_empty():
+    headers = rate_limit_headers(BucketState(True, RATE_LIMIT_REQUESTS - 1, RATE_LIMIT_TOKENS / 10, 0.0))
+    assert headers["RateLimit-Limit"] == str(int(RATE_LIMIT_TOKENS))
+    assert headers["RateLimit-Remaining"] == str(int(RATE_LIMIT_TOKENS / 10))
+    assert headers["RateLimit-Reset"] == str(int(RATE_LIMIT_WINDOW * 0.9))
+
+    headers = rate_limit_headers(BucketState(True, 1.5, RATE_LIMIT_TOKENS, 0.0))
+    assert headers["RateLimit-Limit"] == str(int(RATE_LIMIT_REQUESTS))
+    assert headers["RateLimit-Remaining"] == "1"
+    assert headers["RateLimit-Policy"].startswith(f"{int(RATE_LIMIT_REQUESTS)};w={int(RATE_LIMIT_WINDOW)}")
+
+
+def request(content_length: int, query: str = "") -> Request:
+    return Request({
+        "type": "http",
+        "headers": [(b"content-length", str(content_length).encode())],
+        "query_string": query.encode(),
+    })
+
+
+def test_estimate_scales_with_body_size_and_candidates():
+    completion = limiter_module.RATE_LIMIT_COMPLETION_ESTIMATE
+    assert estimate_request_tokens(request(400)) == 100 + completion
+    assert estimate_request_tokens(request(400, "candidates=3")) == 100 + 3 * completion
+    assert estimate_request_tokens(request(400, "candidates=junk")) == 100 + completion
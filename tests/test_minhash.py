@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from app.utils.minhash import MinHashLSH
+
+
+def shingles(*values):
+    return np.array(sorted(set(values)), dtype=np.uint32)
+
+
+BASE = shingles(*range(100, 200))
+NEAR = shingles(*range(100, 195), 999)
+OTHER = shingles(*range(5000, 5100))
+
+
+def test_finds_identical_and_near_duplicate_sets():
+    index = MinHashLSH(16)
+    index.add("scope", BASE, "base", now=0.0)
+    value, jaccard, rejected = index.query("scope", BASE, 0.8)
+    assert (value, jaccard, rejected) == ("base", 1.0, 0)
+    value, jaccard, _ = index.query("scope", NEAR, 0.8)
+    assert value == "base" and 0.9 < jaccard < 1.0
+
+
+def test_dissimilar_sets_and_other_scopes_do_not_match():
+    index = MinHashLSH(16)
+    index.add("scope", BASE, "base", now=0.0)
+    assert index.query("scope", OTHER, 0.5)[0] is None
+    assert index.query("other-scope", BASE, 0.5)[0] is None
+
+
+def test_entries_older_than_not_before_are_ignored():
+    index = MinHashLSH(16)
+    index.add("scope", BASE, "base", now=10.0)
+    assert index.query("scope", BASE, 0.8, not_before=5.0)[0] == "base"
+    assert index.query("scope", BASE, 0.8, not_before=11.0)[0] is None
+
+
+def test_ring_overwrites_the_oldest_entry():
+    index = MinHashLSH(2)
+    index.add("scope", BASE, "first", now=0.0)
+    index.add("scope", OTHER, "second", now=0.0)
+    index.add("scope", shingles(*range(9000, 9100)), "third", now=0.0)
+    assert index.size == 2
+    assert index.query("scope", BASE, 0.8)[0] is None
+    assert index.query("scope", OTHER, 0.8)[0] == "second"
+
+
+def test_every_part_must_reach_the_threshold():
+    # A long shared part can't carry a short part that differs completely
+    job = shingles(*range(0, 1000))
+    mine, theirs = shingles(5001, 5002, 5003), shingles(7001, 7002, 7003)
+    index = MinHashLSH(16)
+    index.add("scope", np.union1d(job, mine), "mine", now=0.0, parts={"job": job, "notes": mine})
+
+    other = np.union1d(job, theirs)
+    assert index.query("scope", other, 0.85)[0] == "mine"
+    value, _, rejected = index.query("scope", other, 0.85, parts={"job": job, "notes": theirs})
+    assert value is None and rejected == 1
+    assert index.query("scope", np.union1d(job, mine), 0.85, parts={"job": job, "notes": mine})[0] == "mine"
+    # A part missing on one side compares against the empty set
+    assert index.query("scope", job, 0.85, parts={"job": job})[0] is None
+
+
+def test_num_perm_must_split_into_bands():
+    with pytest.raises(ValueError):
+        MinHashLSH(4, num_perm=10, bands=4)
@@ -0,0 +1,121 @@
+import asyncio
+
+from app.services.sections import SECTIONS
+from app.utils import openai_helpers, request_context, resumable_stream
+from app.utils.resumable_stream import ResumableStream, StreamRegistry
+from app.utils.singleflight import singleflight
+
+
+def stream_with(count: int) -> ResumableStream:
+    stream = ResumableStream("s", "u", "summary")
+    for i in range(count):
+        stream.publish(f"data: {i}\n\n")
+    return stream
+
+
+def test_can_resume_while_every_later_event_is_buffered():
+    fresh = ResumableStream("s", "u", "summary")
+    assert fresh.can_resume(0)
+    assert not fresh.can_resume(1)
+
+    stream = stream_with(3)
+    assert all(stream.can_resume(after) for after in range(4))
+    # Ids the stream never handed out
+    assert not stream.can_resume(4)
+
+
+def test_cannot_resume_past_truncation(monkeypatch):
+    frame_size = len("id: s:1\ndata: 0\n\n")
+    monkeypatch.setattr(resumable_stream, "SSE_STREAM_MAX_BYTES", frame_size * 2)
+    stream = stream_with(5)
+    assert [seq for seq, _ in stream.items] == [4, 5]
+    assert not stream.can_resume(2)
+    assert stream.can_resume(3)
+    assert stream.can_resume(5)
+
+
+def test_subscribe_replays_after_the_last_seen_event():
+    async def scenario():
+        stream = stream_with(3)
+        stream.finish()
+        return [frame async for frame in stream.subscribe(after=1)]
+
+    assert asyncio.run(scenario()) == ["id: s:2\ndata: 1\n\n", "id: s:3\ndata: 2\n\n"]
+
+
+def test_generation_without_subscribers_is_cancelled_after_the_grace_period(monkeypatch):
+    monkeypatch.setattr(resumable_stream, "SSE_RESUME_GRACE_SECONDS", 0.01)
+
+    async def endless():
+        while True:
+            yield "data: x\n\n"
+            await asyncio.sleep(0.001)
+
+    async def scenario():
+        registry = StreamRegistry(10, 60)
+        stream = registry.start(endless())
+        await asyncio.sleep(0.05)
+        return registry, stream
+
+    registry, stream = asyncio.run(scenario())
+    assert stream.done
+    assert registry.get(stream.id) is None
+    assert registry.stats()["running"] == 0
+
+
+def test_attached_subscriber_keeps_the_generation_running(monkeypatch):
+    monkeypatch.setattr(resumable_stream, "SSE_RESUME_GRACE_SECONDS", 0.01)
+
+    async def events():
+        for i in range(5):
+            await asyncio.sleep(0.01)
+            yield f"data: {i}\n\n"
+
+    async def scenario():
+        registry = StreamRegistry(10, 60)
+        stream = registry.start(events())
+        frames = [frame async for frame in stream.subscribe()]
+        return registry, stream, frames
+
+    registry, stream, frames = asyncio.run(scenario())
+    assert len(frames) == 5
+    assert registry.get(stream.id) is stream
+
+
+def test_abandoned_generation_stops_reading_upstream(monkeypatch):
+    monkeypatch.setattr(resumable_stream, "SSE_RESUME_GRACE_SECONDS", 0.05)
+    read = []
+
+    async def scenario():
+        upstream_closed = asyncio.Event()
+
+        async def stream_upstream(messages, tools, tool_name, key, n):
+            try:
+                for i in range(40):
+                    await asyncio.sleep(0.005)
+                    read.append(i)
+                    yield 0, f"word{i}"
+            finally:
+                upstream_closed.set()
+
+        monkeypatch.setattr(openai_helpers, "_stream_upstream", stream_upstream)
+        request_context.user_id.set("abandoning-user")
+        spec = SECTIONS["summary"]
+        pieces = openai_helpers.stream_description(
+            [{"role": "user", "content": "abandoned stream"}], spec.tools, spec.tool_name, use_cache=False
+        )
+        registry = StreamRegistry(10, 60)
+        stream = registry.start(openai_helpers.sse_events(pieces))
+        # The client reads a few events, then goes away for good
+        subscription = stream.subscribe()
+        for _ in range(3):
+            await subscription.__anext__()
+        await subscription.aclose()
+
+        await asyncio.wait_for(upstream_closed.wait(), 1)
+        return registry, stream
+
+    registry, stream = asyncio.run(scenario())
+    assert len(read) < 40
+    assert registry.get(stream.id) is None
+    assert singleflight.stats()["in_flight"] == 0
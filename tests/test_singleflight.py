@@ -0,0 +1,147 @@
+import asyncio
+
+import pytest
+
+from app.utils.singleflight import SingleFlight, StreamCancelled
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"description": "shared"}
+
+    async def scenario():
+        return await asyncio.gather(*(flight.do("k", fetch) for _ in range(5)))
+
+    results = run(scenario())
+    assert results == [{"description": "shared"}] * 5
+    assert len(calls) == 1
+    assert flight.stats() == {"leaders": 1, "collapsed": 4, "in_flight": 0}
+
+
+def test_a_cancelled_waiter_does_not_cancel_the_shared_call():
+    flight = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def scenario():
+        leaver = asyncio.ensure_future(flight.do("k", fetch))
+        stayer = asyncio.ensure_future(flight.do("k", fetch))
+        await asyncio.sleep(0)
+        leaver.cancel()
+        return await stayer
+
+    assert run(scenario()) == "done"
+
+
+def test_errors_reach_every_waiter_and_the_key_is_released():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream")
+
+    async def retry():
+        return "retried"
+
+    async def scenario():
+        results = await asyncio.gather(flight.do("k", fail), flight.do("k", fail), return_exceptions=True)
+        return results, await flight.do("k", retry)
+
+    results, retried = run(scenario())
+    assert all(isinstance(r, ValueError) for r in results)
+    assert retried == "retried"
+
+
+async def pieces(count: int, delay: float = 0.001):
+    for i in range(count):
+        await asyncio.sleep(delay)
+        yield i
+
+
+async def collect(iterator):
+    return [item async for item in iterator]
+
+
+def test_stream_fans_out_to_late_joiners():
+    flight = SingleFlight()
+
+    async def scenario():
+        first = asyncio.ensure_future(collect(flight.stream("k", lambda: pieces(5))))
+        await asyncio.sleep(0.003)
+        # Joins mid-stream and still gets the whole sequence
+        late = await collect(flight.stream("k", lambda: pieces(99)))
+        return await first, late
+
+    first, late = run(scenario())
+    assert first == late == [0, 1, 2, 3, 4]
+    assert flight.stats()["collapsed"] == 1
+
+
+def test_stream_error_is_raised_to_every_subscriber():
+    flight = SingleFlight()
+
+    async def broken():
+        yield 0
+        raise RuntimeError("dropped")
+
+    async def scenario():
+        return await asyncio.gather(
+            collect(flight.stream("k", broken)), collect(flight.stream("k", broken)), return_exceptions=True
+        )
+
+    assert [str(r) for r in run(scenario())] == ["dropped", "dropped"]
+
+
+def test_cancelled_pump_releases_subscribers():
+    flight = SingleFlight()
+
+    async def scenario():
+        subscriber = asyncio.ensure_future(collect(flight.stream("k", lambda: pieces(100, 0.01))))
+        await asyncio.sleep(0.02)
+        for task in asyncio.all_tasks():
+            if task is not asyncio.current_task() and task is not subscriber:
+                task.cancel()
+        return await asyncio.wait_for(subscriber, 1)
+
+    with pytest.raises(StreamCancelled):
+        run(scenario())
+
+
+def test_stream_is_cancelled_once_every_subscriber_has_left():
+    flight = SingleFlight()
+    state = {"read": 0, "closed": False}
+
+    async def upstream():
+        try:
+            for i in range(100):
+                await asyncio.sleep(0.001)
+                state["read"] += 1
+                yield i
+        finally:
+            state["closed"] = True
+
+    async def scenario():
+        first, second = flight.stream("k", upstream), flight.stream("k", upstream)
+        await first.__anext__()
+        await second.__anext__()
+        await first.aclose()
+        await asyncio.sleep(0.01)
+        # One subscriber is still reading
+        assert not state["closed"]
+        await second.aclose()
+        await asyncio.sleep(0.01)
+        return flight.stats()["in_flight"]
+
+    assert run(scenario()) == 0
+    assert state["closed"] and state["read"] < 100
@@ -0,0 +1,56 @@
+import json
+
+from app.utils.tool_stream import DescriptionStreamParser
+
+
+def feed_chars(parser, text):
+    pieces = []
+    for ch in text:
+        pieces.extend(parser.feed(ch))
+    return pieces
+
+
+def test_string_description_yields_words_as_they_complete():
+    parser = DescriptionStreamParser()
+    arguments = json.dumps({"description": "Led a team of five engineers"})
+    assert parser.feed(arguments[:30]) == ["Led", "a", "team"]
+    assert parser.feed(arguments[30:]) == ["of", "five", "engineers"]
+    assert parser.complete
+    assert parser.result() == "Led a team of five engineers"
+
+
+def test_escapes_split_across_fragments():
+    parser = DescriptionStreamParser()
+    arguments = json.dumps({"description": 'Café "owner"\nand\tcook'})
+    pieces = feed_chars(parser, arguments)
+    assert pieces == ["Café", '"owner"', "and", "cook"]
+    assert parser.result() == 'Café "owner"\nand\tcook'
+
+
+def test_array_description_yields_whole_bullets():
+    parser = DescriptionStreamParser()
+    bullets = ["Cut costs by 20%", 'Shipped "v2" API', "Mentored\ninterns"]
+    pieces = feed_chars(parser, json.dumps({"description": bullets}))
+    assert pieces == bullets
+    assert parser.is_array
+    assert parser.result() == bullets
+
+
+def test_only_the_top_level_key_counts():
+    parser = DescriptionStreamParser()
+    arguments = json.dumps({"meta": {"description": "nested"}, "notes": ["description"], "description": "real one"})
+    assert feed_chars(parser, arguments) == ["real", "one"]
+
+
+def test_unsupported_missing_and_truncated_values():
+    number = DescriptionStreamParser()
+    number.feed('{"description": 42}')
+    assert number.unsupported and not number.found
+
+    missing = DescriptionStreamParser()
+    missing.feed('{"summary": "text"}')
+    assert not missing.found
+
+    truncated = DescriptionStreamParser()
+    truncated.feed('{"description": "half a sen')
+    assert truncated.found and not truncated.complete
@@ -0,0 +1,165 @@
+import asyncio
+import time
+
+import pytest
+
+from app.utils import upstream_governor
+from app.utils.upstream_governor import (
+    BREAKER_FAILURES,
+    CLOSED,
+    GOVERNOR_INITIAL_LIMIT,
+    GOVERNOR_MIN_LIMIT,
+    HALF_OPEN,
+    OPEN,
+    UpstreamGovernor,
+    UpstreamOverloaded,
+    is_overload_error,
+)
+
+
+class StatusError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(status_code)
+        self.status_code = status_code
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def far_deadline() -> float:
+    return time.perf_counter() + 60
+
+
+async def call(governor: UpstreamGovernor, error=None, latency: float = 0.01):
+    slot = await governor.acquire(far_deadline())
+    slot.started -= latency
+    slot.first_byte = time.perf_counter()
+    governor.release(slot, error)
+
+
+def test_overload_classification():
+    assert is_overload_error(StatusError(429))
+    assert is_overload_error(StatusError(503))
+    assert not is_overload_error(StatusError(400))
+    assert is_overload_error(TimeoutError())
+    assert not is_overload_error(ValueError())
+
+
+def test_successes_increase_the_limit_additively():
+    async def scenario():
+        governor = UpstreamGovernor()
+        slots = [await governor.acquire(far_deadline()) for _ in range(int(GOVERNOR_INITIAL_LIMIT))]
+        for slot in slots:
+            slot.first_byte = slot.started + 0.01
+            governor.release(slot)
+        return governor
+
+    governor = run(scenario())
+    assert GOVERNOR_INITIAL_LIMIT < governor.limit < GOVERNOR_INITIAL_LIMIT + 1
+    assert governor.latency == pytest.approx(0.01, rel=0.01)
+    assert governor.in_flight == 0
+
+
+def test_overload_halves_the_limit_once_per_congested_period():
+    async def scenario():
+        governor = UpstreamGovernor()
+        await call(governor, StatusError(429))
+        first = governor.limit
+        await call(governor, StatusError(429))
+        return first, governor.limit
+
+    first, second = run(scenario())
+    assert first == max(GOVERNOR_MIN_LIMIT, GOVERNOR_INITIAL_LIMIT * 0.5)
+    assert second == first
+
+
+def test_slow_sample_backs_off_gently():
+    async def scenario():
+        governor = UpstreamGovernor()
+        await call(governor, latency=0.01)
+        governor._last_decrease = 0.0
+        before = governor.limit
+        await call(governor, latency=0.5)
+        return before, governor.limit
+
+    before, after = run(scenario())
+    assert after == pytest.approx(before * 0.9)
+
+
+def test_cancelled_release_records_no_sample():
+    async def scenario():
+        governor = UpstreamGovernor()
+        await call(governor, asyncio.CancelledError(), latency=5.0)
+        return governor
+
+    governor = run(scenario())
+    assert governor.latency == 0.0
+    assert governor.limit == GOVERNOR_INITIAL_LIMIT
+    assert governor.in_flight == 0
+
+
+def test_breaker_opens_half_opens_and_closes():
+    async def scenario():
+        governor = UpstreamGovernor()
+        for _ in range(BREAKER_FAILURES):
+            await call(governor, StatusError(500))
+        assert governor.state == OPEN
+        with pytest.raises(UpstreamOverloaded):
+            governor.precheck()
+        with pytest.raises(UpstreamOverloaded):
+            await governor.acquire(far_deadline())
+
+        # Cooldown over: one probe at a time
+        governor._open_until = time.monotonic() - 1
+        probe = await governor.acquire(far_deadline())
+        assert governor.state == HALF_OPEN
+        with pytest.raises(UpstreamOverloaded):
+            await governor.acquire(far_deadline())
+        probe.first_byte = probe.started + 0.01
+        governor.release(probe)
+        assert governor.state == CLOSED
+
+        # A failed probe reopens immediately
+        for _ in range(BREAKER_FAILURES):
+            await call(governor, StatusError(500))
+        governor._open_until = time.monotonic() - 1
+        await call(governor, StatusError(503))
+        assert governor.state == OPEN
+        return governor
+
+    governor = run(scenario())
+    assert governor.breaker_opens == 3
+
+
+def test_non_overload_errors_leave_the_breaker_alone():
+    async def scenario():
+        governor = UpstreamGovernor()
+        for _ in range(BREAKER_FAILURES + 1):
+            await call(governor, StatusError(400))
+        return governor
+
+    governor = run(scenario())
+    assert governor.state == CLOSED
+    assert governor.limit == GOVERNOR_INITIAL_LIMIT
+
+
+def test_waiters_are_admitted_as_slots_free_and_shed_past_the_deadline(monkeypatch):
+    async def scenario():
+        governor = UpstreamGovernor()
+        slots = [await governor.acquire(far_deadline()) for _ in range(int(governor.limit))]
+        waiter = asyncio.ensure_future(governor.acquire(far_deadline()))
+        await asyncio.sleep(0)
+        assert not waiter.done() and governor.stats()["queued"] == 1
+        governor.release(slots.pop(), asyncio.CancelledError())
+        await asyncio.wait_for(waiter, 1)
+        assert governor.in_flight == governor.limit
+
+        with pytest.raises(UpstreamOverloaded) as shed:
+            await governor.acquire(time.perf_counter() + 0.05)
+        await asyncio.sleep(0)
+        return shed.value
+
+    monkeypatch.setattr(upstream_governor, "GOVERNOR_QUEUE_SIZE", 8)
+    error = run(scenario())
+    assert error.status_code == 503 and "deadline" in error.detail